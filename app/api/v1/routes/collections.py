@@ -0,0 +1,80 @@
+import os
+from typing import List, Optional
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from app.db import clients
+from app.db.mongo.client import MongoClient
+from app.services.query_service.filters import parse_filters, to_mongo_query
+from app.services.json_service.spill import Spiller
+from app.utils.responses.fast_json import dumps
+
+router = APIRouter()
+
+STREAM_BATCH_SIZE = int(os.getenv("MONGO_STREAM_BATCH_SIZE", "1000"))
+MAX_PAGE_SIZE = 10000
+
+def get_mongo() -> MongoClient:
+    """Shared client; pymongo pools connections internally"""
+    return clients.get_mongo()
+
+spiller = Spiller()
+
+def _ndjson(cursor, rehydrate=False):
+    try:
+        for document in cursor:
+            # Spilled fields and documents are fetched from MinIO one document at a time, as the response is streamed
+            yield dumps(spiller.rehydrate(document) if rehydrate else document) + b"\n"
+    finally:
+        cursor.close()
+
+@router.get("/collections/{user_id}/documents")
+async def collection_documents(
+    user_id: str,
+    filter: List[str] = Query([], description="Repeatable field:op:value, op in eq/ne/lt/lte/gt/gte; values are JSON literals"),
+    fields: Optional[str] = Query(None, description="Comma-separated projection (dotted paths allowed); _id is always returned"),
+    sort: Optional[str] = Query(None, description="Sort field, prefix with - for descending; default _id ascending"),
+    after: Optional[str] = Query(None, description="Resume after this _id (only with the default _id order)"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; omit to stream every match"),
+    batch_size: int = Query(STREAM_BATCH_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Documents per server round trip"),
+    rehydrate: bool = Query(False, description="Inline fields and documents spilled to MinIO instead of returning their pointers")
+):
+    """
+    Stream documents of a user's collection as NDJSON
+    Filters, projection and sort run on the server and the cursor is consumed in
+    batches, so memory stays constant for very large collections
+    To resume, pass the last document's _id as `after`
+    """
+    try:
+        query = to_mongo_query(parse_filters(filter))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if "_id" in query:
+        for op, value in query["_id"].items():
+            if isinstance(value, str) and ObjectId.is_valid(value):
+                query["_id"][op] = ObjectId(value)
+
+    if after is not None:
+        if sort:
+            raise HTTPException(status_code=400, detail="'after' can only be used with the default _id order")
+        try:
+            query.setdefault("_id", {})["$gt"] = ObjectId(after)
+        except (InvalidId, TypeError):
+            raise HTTPException(status_code=400, detail=f"Invalid _id cursor '{after}'")
+
+    projection = {f.strip(): 1 for f in fields.split(",") if f.strip()} if fields else None
+    if sort:
+        sort_spec = [(sort[1:], -1)] if sort.startswith("-") else [(sort, 1)]
+    else:
+        sort_spec = [("_id", 1)]
+
+    cursor = get_mongo().iter_find(
+        user_id, query,
+        projection=projection,
+        sort=sort_spec,
+        batch_size=min(batch_size, limit) if limit else batch_size,
+        limit=limit
+    )
+    return StreamingResponse(_ndjson(cursor, rehydrate), media_type="application/x-ndjson")
@@ -0,0 +1,134 @@
+import asyncio
+import os
+from typing import List, Optional
+from urllib.parse import unquote_plus
+from fastapi import APIRouter, HTTPException, Header, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from app.api.v1.routes.tables import get_db
+from app.api.v1.routes.upload import get_json_processor, get_media_processor, upload_scheduler
+from app.services.media_service import direct_upload
+
+router = APIRouter()
+
+# Shared secret MinIO's webhook target sends as its Authorization header; empty accepts any caller
+WEBHOOK_TOKEN = os.getenv('DIRECT_UPLOAD_WEBHOOK_TOKEN', '')
+# Processing tasks still running; held so they are not garbage collected mid-flight
+_tasks = set()
+
+class InitiateRequest(BaseModel):
+    filename: str
+    size: int = Field(..., ge=0, description="File size in bytes; larger than the part size means a multipart upload")
+    user_id: Optional[str] = None
+    content_type: Optional[str] = Field(None, description="Default: guessed from the filename")
+    mode: Optional[str] = Field(None, description="SQL load mode for JSON and record files, 'append' or 'merge'")
+    merge_key: Optional[str] = None
+
+class CompletedPart(BaseModel):
+    part_number: int = Field(..., ge=1)
+    etag: str
+
+class CompleteRequest(BaseModel):
+    parts: List[CompletedPart] = Field(default_factory=list, description="Multipart uploads only")
+
+def _media_processor(upload: dict):
+    """Media processor bound to the load mode the upload was initiated with"""
+    json_processor = get_json_processor().with_ingest_mode(upload['ingest_mode'], upload['merge_key'])
+    return get_media_processor().with_json_processor(json_processor)
+
+async def _process(upload: dict):
+    # Queued with the proxied uploads under the same quotas, but never rejected
+    async with upload_scheduler.admit(upload['user_id'], upload['size'], wait=True):
+        await run_in_threadpool(direct_upload.process_upload_in_worker, _media_processor(upload), upload)
+
+def _schedule(upload: dict):
+    """Process a claimed upload in the threadpool without holding up the response"""
+    task = asyncio.create_task(_process(upload))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+async def _get_upload(upload_id: str) -> dict:
+    upload = await run_in_threadpool(direct_upload.get_upload, get_db(), upload_id)
+    if upload is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return upload
+
+def _status(upload: dict) -> dict:
+    return {'upload_id': str(upload['upload_id']), 'key': upload['object_key'], 'status': upload['status']}
+
+@router.post("/uploads/initiate")
+async def initiate_upload(payload: InitiateRequest):
+    """
+    Presign an upload straight to MinIO under users/{user_id}/{folder}/
+    Returns a PUT url (with the Content-Type header to send), or for files larger than
+    DIRECT_UPLOAD_PART_SIZE a part_size and one url per part
+    """
+    try:
+        get_json_processor().with_ingest_mode(payload.mode, payload.merge_key)
+        return await run_in_threadpool(
+            direct_upload.initiate_upload, get_db(), get_media_processor(), payload.user_id or 'anonymous',
+            payload.filename, payload.size, payload.content_type, payload.mode, payload.merge_key
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/uploads/{upload_id}/complete", status_code=202)
+async def complete_upload(upload_id: str, payload: CompleteRequest = CompleteRequest()):
+    """
+    Mark the upload as done (assembling multipart uploads from their parts' ETags) and
+    start classification, ingestion or ZIP extraction in the background
+    Poll GET /v1/uploads/{upload_id} for the result. Repeated calls are no-ops
+    """
+    upload = await _get_upload(upload_id)
+    parts = [(p.part_number, p.etag) for p in payload.parts]
+    try:
+        upload, claimed = await run_in_threadpool(
+            direct_upload.claim_upload, get_db(), get_media_processor(), upload, parts
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if claimed:
+        _schedule(upload)
+    return _status(upload)
+
+@router.get("/uploads/{upload_id}")
+async def upload_status(upload_id: str):
+    """Status (initiated, processing, processed, failed) and, once processed, the upload response"""
+    upload = await _get_upload(upload_id)
+    return {**_status(upload), 'result': upload['result']}
+
+@router.delete("/uploads/{upload_id}")
+async def abort_upload(upload_id: str):
+    """Cancel an upload that was not completed; uploaded parts are discarded"""
+    upload = await _get_upload(upload_id)
+    if not await run_in_threadpool(direct_upload.abort_upload, get_db(), get_media_processor(), upload):
+        raise HTTPException(status_code=409, detail=f"Upload is already {upload['status']}")
+    return {"status": "success", "upload_id": upload_id}
+
+@router.post("/uploads/events")
+async def bucket_notification(request: Request, authorization: Optional[str] = Header(None)):
+    """
+    MinIO webhook target for s3:ObjectCreated events, so single-PUT uploads are processed
+    without a complete call (multipart uploads are always completed through the API)
+    """
+    if WEBHOOK_TOKEN and (authorization or '').removeprefix('Bearer ').strip() != WEBHOOK_TOKEN:
+        raise HTTPException(status_code=401, detail="Invalid webhook token")
+    event = await request.json()
+    media = get_media_processor()
+    scheduled = []
+    for record in event.get('Records', []):
+        s3 = record.get('s3', {})
+        if not record.get('eventName', '').startswith('s3:ObjectCreated:') or s3.get('bucket', {}).get('name') != media.bucket:
+            continue
+        key = unquote_plus(s3.get('object', {}).get('key', ''))
+        upload = await run_in_threadpool(direct_upload.find_upload_by_key, get_db(), key)
+        if upload is None or upload['multipart_id']:
+            continue
+        try:
+            upload, claimed = await run_in_threadpool(direct_upload.claim_upload, get_db(), media, upload)
+        except ValueError:
+            continue
+        if claimed:
+            _schedule(upload)
+            scheduled.append(str(upload['upload_id']))
+    return {"scheduled": scheduled}
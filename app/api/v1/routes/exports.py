@@ -0,0 +1,90 @@
+from typing import Any, Optional
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from app.api.v1.routes.tables import get_db, is_exposed
+from app.services.export_service import parquet_exporter
+from app.services.export_service.jobs import run_export, create_job, list_jobs, delete_job
+
+router = APIRouter()
+
+MIN_INTERVAL_SECONDS = 60
+
+class ExportRequest(BaseModel):
+    table: Optional[str] = Field(None, description="Generated table to export")
+    collection: bool = Field(False, description="Export the user's Mongo collection instead of a table")
+    watermark_column: Optional[str] = Field(None, description="Increasing column for incremental exports")
+    since: Optional[Any] = Field(None, description="Only export rows whose watermark_column is greater than this")
+
+class ExportJobRequest(BaseModel):
+    table: Optional[str] = None
+    collection: bool = False
+    watermark_column: Optional[str] = None
+    interval_seconds: int = Field(..., ge=MIN_INTERVAL_SECONDS)
+
+def _source(table: Optional[str], collection: bool):
+    """Validate the table/collection choice; returns (source_type, source)"""
+    if bool(table) == collection:
+        raise HTTPException(status_code=400, detail="Specify exactly one of 'table' or 'collection'")
+    if collection:
+        return 'collection', 'collection'
+    return 'table', table
+
+async def _check_table(source_type: str, source: str):
+    if source_type == 'table' and not await run_in_threadpool(is_exposed, get_db(), source):
+        raise HTTPException(status_code=404, detail=f"Table '{source}' not found")
+
+def _exporter():
+    if not parquet_exporter.available():
+        raise HTTPException(status_code=503, detail="Parquet export requires pyarrow")
+    return parquet_exporter.ParquetExporter()
+
+@router.post("/exports/{user_id}")
+async def export_now(user_id: str, payload: ExportRequest):
+    """
+    Export a table or the user's collection to Parquet under users/{user_id}/exports/
+    Returns the object key, a presigned download URL, the row count and, for incremental
+    exports, the new watermark to pass as `since` next time
+    """
+    source_type, source = _source(payload.table, payload.collection)
+    exporter = _exporter()
+    await _check_table(source_type, source)
+    try:
+        return await run_in_threadpool(
+            run_export, exporter, user_id, source_type, source,
+            watermark_column=payload.watermark_column, since=payload.since
+        )
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/exports/{user_id}/jobs")
+async def schedule_export(user_id: str, payload: ExportJobRequest):
+    """
+    Schedule a recurring export; with a watermark_column each run only exports rows added
+    since the previous one. The first run happens on the scheduler's next poll
+    """
+    source_type, source = _source(payload.table, payload.collection)
+    _exporter()
+    await _check_table(source_type, source)
+    db = get_db()
+    if source_type == 'table':
+        known = await run_in_threadpool(db.fetch_table_columns, source)
+        if not known:
+            raise HTTPException(status_code=404, detail=f"Table '{source}' not found")
+        if payload.watermark_column and payload.watermark_column not in known:
+            raise HTTPException(status_code=400, detail=f"Unknown watermark column '{payload.watermark_column}'")
+    return await run_in_threadpool(
+        create_job, db, user_id, source_type, source, payload.watermark_column, payload.interval_seconds
+    )
+
+@router.get("/exports/{user_id}/jobs")
+async def get_export_jobs(user_id: str):
+    return await run_in_threadpool(list_jobs, get_db(), user_id)
+
+@router.delete("/exports/{user_id}/jobs/{job_id}")
+async def cancel_export_job(user_id: str, job_id: str):
+    if not await run_in_threadpool(delete_job, get_db(), user_id, job_id):
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return {"status": "success", "job_id": job_id}
@@ -0,0 +1,24 @@
+import os
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.db import clients
+
+router = APIRouter()
+
+@router.get("/healthz")
+async def liveness():
+    """Liveness: the worker's event loop is serving requests; never touches a backend"""
+    return {"status": "ok", "pid": os.getpid()}
+
+@router.get("/readyz")
+async def readiness():
+    """
+    Readiness: Postgres, Mongo and MinIO answer a ping within READINESS_TIMEOUT_SECONDS
+    (checked in parallel) and the base schema is applied; 503 with per-backend errors otherwise
+    """
+    checks = await clients.check_ready()
+    ready = all(status == 'ok' for status in checks.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "unavailable", "checks": checks}
+    )
@@ -0,0 +1,9 @@
+from fastapi import APIRouter, Response
+from app.utils.metrics import registry as metrics
+
+router = APIRouter()
+
+@router.get("/metrics")
+async def metrics_handler():
+    """Prometheus scrape endpoint"""
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
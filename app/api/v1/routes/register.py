@@ -1,34 +1,61 @@
-
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, EmailStr
 from uuid import uuid4
 from datetime import datetime
+from app.db import clients
 from app.db.postgres.client import PostgresClient
 from passlib.context import CryptContext
 
 router = APIRouter()
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt is CPU-bound (~250 ms) and releases the GIL, so it runs on a dedicated pool
+# instead of the event loop; the semaphore caps queued work during signup spikes
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 2)))
+hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+HASH_MAX_CONCURRENCY = int(os.getenv("HASH_MAX_CONCURRENCY", str(HASH_WORKERS * 4)))
+
+_hash_slots = None
+
+def get_db() -> PostgresClient:
+    """Shared connection for registration; the base schema is applied at startup or on first use"""
+    clients.ensure_base_schema()
+    return clients.get_postgres('register')
+
+async def hash_password(password: str) -> str:
+    global _hash_slots
+    if _hash_slots is None:
+        # Created lazily so it binds to the server's running event loop
+        _hash_slots = asyncio.Semaphore(HASH_MAX_CONCURRENCY)
+    async with _hash_slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(hash_executor, pwd_context.hash, password)
+
+def insert_user(user_id: str, email: str, hashed_pass: str, created_at: datetime):
+    """Email check and insert in one round trip; the UNIQUE constraint decides"""
+    return get_db().fetch_one(
+        "INSERT INTO users (user_id, email_id, hashed_pass, created_at) VALUES (%s, %s, %s, %s) "
+        "ON CONFLICT (email_id) DO NOTHING RETURNING user_id",
+        (user_id, email, hashed_pass, created_at)
+    )
+
 class RegisterRequest(BaseModel):
     email: EmailStr
     password: str
 
 @router.post("/register")
 async def register_user(payload: RegisterRequest):
-    db = PostgresClient()
-    # Ensure base schema exists
-    db.ensure_base_schema()
-    
-    existing = db.fetch_one("SELECT user_id FROM users WHERE email_id=%s", (payload.email,))
-    if existing:
-        raise HTTPException(status_code=400, detail="Email already registered")
-
-    hashed_pass = pwd_context.hash(payload.password)
+    hashed_pass = await hash_password(payload.password)
     user_id = str(uuid4())
     created_at = datetime.utcnow()
 
-    db.execute(
-        "INSERT INTO users (user_id, email_id, hashed_pass, created_at) VALUES (%s, %s, %s, %s)",
-        (user_id, payload.email, hashed_pass, created_at)
-    )
+    # Blocking driver call (and the base schema when warm-up is off), so off the event loop
+    inserted = await run_in_threadpool(insert_user, user_id, payload.email, hashed_pass, created_at)
+    if not inserted:
+        raise HTTPException(status_code=400, detail="Email already registered")
+
     return {"status": "success", "user_id": user_id}
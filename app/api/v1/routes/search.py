@@ -0,0 +1,39 @@
+import time
+from typing import Any, Dict
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from app.api.v1.routes.tables import get_db
+from app.api.v1.routes.upload import get_media_processor
+from app.services.search_service import text_index
+from app.utils.metrics import registry as metrics
+
+router = APIRouter()
+
+MAX_RESULTS = 100
+
+def _search(user_id: str, q: str, limit: int, offset: int) -> Dict[str, Any]:
+    start = time.perf_counter()
+    hits = text_index.search(get_db(), user_id, q, limit, offset)
+    media = get_media_processor()
+    for hit in hits:
+        # Signed locally, no round trip per result
+        hit['url'] = media.minio.presigned_get(media.bucket, hit['key'], expiry=media.default_url_expires)
+    took = time.perf_counter() - start
+    metrics.observe('search_query_seconds', took)
+    return {'query': q, 'count': len(hits), 'results': hits, 'took_ms': round(took * 1000, 2)}
+
+@router.get("/search")
+async def search(
+    user_id: str = Query(..., description="Only this user's files are searched"),
+    q: str = Query(..., min_length=1, description='Words, "quoted phrases", or, -excluded words'),
+    limit: int = Query(20, ge=1, le=MAX_RESULTS),
+    offset: int = Query(0, ge=0),
+):
+    """
+    Full-text search over the user's uploaded text files (txt, md, csv, srt, text/*)
+    Returns the matching object keys, best first, with their score and a presigned download URL
+    """
+    try:
+        return await run_in_threadpool(_search, user_id, q, limit, offset)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Search failed: {e}")
@@ -0,0 +1,104 @@
+import os
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from app.db import clients
+from app.db.postgres.client import PostgresClient
+from app.services.json_service.processor import RESERVED_TABLES
+from app.services.json_service.query_generator import QueryGenerator
+from app.services.query_service.filters import parse_filters
+from app.services.json_service.spill import Spiller
+from app.services.json_service.table_generator.partitions import USER_COLUMN
+from app.utils.responses.fast_json import dumps
+
+router = APIRouter()
+
+# Tables that are never exposed through the query API (base schema holds password hashes, export jobs and direct uploads)
+HIDDEN_TABLES = {t.strip() for t in os.getenv("QUERY_API_HIDDEN_TABLES", "users,export_jobs,direct_uploads,text_documents").split(",") if t.strip()}
+STREAM_BATCH_SIZE = int(os.getenv("QUERY_STREAM_BATCH_SIZE", "2000"))
+MAX_PAGE_SIZE = 10000
+
+def get_db() -> PostgresClient:
+    """Shared connection for catalog lookups and prepared page queries"""
+    return clients.get_postgres('query')
+
+def is_exposed(db: PostgresClient, table_name: str) -> bool:
+    """Allow-list: only tables list_tables() returns (public schema), minus the hidden and reserved ones"""
+    if table_name in HIDDEN_TABLES or table_name in RESERVED_TABLES:
+        return False
+    return table_name in db.list_tables()
+
+spiller = Spiller()
+
+def _ndjson(columns, rows, rehydrate=False):
+    for row in rows:
+        row = dict(zip(columns, row))
+        # Spilled values are fetched from MinIO one row at a time, as the response is streamed
+        yield dumps(spiller.rehydrate(row) if rehydrate else row) + b"\n"
+
+def _stream_export(query, params, rehydrate=False):
+    """Runs in Starlette's threadpool; owns its connection for the cursor's transaction"""
+    db = PostgresClient()
+    try:
+        rows = db.stream(query, params, itersize=STREAM_BATCH_SIZE)
+        columns = next(rows)
+        yield from _ndjson(columns, rows, rehydrate)
+    finally:
+        db.close()
+
+@router.get("/tables/{table_name}/rows")
+async def table_rows(
+    table_name: str,
+    columns: Optional[str] = Query(None, description="Comma-separated projection, default all columns"),
+    filter: List[str] = Query([], description="Repeatable field:op:value, op in eq/ne/lt/lte/gt/gte"),
+    order_by: Optional[str] = Query(None, description="Keyset column, default the generated primary key"),
+    after: Optional[str] = Query(None, description="Return rows whose order_by value is greater than this"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; omit to export every matching row"),
+    user_id: Optional[str] = Query(None, description="Only this user's rows, on tables partitioned by user"),
+    rehydrate: bool = Query(False, description="Inline values spilled to MinIO instead of returning their pointers")
+):
+    """
+    Read rows of an ingested table as NDJSON
+    Pages (limit set) run as prepared statements; exports (no limit) stream from a
+    server-side cursor so memory stays constant regardless of table size
+    For the next page pass the last row's order_by value as `after`
+    Oversized JSONB values stored in MinIO come back as {"_spilled": {...}} pointers unless rehydrate is set
+    user_id filters on the injected partition column, so only that user's partitions are scanned
+    """
+    db = get_db()
+    if not await run_in_threadpool(is_exposed, db, table_name):
+        raise HTTPException(status_code=404, detail=f"Table '{table_name}' not found")
+    known = await run_in_threadpool(db.fetch_table_columns, table_name)
+    if not known:
+        raise HTTPException(status_code=404, detail=f"Table '{table_name}' not found")
+
+    try:
+        filters = parse_filters(filter)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if user_id is not None:
+        if USER_COLUMN not in known:
+            raise HTTPException(status_code=400, detail=f"Table '{table_name}' is not partitioned by user")
+        filters.append((USER_COLUMN, 'eq', user_id))
+
+    projection = [c.strip() for c in columns.split(",") if c.strip()] if columns else None
+    if order_by is None:
+        order_by = "_row_id" if "_row_id" in known else ("id" if "id" in known else next(iter(known)))
+    referenced = (projection or []) + [f[0] for f in filters] + [order_by]
+    unknown = [c for c in referenced if c not in known]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(sorted(set(unknown)))}")
+
+    # Named columns rather than *, so a column added by a later upload is a new query shape
+    # instead of changing the result type of an already prepared statement
+    query, params = QueryGenerator.generate_keyset_select(table_name, projection or list(known), filters, order_by, after=after, limit=limit)
+
+    if limit:
+        try:
+            names, rows = await run_in_threadpool(db.fetch_prepared, query, params)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Query failed: {e}")
+        return StreamingResponse(_ndjson(names, rows, rehydrate), media_type="application/x-ndjson")
+
+    return StreamingResponse(_stream_export(query, params, rehydrate), media_type="application/x-ndjson")
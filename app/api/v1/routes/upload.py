@@ -1,44 +1,187 @@
-
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-from typing import Optional
-from app.utils.detectors.type_detector import TypeDetector
+import itertools
+import os
+import threading
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Header
+from fastapi.concurrency import run_in_threadpool
+from typing import Any, Dict, Optional
+from uuid import uuid4
+from app.db import clients
+from app.utils.detectors.type_detector import TypeDetector, RECORD_FORMATS
 from app.services.json_service.processor import JsonProcessor
 from app.services.media_service.processor import MediaProcessor
+from app.services.idempotency.result_store import IdempotencyStore, IdempotencyConflict, fingerprint
+from app.services.admission.scheduler import UploadScheduler, QuotaExceeded
+from app.utils.profiling import profiler
+from app.utils.metrics import registry as metrics
+from app.utils.responses.fast_json import FastJSONResponse
 
 router = APIRouter()
 
 detector = TypeDetector()
-json_processor = JsonProcessor()
-media_processor = MediaProcessor()
+_json_processor = None
+_media_processor = None
+
+def get_json_processor() -> JsonProcessor:
+    """Created on first use (or by the startup warm-up), never at import time"""
+    global _json_processor
+    if _json_processor is None:
+        _json_processor = JsonProcessor()
+    return _json_processor
+
+def get_media_processor() -> MediaProcessor:
+    global _media_processor
+    if _media_processor is None:
+        _media_processor = MediaProcessor(json_processor=get_json_processor())
+    return _media_processor
+idempotency_store = IdempotencyStore()
+# Per-user quotas and fair ordering of upload jobs (UPLOAD_WORKERS, QUOTA_*)
+upload_scheduler = UploadScheduler()
+# IO_BACKEND=async: uploads go through the async clients and never block the event loop
+async_io = clients.IO_BACKEND == 'async'
+# Without an Idempotency-Key header, identical (user, filename, content) uploads share a content-hash key
+auto_idempotency = os.getenv('IDEMPOTENCY_AUTO_KEY', 'true').lower() == 'true'
+_worker_ids = itertools.count()
+_local = threading.local()
+
+def _worker_pg():
+    """
+    This threadpool thread's own connection for sync uploads
+    COPY and merge loads switch autocommit and commit or roll back on their connection, so
+    uploads running side by side must not share one
+    """
+    if not hasattr(_local, 'name'):
+        _local.name = f'upload-{next(_worker_ids)}'
+    return clients.get_postgres(_local.name)
+
+def _ingest_in_worker(json_processor: JsonProcessor, detected_type: str, filename: str,
+                      file_bytes: bytes, user_id: str) -> Dict[str, Any]:
+    """
+    Blocking ingestion (IO_BACKEND=sync) on a threadpool thread, so the event loop keeps
+    serving and up to UPLOAD_WORKERS uploads run at once
+    """
+    json_processor = json_processor.with_clients(pg=_worker_pg(), mongo=json_processor._mongo)
+    if detected_type == "json":
+        return json_processor.process(file_bytes, user_id=user_id)
+    if detected_type in RECORD_FORMATS:
+        return json_processor.process_records(filename, file_bytes, detected_type, user_id=user_id)
+    media_processor = get_media_processor().with_json_processor(json_processor)
+    return media_processor.process(filename, file_bytes, user_id=user_id)
 
 @router.post("/upload")
 async def upload_handler(
     file: UploadFile = File(...),
-    user_id: Optional[str] = Form(None)
+    user_id: Optional[str] = Form(None),
+    mode: Optional[str] = Form(None),
+    merge_key: Optional[str] = Form(None),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    x_profile: Optional[str] = Header(None, alias="X-Profile"),
+    x_request_id: Optional[str] = Header(None, alias="X-Request-ID")
 ):
     """
-    Upload endpoint that handles both JSON and media files
+    Upload endpoint that handles JSON, CSV/TSV/NDJSON and media files
     
     Args:
         file: The file to upload
         user_id: Optional user identifier for organizing media files
+        mode: Optional SQL load mode, 'append' or 'merge' (default INGEST_MODE); merge
+            upserts rows on a natural key instead of appending duplicates
+        merge_key: Optional comma-separated merge key columns (default MERGE_KEY, then id/uuid)
+        idempotency_key: Optional Idempotency-Key header; retries with the same key
+            replay the first response instead of ingesting the file again
+        x_profile: "1" to capture a cProfile/tracemalloc profile of this request
+        x_request_id: Optional request id ([A-Za-z0-9_-], else replaced), also used as the profile capture id
+    
+    Jobs over the user's quota, or that found no free worker in time, get a 429 with Retry-After
+    (replays of an idempotent upload are not charged)
     """
     # Default user_id if not provided
     if not user_id:
         user_id = 'anonymous'
     
+    try:
+        json_processor = get_json_processor().with_ingest_mode(mode, merge_key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     file_bytes = await file.read()
 
-    # Detect type
-    detected_type = detector.detect(file.filename, file_bytes)
+    async def ingest():
+        # Detect type
+        detected_type = detector.detect(file.filename, file_bytes)
 
-    if detected_type == "json":
-        result = json_processor.process(file_bytes, user_id=user_id)
-        return {"type": "json", "result": result}
+        def in_worker():
+            return run_in_threadpool(capture.call, _ingest_in_worker, json_processor, detected_type,
+                                     file.filename, file_bytes, user_id)
+
+        if detected_type == "json":
+            if async_io:
+                result = await json_processor.process_async(file_bytes, user_id=user_id)
+            else:
+                result = await in_worker()
+            return {"type": "json", "result": result}
+
+        elif detected_type in RECORD_FORMATS:
+            try:
+                if async_io:
+                    result = await json_processor.process_records_async(file.filename, file_bytes, detected_type, user_id=user_id)
+                else:
+                    result = await in_worker()
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            return {"type": detected_type, "result": result}
+
+        elif detected_type == "media":
+            if async_io:
+                # JSON and record entries of archives follow this request's load mode
+                media_processor = get_media_processor().with_json_processor(json_processor)
+                result = await media_processor.process_async(file.filename, file_bytes, user_id=user_id)
+            else:
+                result = await in_worker()
+            return {"type": "media", "result": result}
+
+        else:
+            raise HTTPException(status_code=400, detail="Unsupported file type")
+
+    async def run_upload():
+        try:
+            async with upload_scheduler.admit(user_id, len(file_bytes)):
+                return await ingest()
+        except QuotaExceeded as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": e.retry_after_header})
+
+    # A client-chosen id is only kept when it is a plain token (it names the capture directory)
+    request_id = x_request_id if profiler.is_valid_id(x_request_id) else str(uuid4())
+    headers = {"X-Request-ID": request_id}
+    profile_meta = {"user_id": user_id, "filename": file.filename, "bytes": len(file_bytes)}
+
+    with profiler.capture(request_id, requested=x_profile == "1", meta=profile_meta) as capture:
+        # Merge settings change what an upload writes, so they are part of its identity
+        options = (json_processor.ingest_mode, json_processor.merge_key) if json_processor.ingest_mode == 'merge' else ()
+        request_fingerprint = fingerprint(user_id, file.filename, file_bytes, *options)
+        if idempotency_key:
+            key = f"{user_id}:key:{idempotency_key}"
+        elif auto_idempotency:
+            key = f"{user_id}:sha256:{request_fingerprint}"
+        else:
+            key = None
+
+        if key is None:
+            payload = await run_upload()
+        else:
+            try:
+                payload, replayed = await idempotency_store.run(key, request_fingerprint, run_upload)
+            except IdempotencyConflict as e:
+                raise HTTPException(status_code=422, detail=str(e))
+
+            # Media errors come back as a result body; don't replay them to retries
+            if payload["result"].get("status") == "error":
+                idempotency_store.discard(key)
 
-    elif detected_type == "media":
-        result = media_processor.process(file.filename, file_bytes, user_id=user_id)
-        return {"type": "media", "result": result}
+            headers["Idempotency-Replayed"] = "true" if replayed else "false"
 
-    else:
-        raise HTTPException(status_code=400, detail="Unsupported file type")
\ No newline at end of file
+    if capture.saved:
+        headers["X-Profile-Id"] = capture.request_id
+    # Encoded once, without FastAPI's jsonable_encoder copy of the whole result
+    response = FastJSONResponse(payload, headers=headers)
+    metrics.observe('upload_response_bytes', len(response.body))
+    return response
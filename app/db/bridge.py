@@ -0,0 +1,38 @@
+"""
+Blocking view of the async clients for code running in a worker thread
+
+With IO_BACKEND=async the ingest pipeline still plans tables and prepares rows in the
+threadpool, but every backend call it makes through a BlockingClient is run on the
+event loop that owns the async client. The worker waits for its round trip while the
+loop keeps serving other uploads, and all of them share the same pools.
+"""
+import asyncio
+import inspect
+from typing import Any
+
+
+async def _call(method, args, kwargs):
+    result = method(*args, **kwargs)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+class BlockingClient:
+    """Wraps an async client; method calls block the calling thread until the loop has run them"""
+
+    def __init__(self, client: Any, loop: asyncio.AbstractEventLoop):
+        self._client = client
+        self._loop = loop
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            # Never call this from the loop's own thread: it would wait on itself
+            return asyncio.run_coroutine_threadsafe(_call(attr, args, kwargs), self._loop).result()
+
+        call.__name__ = name
+        return call
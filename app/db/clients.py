@@ -0,0 +1,230 @@
+"""
+Per-process backend clients, created on first use instead of at import time
+
+Importing the app opens no sockets: each client is built the first time a request (or the
+startup warm-up) asks for it, so workers forked by gunicorn never share a connection made
+in the master. Clients inherited through fork are forgotten (not closed, which would tear
+down the parent's socket) and rebuilt in the child.
+
+With IO_BACKEND=async, uploads go through a second set of clients built on asyncpg, motor
+and miniopy-async (get_async). Those belong to the event loop that first used them and
+are closed by close_all_async at shutdown.
+"""
+import asyncio
+import os
+import threading
+from typing import Any, Callable, Dict, Iterable, Tuple
+from fastapi.concurrency import run_in_threadpool
+from app.db.postgres import client as postgres_module
+from app.db.mongo import client as mongo_module
+from app.db.minio import client as minio_module
+from app.db.postgres import async_client as async_postgres_module
+from app.db.mongo import async_client as async_mongo_module
+from app.db.minio import async_client as async_minio_module
+
+# 'sync' (psycopg2, pymongo, minio) or 'async' (asyncpg, motor, miniopy-async) for uploads
+IO_BACKEND = os.getenv('IO_BACKEND', 'sync').lower()
+
+# (kind, name) pairs opened by warm_up; each Postgres name is its own connection
+WARMUP_TARGETS = (('postgres', 'ingest'), ('postgres', 'query'), ('postgres', 'register'),
+                  ('mongo', 'default'), ('minio', 'default'))
+WARMUP_TIMEOUT = float(os.getenv('WARMUP_TIMEOUT_SECONDS', '5'))
+READINESS_TIMEOUT = float(os.getenv('READINESS_TIMEOUT_SECONDS', '2'))
+
+_instances: Dict[Tuple[str, str], Any] = {}
+_locks: Dict[Tuple[str, str], threading.Lock] = {}
+_registry_lock = threading.Lock()
+_base_schema_applied = False
+_async_instances: Dict[Tuple[str, str], Any] = {}
+
+
+def _factory(kind: str) -> Callable[[], Any]:
+    # Resolved at call time so the benchmark fakes can replace the client classes
+    if kind == 'postgres':
+        return postgres_module.PostgresClient
+    if kind == 'mongo':
+        return mongo_module.MongoClient
+    if kind == 'minio':
+        return minio_module.MinioClient
+    raise ValueError(f"Unknown backend '{kind}'")
+
+
+def get(kind: str, name: str = 'default') -> Any:
+    """The process's client for (kind, name), created on first use"""
+    key = (kind, name)
+    instance = _instances.get(key)
+    if instance is not None:
+        return instance
+    with _registry_lock:
+        lock = _locks.setdefault(key, threading.Lock())
+    # Per-key lock: concurrent first requests share one client, different backends connect in parallel
+    with lock:
+        instance = _instances.get(key)
+        if instance is None:
+            instance = _instances[key] = _factory(kind)()
+        return instance
+
+
+def get_postgres(name: str = 'ingest'):
+    return get('postgres', name)
+
+
+def get_mongo():
+    return get('mongo')
+
+
+def get_minio():
+    return get('minio')
+
+
+def _async_factory(kind: str) -> Callable[[], Any]:
+    if kind == 'postgres':
+        return async_postgres_module.AsyncPostgresClient
+    if kind == 'mongo':
+        return async_mongo_module.AsyncMongoClient
+    if kind == 'minio':
+        return async_minio_module.AsyncMinioClient
+    raise ValueError(f"Unknown backend '{kind}'")
+
+
+def get_async(kind: str, name: str = 'default') -> Any:
+    """
+    The process's async client for (kind, name); call from the event loop thread only
+    Building one does no I/O (pools and sessions open on first await), so no lock is needed
+    """
+    key = (kind, name)
+    instance = _async_instances.get(key)
+    if instance is None:
+        instance = _async_instances[key] = _async_factory(kind)()
+    return instance
+
+
+def get_async_postgres(name: str = 'ingest'):
+    return get_async('postgres', name)
+
+
+def get_async_mongo():
+    return get_async('mongo')
+
+
+def get_async_minio():
+    return get_async('minio')
+
+
+def discard(kind: str, name: str = 'default'):
+    """Drop a client (e.g. after a failed ping) so the next get() reconnects"""
+    instance = _instances.pop((kind, name), None)
+    if instance is not None:
+        try:
+            instance.close()
+        except Exception:
+            pass
+
+
+def close_all():
+    """Close every client this process opened (app shutdown)"""
+    global _base_schema_applied
+    for kind, name in list(_instances):
+        discard(kind, name)
+    _base_schema_applied = False
+
+
+async def close_all_async():
+    """Close the async clients (app shutdown, on the loop that used them)"""
+    for key in list(_async_instances):
+        try:
+            await _async_instances.pop(key).close()
+        except Exception:
+            pass
+
+
+def _forget_after_fork():
+    global _base_schema_applied, _registry_lock
+    _instances.clear()
+    _async_instances.clear()
+    _locks.clear()
+    _registry_lock = threading.Lock()
+    _base_schema_applied = False
+
+
+os.register_at_fork(after_in_child=_forget_after_fork)
+
+
+def ensure_base_schema() -> bool:
+    """
+    Apply base_schema.sql once per process on the ingest connection
+    A failed attempt is not remembered, so the next call tries again
+    """
+    global _base_schema_applied
+    if not _base_schema_applied:
+        _base_schema_applied = get_postgres().ensure_base_schema()
+    return _base_schema_applied
+
+
+def _open(kind: str, name: str):
+    get(kind, name)
+    if (kind, name) == ('postgres', 'ingest') and not ensure_base_schema():
+        raise RuntimeError('base schema could not be applied')
+
+
+async def _ping_async(kind: str):
+    await get_async(kind).ping()
+
+
+async def warm_up(targets: Iterable[Tuple[str, str]] = WARMUP_TARGETS,
+                  timeout: float = WARMUP_TIMEOUT) -> Dict[str, str]:
+    """
+    Open the given clients concurrently in the threadpool (and apply the base schema)
+    A backend that is down or slower than timeout is reported, not raised: the app still
+    starts (a slow connect finishes in the background) and /readyz stays unready until
+    the backend answers
+    Returns: {'kind:name': 'ok' or the error}
+    """
+    tasks = {f'{kind}:{name}': asyncio.ensure_future(run_in_threadpool(_open, kind, name))
+             for kind, name in targets}
+    if IO_BACKEND == 'async':
+        # Opens the asyncpg pool and the other async clients' connections ahead of the first upload
+        tasks.update({f'async:{kind}': asyncio.ensure_future(_ping_async(kind))
+                      for kind in ('postgres', 'mongo', 'minio')})
+    if tasks:
+        await asyncio.wait(tasks.values(), timeout=timeout)
+    status = {}
+    for target, task in tasks.items():
+        if not task.done():
+            status[target] = f'timed out after {timeout}s'
+            # Still connecting in the background; keep a late failure from being logged as unhandled
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        elif task.exception() is not None:
+            status[target] = str(task.exception())
+        else:
+            status[target] = 'ok'
+        if status[target] != 'ok':
+            print(f"Warning: could not open {target} client at startup: {status[target]}")
+    return status
+
+
+def _ping(kind: str, name: str):
+    try:
+        get(kind, name).ping()
+    except Exception:
+        discard(kind, name)
+        raise
+    if kind == 'postgres' and not ensure_base_schema():
+        raise RuntimeError('base schema could not be applied')
+
+
+async def check_ready(timeout: float = READINESS_TIMEOUT) -> Dict[str, str]:
+    """Ping Postgres, Mongo and MinIO in parallel; returns {backend: 'ok' or the error}"""
+    checks = {'postgres': ('postgres', 'ingest'), 'mongo': ('mongo', 'default'), 'minio': ('minio', 'default')}
+
+    async def check(kind: str, name: str) -> str:
+        try:
+            await asyncio.wait_for(run_in_threadpool(_ping, kind, name), timeout)
+            return 'ok'
+        except asyncio.TimeoutError:
+            return f'timed out after {timeout}s'
+        except Exception as e:
+            return str(e) or type(e).__name__
+
+    results = await asyncio.gather(*(check(kind, name) for kind, name in checks.values()))
+    return dict(zip(checks, results))
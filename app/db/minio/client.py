@@ -1,7 +1,10 @@
 import os
+from datetime import timedelta
 from minio import Minio
+from minio.datatypes import Part
 from minio.error import S3Error
 from io import BytesIO
+from app.utils.metrics import registry as metrics
 
 class MinioClient:
     def __init__(self):
@@ -19,6 +22,8 @@ class MinioClient:
         )
         
         self.bucket_name = os.getenv("MINIO_BUCKET_NAME", "multimodal-storage")
+        # Buckets already confirmed to exist, so put_object does not re-check every time
+        self._known_buckets = set()
         self._ensure_bucket_exists()
     
     def _ensure_bucket_exists(self):
@@ -32,12 +37,18 @@ class MinioClient:
     
     def ensure_bucket(self, bucket_name: str):
         """Ensure a specific bucket exists"""
+        if bucket_name in self._known_buckets:
+            return
+        metrics.inc('backend_round_trips_total', backend='minio', op='bucket_exists')
         if not self.client.bucket_exists(bucket_name):
+            metrics.inc('backend_round_trips_total', backend='minio', op='make_bucket')
             self.client.make_bucket(bucket_name)
+        self._known_buckets.add(bucket_name)
     
     def put_object(self, bucket_name: str, object_name: str, data: bytes, content_type: str):
         """Upload bytes data to MinIO with specified content type"""
         self.ensure_bucket(bucket_name)
+        metrics.inc('backend_round_trips_total', backend='minio', op='put_object')
         bio = BytesIO(data)
         result = self.client.put_object(
             bucket_name, 
@@ -48,10 +59,82 @@ class MinioClient:
         )
         return result
     
+    def put_file(self, bucket_name: str, object_name: str, file_path: str, content_type: str):
+        """Upload a local file; large files go up as a multipart upload without loading them in memory"""
+        self.ensure_bucket(bucket_name)
+        metrics.inc('backend_round_trips_total', backend='minio', op='put_object')
+        return self.client.fput_object(bucket_name, object_name, file_path, content_type=content_type)
+    
     def presigned_get(self, bucket_name: str, object_name: str, expiry=3600):
-        """Generate presigned URL for object download"""
+        """Generate presigned URL for object download (expiry in seconds or as a timedelta)"""
+        if not isinstance(expiry, timedelta):
+            expiry = timedelta(seconds=expiry)
         return self.client.presigned_get_object(bucket_name, object_name, expires=expiry)
     
+    def presigned_put(self, bucket_name: str, object_name: str, expiry=3600):
+        """Generate presigned URL a client can PUT the object body to"""
+        if not isinstance(expiry, timedelta):
+            expiry = timedelta(seconds=expiry)
+        self.ensure_bucket(bucket_name)
+        return self.client.presigned_put_object(bucket_name, object_name, expires=expiry)
+    
+    def create_multipart_upload(self, bucket_name: str, object_name: str, content_type: str) -> str:
+        """Start a multipart upload whose parts the client PUTs itself; returns the upload id"""
+        self.ensure_bucket(bucket_name)
+        metrics.inc('backend_round_trips_total', backend='minio', op='create_multipart')
+        return self.client._create_multipart_upload(bucket_name, object_name, {"Content-Type": content_type})
+    
+    def presigned_upload_part(self, bucket_name: str, object_name: str, upload_id: str, part_number: int, expiry=3600):
+        """Generate presigned URL for one part (1-based) of a multipart upload"""
+        if not isinstance(expiry, timedelta):
+            expiry = timedelta(seconds=expiry)
+        return self.client.get_presigned_url(
+            "PUT", bucket_name, object_name, expires=expiry,
+            extra_query_params={"uploadId": upload_id, "partNumber": str(part_number)}
+        )
+    
+    def complete_multipart_upload(self, bucket_name: str, object_name: str, upload_id: str, parts):
+        """Assemble the object from its uploaded parts; parts: (part_number, etag) pairs"""
+        metrics.inc('backend_round_trips_total', backend='minio', op='complete_multipart')
+        ordered = [Part(number, etag) for number, etag in sorted(parts)]
+        return self.client._complete_multipart_upload(bucket_name, object_name, upload_id, ordered)
+    
+    def abort_multipart_upload(self, bucket_name: str, object_name: str, upload_id: str):
+        """Discard a multipart upload and the parts uploaded so far"""
+        metrics.inc('backend_round_trips_total', backend='minio', op='abort_multipart')
+        self.client._abort_multipart_upload(bucket_name, object_name, upload_id)
+    
+    def stat(self, bucket_name: str, object_name: str):
+        """Object metadata (size, etag, content_type), or None when the object does not exist"""
+        metrics.inc('backend_round_trips_total', backend='minio', op='stat_object')
+        try:
+            return self.client.stat_object(bucket_name, object_name)
+        except S3Error as e:
+            if e.code in ("NoSuchKey", "NoSuchObject"):
+                return None
+            raise
+    
+    def read(self, bucket_name: str, object_name: str, offset: int = 0, length: int = 0) -> bytes:
+        """Object bytes; with length, only that range (length 0 reads to the end)"""
+        metrics.inc('backend_round_trips_total', backend='minio', op='get_object')
+        response = self.client.get_object(bucket_name, object_name, offset=offset, length=length)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+    
+    def read_into(self, bucket_name: str, object_name: str, fileobj):
+        """Stream an object into a writable file object without holding it in memory"""
+        metrics.inc('backend_round_trips_total', backend='minio', op='get_object')
+        response = self.client.get_object(bucket_name, object_name)
+        try:
+            for chunk in response.stream(1024 * 1024):
+                fileobj.write(chunk)
+        finally:
+            response.close()
+            response.release_conn()
+    
     def upload_file(self, file_path, object_name=None):
         """Upload a file to MinIO"""
         if object_name is None:
@@ -139,7 +222,6 @@ class MinioClient:
     def get_presigned_url(self, object_name, expires=3600):
         """Get a presigned URL for an object"""
         try:
-            from datetime import timedelta
             url = self.client.presigned_get_object(
                 self.bucket_name,
                 object_name,
@@ -149,3 +231,7 @@ class MinioClient:
         except S3Error as e:
             print(f"Error generating presigned URL: {e}")
             raise
+    
+    def ping(self):
+        """Readiness check; raises when the server is unreachable"""
+        self.client.bucket_exists(self.bucket_name)
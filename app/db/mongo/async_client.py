@@ -0,0 +1,89 @@
+import os
+from app.utils.metrics import registry as metrics
+
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+except ImportError:
+    AsyncIOMotorClient = None
+
+
+class AsyncMongoClient:
+    """MongoClient's method surface on motor (IO_BACKEND=async)"""
+
+    def __init__(self):
+        if AsyncIOMotorClient is None:
+            raise RuntimeError('IO_BACKEND=async requires motor (pip install motor)')
+        mongo_user = os.getenv("MONGO_USER", "admin")
+        mongo_pass = os.getenv("MONGO_PASS", "password")
+        mongo_host = os.getenv("MONGO_HOST", "localhost")
+        mongo_port = os.getenv("MONGO_PORT", "27017")
+        mongo_db = os.getenv("MONGO_DB", "main")
+
+        # Motor connects lazily, so building the client does no I/O
+        self.client = AsyncIOMotorClient(
+            f"mongodb://{mongo_user}:{mongo_pass}@{mongo_host}:{mongo_port}/",
+            serverSelectionTimeoutMS=int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+        )
+        self.db = self.client[mongo_db]
+
+    def get_collection(self, collection_name):
+        """Get a collection from the database (its methods are coroutines)"""
+        return self.db[collection_name]
+
+    async def insert_one(self, collection_name, document):
+        """Insert a single document"""
+        metrics.inc('backend_round_trips_total', backend='mongo', op='insert_one')
+        return await self.get_collection(collection_name).insert_one(document)
+
+    async def insert_many(self, collection_name, documents):
+        """Insert documents in one batch"""
+        metrics.inc('backend_round_trips_total', backend='mongo', op='insert_many')
+        return await self.get_collection(collection_name).insert_many(documents)
+
+    async def find_one(self, collection_name, query):
+        """Find a single document"""
+        metrics.inc('backend_round_trips_total', backend='mongo', op='find_one')
+        return await self.get_collection(collection_name).find_one(query)
+
+    async def update_one(self, collection_name, query, update):
+        """Update a single document"""
+        metrics.inc('backend_round_trips_total', backend='mongo', op='update_one')
+        return await self.get_collection(collection_name).update_one(query, {"$set": update})
+
+    async def delete_one(self, collection_name, query):
+        """Delete a single document"""
+        metrics.inc('backend_round_trips_total', backend='mongo', op='delete_one')
+        return await self.get_collection(collection_name).delete_one(query)
+
+    async def create_index(self, collection_name, keys, **kwargs):
+        """Create an index from a list of (field, direction) pairs, returns its name"""
+        metrics.inc('backend_round_trips_total', backend='mongo', op='create_index')
+        return await self.get_collection(collection_name).create_index(keys, **kwargs)
+
+    async def create_validator(self, collection_name, validator):
+        """Create or update collection validator for schema validation"""
+        metrics.inc('backend_round_trips_total', backend='mongo', op='create_validator')
+        try:
+            await self.db.create_collection(collection_name)
+        except Exception:
+            # Collection already exists
+            pass
+        try:
+            await self.db.command({
+                'collMod': collection_name,
+                'validator': validator,
+                'validationLevel': 'moderate'
+            })
+        except Exception:
+            try:
+                await self.db.create_collection(collection_name, validator=validator)
+            except Exception:
+                pass
+
+    async def ping(self):
+        """Readiness check; raises when the server is unreachable"""
+        await self.client.admin.command('ping')
+
+    async def close(self):
+        """Close the connection"""
+        self.client.close()
@@ -1,5 +1,6 @@
 import os
 from pymongo import MongoClient as PyMongoClient
+from app.utils.metrics import registry as metrics
 
 class MongoClient:
     def __init__(self):
@@ -12,7 +13,10 @@ class MongoClient:
         # Connection string with authentication
         connection_string = f"mongodb://{mongo_user}:{mongo_pass}@{mongo_host}:{mongo_port}/"
         
-        self.client = PyMongoClient(connection_string)
+        self.client = PyMongoClient(
+            connection_string,
+            serverSelectionTimeoutMS=int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+        )
         self.db = self.client[mongo_db]
     
     def get_collection(self, collection_name):
@@ -21,34 +25,61 @@ class MongoClient:
     
     def insert_one(self, collection_name, document):
         """Insert a single document"""
+        metrics.inc('backend_round_trips_total', backend='mongo', op='insert_one')
         collection = self.get_collection(collection_name)
         return collection.insert_one(document)
     
+    def insert_many(self, collection_name, documents):
+        """Insert documents in one batch"""
+        metrics.inc('backend_round_trips_total', backend='mongo', op='insert_many')
+        collection = self.get_collection(collection_name)
+        return collection.insert_many(documents)
+    
     def find_one(self, collection_name, query):
         """Find a single document"""
+        metrics.inc('backend_round_trips_total', backend='mongo', op='find_one')
         collection = self.get_collection(collection_name)
         return collection.find_one(query)
     
-    def find_many(self, collection_name, query, limit=None):
+    def find_many(self, collection_name, query, limit=None, projection=None):
         """Find multiple documents"""
+        return list(self.iter_find(collection_name, query, projection=projection, limit=limit))
+    
+    def iter_find(self, collection_name, query, projection=None, sort=None, batch_size=1000, limit=None):
+        """
+        Lazily iterate matching documents
+        Projection and sort run on the server; documents arrive batch_size at a time
+        """
+        metrics.inc('backend_round_trips_total', backend='mongo', op='find')
         collection = self.get_collection(collection_name)
-        cursor = collection.find(query)
+        cursor = collection.find(query, projection=projection, batch_size=batch_size)
+        if sort:
+            cursor = cursor.sort(sort)
         if limit:
             cursor = cursor.limit(limit)
-        return list(cursor)
+        return cursor
     
     def update_one(self, collection_name, query, update):
         """Update a single document"""
+        metrics.inc('backend_round_trips_total', backend='mongo', op='update_one')
         collection = self.get_collection(collection_name)
         return collection.update_one(query, {"$set": update})
     
     def delete_one(self, collection_name, query):
         """Delete a single document"""
+        metrics.inc('backend_round_trips_total', backend='mongo', op='delete_one')
         collection = self.get_collection(collection_name)
         return collection.delete_one(query)
     
+    def create_index(self, collection_name, keys, **kwargs):
+        """Create an index from a list of (field, direction) pairs, returns its name"""
+        metrics.inc('backend_round_trips_total', backend='mongo', op='create_index')
+        collection = self.get_collection(collection_name)
+        return collection.create_index(keys, **kwargs)
+    
     def create_validator(self, collection_name, validator):
         """Create or update collection validator for schema validation"""
+        metrics.inc('backend_round_trips_total', backend='mongo', op='create_validator')
         try:
             # Try to create collection
             self.db.create_collection(collection_name)
@@ -74,3 +105,7 @@ class MongoClient:
     def close(self):
         """Close the connection"""
         self.client.close()
+
+    def ping(self):
+        """Readiness check; raises when the server is unreachable"""
+        self.client.admin.command('ping')
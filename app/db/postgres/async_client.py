@@ -0,0 +1,178 @@
+import asyncio
+import io
+import os
+import re
+import json
+import uuid
+from functools import lru_cache
+from app.db.postgres.client import PostgresClient, LIST_TABLES_SQL
+from app.utils.metrics import registry as metrics
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+_PLACEHOLDER = re.compile(r'%%|%s')
+
+
+@lru_cache(maxsize=1024)
+def to_dollar_params(query: str) -> str:
+    """Rewrite psycopg2 %s placeholders as asyncpg's $1, $2, ... (%% becomes %)"""
+    count = 0
+
+    def number(match):
+        nonlocal count
+        if match.group() == '%%':
+            return '%'
+        count += 1
+        return f'${count}'
+
+    return _PLACEHOLDER.sub(number, query)
+
+
+class AsyncPostgresClient:
+    """
+    PostgresClient's method surface on an asyncpg pool (IO_BACKEND=async)
+    Queries keep the %s placeholders used everywhere else; rows come back as tuples.
+    The pool opens on first use, inside the event loop that awaits it.
+    """
+
+    def __init__(self):
+        if asyncpg is None:
+            raise RuntimeError('IO_BACKEND=async requires asyncpg (pip install asyncpg)')
+        self.connect_kwargs = {
+            'host': os.getenv("PG_HOST", "localhost"),
+            'port': int(os.getenv("PG_PORT", "5432")),
+            'user': os.getenv("PG_USER", "postgres"),
+            'password': os.getenv("PG_PASS", "password"),
+            'database': os.getenv("PG_DB", "main"),
+            'timeout': float(os.getenv("PG_CONNECT_TIMEOUT", "5")),
+        }
+        self.min_size = int(os.getenv("PG_POOL_MIN", "2"))
+        self.max_size = int(os.getenv("PG_POOL_MAX", "20"))
+        self._pool = None
+        self._pool_lock = asyncio.Lock()
+
+    @staticmethod
+    async def _init_connection(conn):
+        # Same JSON handling as psycopg2's Json adapter: dicts and lists go to json/jsonb columns
+        for name in ('json', 'jsonb'):
+            await conn.set_type_codec(name, encoder=json.dumps, decoder=json.loads, schema='pg_catalog')
+
+    async def pool(self):
+        if self._pool is None:
+            async with self._pool_lock:
+                if self._pool is None:
+                    self._pool = await asyncpg.create_pool(
+                        min_size=self.min_size, max_size=self.max_size,
+                        init=self._init_connection, **self.connect_kwargs
+                    )
+        return self._pool
+
+    async def execute(self, query, params=None):
+        metrics.inc('backend_round_trips_total', backend='postgres', op='execute')
+        pool = await self.pool()
+        if params:
+            await pool.execute(to_dollar_params(query), *params)
+        else:
+            # Without arguments asyncpg uses the simple protocol, so multi-statement scripts work
+            await pool.execute(query.replace('%%', '%'))
+
+    async def fetch_one(self, query, params=None):
+        metrics.inc('backend_round_trips_total', backend='postgres', op='fetch_one')
+        row = await (await self.pool()).fetchrow(to_dollar_params(query), *(params or ()))
+        return tuple(row) if row is not None else None
+
+    async def fetch_all(self, query, params=None):
+        """Run a query and return every row"""
+        metrics.inc('backend_round_trips_total', backend='postgres', op='fetch_all')
+        rows = await (await self.pool()).fetch(to_dollar_params(query), *(params or ()))
+        return [tuple(r) for r in rows]
+
+    async def insert_many(self, table_name, columns, rows, page_size=1000):
+        """
+        Insert rows, returns row count
+        Sent as a text-format COPY so ISO datetime and UUID strings are parsed by the server,
+        as with psycopg2's literal INSERTs (asyncpg's binary parameters would reject them)
+        """
+        if not rows:
+            return 0
+        metrics.inc('backend_round_trips_total', backend='postgres', op='insert_many')
+        async with (await self.pool()).acquire() as conn:
+            await self._copy(conn, table_name, columns, rows)
+        return len(rows)
+
+    async def copy_tables(self, loads):
+        """
+        Bulk load several tables with COPY in a single transaction, in the given order
+        loads: list of (table_name, columns, rows) tuples; rows are value tuples
+        """
+        async with (await self.pool()).acquire() as conn:
+            async with conn.transaction():
+                for table_name, columns, rows in loads:
+                    if rows:
+                        metrics.inc('backend_round_trips_total', backend='postgres', op='copy')
+                        await self._copy(conn, table_name, columns, rows)
+
+    async def merge_rows(self, table_name, columns, rows, key_columns):
+        """
+        Upsert rows on key_columns through a temporary staging table, see PostgresClient.merge_rows
+        Returns: (inserted, updated)
+        """
+        if not rows:
+            return 0, 0
+        staging = f'_stage_{uuid.uuid4().hex[:16]}'
+        cols_sql = ', '.join(f'"{c}"' for c in columns)
+        metrics.inc('backend_round_trips_total', 3, backend='postgres', op='merge')
+        async with (await self.pool()).acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(f'CREATE TEMP TABLE "{staging}" ON COMMIT DROP AS SELECT {cols_sql} FROM "{table_name}" WITH NO DATA')
+                await self._copy(conn, staging, columns, rows)
+                inserted, updated = await conn.fetchrow(PostgresClient.merge_sql(table_name, staging, columns, key_columns))
+        return inserted, updated
+
+    @staticmethod
+    async def _copy(conn, table_name, columns, rows):
+        buf = io.BytesIO()
+        for row in rows:
+            buf.write('\t'.join(PostgresClient._copy_value(v) for v in row).encode('utf-8'))
+            buf.write(b'\n')
+        buf.seek(0)
+        await conn.copy_to_table(table_name, source=buf, columns=list(columns), format='text')
+
+    async def fetch_table_columns(self, table_name):
+        """Fetch column names and types for a table of the public schema, in column order"""
+        rows = await self.fetch_all(
+            "SELECT column_name, data_type FROM information_schema.columns WHERE table_schema = 'public' AND table_name = %s "
+            "ORDER BY ordinal_position",
+            (table_name,)
+        )
+        return {row[0]: row[1] for row in rows}
+
+    async def list_tables(self):
+        """List all tables in public schema; partitions are left out, their parent is listed"""
+        rows = await self.fetch_all(LIST_TABLES_SQL)
+        return [r[0] for r in rows]
+
+    async def ensure_base_schema(self):
+        """Run base schema file to create users table and extensions; returns False when it failed"""
+        schema_path = os.path.join(os.path.dirname(__file__), 'base_schema.sql')
+        try:
+            if os.path.exists(schema_path):
+                with open(schema_path, 'r') as f:
+                    await (await self.pool()).execute(f.read())
+            return True
+        except Exception as e:
+            print(f"Warning: Could not load base schema: {e}")
+            return False
+
+    async def ping(self):
+        """Readiness check; raises when no pooled connection can be used"""
+        await (await self.pool()).fetchval('SELECT 1')
+
+    async def close(self):
+        """Close the pool"""
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
@@ -5,4 +5,54 @@ CREATE TABLE IF NOT EXISTS users (
     email_id TEXT UNIQUE NOT NULL,
     hashed_pass TEXT NOT NULL,
     created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
-);
\ No newline at end of file
+);
+
+-- Parquet export schedules; watermark holds the last exported value as JSON text
+CREATE TABLE IF NOT EXISTS export_jobs (
+    job_id UUID PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    source_type TEXT NOT NULL,
+    source TEXT NOT NULL,
+    watermark_column TEXT,
+    watermark TEXT,
+    interval_seconds INTEGER NOT NULL,
+    next_run_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    last_run_at TIMESTAMP WITH TIME ZONE,
+    last_object TEXT,
+    last_error TEXT
+);
+
+-- Files clients upload straight to MinIO (POST /v1/uploads/initiate); result holds the processing outcome
+CREATE TABLE IF NOT EXISTS direct_uploads (
+    upload_id UUID PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    object_key TEXT UNIQUE NOT NULL,
+    filename TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    content_type TEXT NOT NULL,
+    size BIGINT NOT NULL,
+    multipart_id TEXT,
+    ingest_mode TEXT,
+    merge_key TEXT,
+    status TEXT NOT NULL DEFAULT 'initiated',
+    result JSONB,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    completed_at TIMESTAMP WITH TIME ZONE,
+    processed_at TIMESTAMP WITH TIME ZONE
+);
+
+-- Full-text index of the text files stored in MinIO (GET /v1/search); btree_gin lets one GIN
+-- index cover the user filter and the words
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+
+CREATE TABLE IF NOT EXISTS text_documents (
+    object_key TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    content_type TEXT NOT NULL,
+    size BIGINT NOT NULL,
+    document TSVECTOR NOT NULL,
+    indexed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS text_documents_user_document_idx ON text_documents USING GIN (user_id, document);
@@ -1,5 +1,20 @@
 import psycopg2
 import os
+import io
+import json
+import hashlib
+import threading
+import uuid
+from psycopg2.extras import Json, execute_values
+from app.utils.metrics import registry as metrics
+
+# Tables, views and partitioned parents of the public schema, without the partitions themselves
+LIST_TABLES_SQL = (
+    "SELECT c.relname FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+    "WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p', 'v', 'm', 'f') AND NOT c.relispartition"
+)
+# SQLSTATE of "cached plan must not change result type"
+FEATURE_NOT_SUPPORTED = '0A000'
 
 class PostgresClient:
     def __init__(self):
@@ -7,36 +22,235 @@ class PostgresClient:
             host=os.getenv("PG_HOST", "localhost"),
             user=os.getenv("PG_USER", "postgres"),
             password=os.getenv("PG_PASS", "password"),
-            database=os.getenv("PG_DB", "main")
+            database=os.getenv("PG_DB", "main"),
+            connect_timeout=int(os.getenv("PG_CONNECT_TIMEOUT", "5"))
         )
         self.conn.autocommit = True
+        self._prepared = set()
+        self._prepare_lock = threading.Lock()
 
     def execute(self, query, params=None):
+        metrics.inc('backend_round_trips_total', backend='postgres', op='execute')
         with self.conn.cursor() as cur:
             cur.execute(query, params)
 
     def fetch_one(self, query, params=None):
+        metrics.inc('backend_round_trips_total', backend='postgres', op='fetch_one')
         with self.conn.cursor() as cur:
             cur.execute(query, params)
             return cur.fetchone()
 
+    def fetch_all(self, query, params=None):
+        """Run a query and return every row"""
+        metrics.inc('backend_round_trips_total', backend='postgres', op='fetch_all')
+        with self.conn.cursor() as cur:
+            cur.execute(query, params)
+            return cur.fetchall()
+
+    def fetch_prepared(self, query, params=()):
+        """
+        Run a %s-parameterized SELECT as a server-side prepared statement and fetch all rows
+        Each query shape is PREPAREd once per connection and then only EXECUTEd
+        A statement whose result type changed since it was prepared (a column retyped by a
+        later upload) is deallocated and prepared again
+        Returns: (column_names, rows)
+        """
+        name = 'q_' + hashlib.md5(query.encode('utf-8')).hexdigest()[:16]
+        with self._prepare_lock:
+            try:
+                return self._execute_prepared(name, query, params)
+            except psycopg2.Error as e:
+                # "cached plan must not change result type"
+                if e.pgcode != FEATURE_NOT_SUPPORTED or name not in self._prepared:
+                    raise
+                with self.conn.cursor() as cur:
+                    cur.execute(f'DEALLOCATE {name}')
+                self._prepared.discard(name)
+                return self._execute_prepared(name, query, params)
+
+    def _execute_prepared(self, name, query, params):
+        with self.conn.cursor() as cur:
+            if name not in self._prepared:
+                numbered = query
+                for i in range(1, len(params) + 1):
+                    numbered = numbered.replace('%s', f'${i}', 1)
+                metrics.inc('backend_round_trips_total', backend='postgres', op='prepare')
+                cur.execute(f'PREPARE {name} AS {numbered}')
+                self._prepared.add(name)
+            metrics.inc('backend_round_trips_total', backend='postgres', op='execute_prepared')
+            if params:
+                cur.execute(f'EXECUTE {name} ({", ".join(["%s"] * len(params))})', params)
+            else:
+                cur.execute(f'EXECUTE {name}')
+            return [d[0] for d in cur.description], cur.fetchall()
+
+    def stream(self, query, params=None, itersize=2000):
+        """
+        Stream a SELECT through a named server-side cursor, itersize rows per round trip
+        Uses a transaction on this connection, so the client must not be shared while streaming
+        Yields the column names first, then one row tuple at a time
+        """
+        self.conn.autocommit = False
+        try:
+            with self.conn.cursor(name=f'stream_{uuid.uuid4().hex}') as cur:
+                cur.itersize = itersize
+                cur.execute(query, params)
+                first = cur.fetchmany(itersize)
+                metrics.inc('backend_round_trips_total', backend='postgres', op='stream_fetch')
+                yield [d[0] for d in cur.description]
+                yield from first
+                while True:
+                    batch = cur.fetchmany(itersize)
+                    if not batch:
+                        break
+                    metrics.inc('backend_round_trips_total', backend='postgres', op='stream_fetch')
+                    yield from batch
+        finally:
+            self.conn.rollback()
+            self.conn.autocommit = True
+
+    def close(self):
+        """Close the connection"""
+        self.conn.close()
+
+    def ping(self):
+        """Readiness check; raises when the connection is unusable"""
+        with self.conn.cursor() as cur:
+            cur.execute('SELECT 1')
+
+    def insert_many(self, table_name, columns, rows, page_size=1000):
+        """Insert rows in batched multi-row INSERT statements, returns row count"""
+        if not rows:
+            return 0
+        cols_sql = ', '.join(f'"{c}"' for c in columns)
+        query = f'INSERT INTO "{table_name}" ({cols_sql}) VALUES %s'
+        values = [tuple(self._adapt(v) for v in row) for row in rows]
+        metrics.inc('backend_round_trips_total', (len(values) + page_size - 1) // page_size, backend='postgres', op='insert_many')
+        with self.conn.cursor() as cur:
+            execute_values(cur, query, values, page_size=page_size)
+        return len(values)
+
+    def copy_tables(self, loads):
+        """
+        Bulk load several tables with COPY in a single transaction, in the given order
+        loads: list of (table_name, columns, rows) tuples; rows are value tuples
+        """
+        self.conn.autocommit = False
+        try:
+            with self.conn.cursor() as cur:
+                for table_name, columns, rows in loads:
+                    if not rows:
+                        continue
+                    cols_sql = ', '.join(f'"{c}"' for c in columns)
+                    metrics.inc('backend_round_trips_total', backend='postgres', op='copy')
+                    cur.copy_expert(f'COPY "{table_name}" ({cols_sql}) FROM STDIN', self._copy_buffer(rows))
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            self.conn.autocommit = True
+
+    def merge_rows(self, table_name, columns, rows, key_columns):
+        """
+        Upsert rows on key_columns (covered by a unique index) through a temporary staging table:
+        COPY into the stage, then one INSERT ... ON CONFLICT DO UPDATE that skips rows whose
+        values are all unchanged, so they are not rewritten
+        rows must not repeat a key; returns (inserted, updated)
+        """
+        if not rows:
+            return 0, 0
+        staging = f'_stage_{uuid.uuid4().hex[:16]}'
+        cols_sql = ', '.join(f'"{c}"' for c in columns)
+        self.conn.autocommit = False
+        try:
+            with self.conn.cursor() as cur:
+                # Same column types as the target, dropped at commit
+                cur.execute(f'CREATE TEMP TABLE "{staging}" ON COMMIT DROP AS SELECT {cols_sql} FROM "{table_name}" WITH NO DATA')
+                cur.copy_expert(f'COPY "{staging}" ({cols_sql}) FROM STDIN', self._copy_buffer(rows))
+                cur.execute(self.merge_sql(table_name, staging, columns, key_columns))
+                inserted, updated = cur.fetchone()
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            self.conn.autocommit = True
+        metrics.inc('backend_round_trips_total', 3, backend='postgres', op='merge')
+        return inserted, updated
+
+    @staticmethod
+    def merge_sql(table_name, staging, columns, key_columns):
+        """
+        INSERT ... ON CONFLICT upsert from a staging table, returning (inserted, updated) counts
+        (xmax = 0 only for rows the statement inserted)
+        """
+        cols_sql = ', '.join(f'"{c}"' for c in columns)
+        keys_sql = ', '.join(f'"{c}"' for c in key_columns)
+        values = [c for c in columns if c not in key_columns]
+        if values:
+            assignments = ', '.join(f'"{c}" = EXCLUDED."{c}"' for c in values)
+            current = ', '.join(f'target."{c}"' for c in values)
+            incoming = ', '.join(f'EXCLUDED."{c}"' for c in values)
+            action = f'DO UPDATE SET {assignments} WHERE ({current}) IS DISTINCT FROM ({incoming})'
+        else:
+            action = 'DO NOTHING'
+        return (
+            f'WITH merged AS ('
+            f'INSERT INTO "{table_name}" AS target ({cols_sql}) SELECT {cols_sql} FROM "{staging}" '
+            f'ON CONFLICT ({keys_sql}) {action} RETURNING (xmax = 0) AS inserted) '
+            f'SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM merged'
+        )
+
+    @classmethod
+    def _copy_buffer(cls, rows):
+        """Rows in COPY text format, ready to be read by copy_expert"""
+        buf = io.StringIO()
+        for row in rows:
+            buf.write('\t'.join(cls._copy_value(v) for v in row))
+            buf.write('\n')
+        buf.seek(0)
+        return buf
+
+    @staticmethod
+    def _copy_value(value):
+        """Encode a value in COPY text format"""
+        if value is None:
+            return '\\N'
+        if isinstance(value, bool):
+            return 't' if value else 'f'
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value)
+        return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+                .replace('\n', '\\n').replace('\r', '\\r'))
+
+    @staticmethod
+    def _adapt(value):
+        """Wrap nested values so psycopg2 can send them to JSONB columns"""
+        if isinstance(value, (dict, list)):
+            return Json(value)
+        return value
+
     def fetch_table_columns(self, table_name):
-        """Fetch column names and types for a table"""
+        """Fetch column names and types for a table of the public schema, in column order"""
+        metrics.inc('backend_round_trips_total', backend='postgres', op='fetch_table_columns')
         with self.conn.cursor() as cur:
             cur.execute(
-                "SELECT column_name, data_type FROM information_schema.columns WHERE table_name = %s",
+                "SELECT column_name, data_type FROM information_schema.columns WHERE table_schema = 'public' AND table_name = %s "
+                "ORDER BY ordinal_position",
                 (table_name,)
             )
             return {row[0]: row[1] for row in cur.fetchall()}
 
     def list_tables(self):
-        """List all tables in public schema"""
+        """List all tables in public schema; partitions are left out, their parent is listed"""
+        metrics.inc('backend_round_trips_total', backend='postgres', op='list_tables')
         with self.conn.cursor() as cur:
-            cur.execute("SELECT table_name FROM information_schema.tables WHERE table_schema='public'")
+            cur.execute(LIST_TABLES_SQL)
             return [r[0] for r in cur.fetchall()]
 
     def ensure_base_schema(self):
-        """Run base schema file to create users table and extensions"""
+        """Run base schema file to create users table and extensions; returns False when it failed"""
         cur = self.conn.cursor()
         try:
             schema_path = os.path.join(os.path.dirname(__file__), 'base_schema.sql')
@@ -44,7 +258,9 @@ class PostgresClient:
                 with open(schema_path, 'r') as f:
                     cur.execute(f.read())
                 self.conn.commit()
+            return True
         except Exception as e:
             print(f"Warning: Could not load base schema: {e}")
+            return False
         finally:
             cur.close()
\ No newline at end of file
@@ -1,7 +1,63 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from app.api.v1.routes.register import router as register_router
 from app.api.v1.routes.upload import router as upload_router
+from app.api.v1.routes.direct_uploads import router as direct_uploads_router
+from app.api.v1.routes.metrics import router as metrics_router
+from app.api.v1.routes.tables import router as tables_router
+from app.api.v1.routes.collections import router as collections_router
+from app.api.v1.routes.exports import router as exports_router
+from app.api.v1.routes.search import router as search_router
+from app.api.v1.routes.health import router as health_router
+from app.api.v1.routes import upload
+from app.db import clients
+from app.services.export_service import parquet_exporter
+from app.services.export_service.jobs import POLL_SECONDS, scheduler_loop
+from app.services.search_service import text_index
+from app.services.spool import journal
+from app.services.spool.drainer import drainer_loop
+from app.utils.responses.fast_json import FastJSONResponse
 
-app = FastAPI()
+# Open this worker's clients in parallel before serving; off = connect on first request
+STARTUP_WARMUP = os.getenv('STARTUP_WARMUP', 'true').lower() == 'true'
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs in every worker after gunicorn forks, so each process opens its own connections.
+    # A backend that is down does not stop startup; /readyz reports it until it is back
+    if STARTUP_WARMUP:
+        status = await clients.warm_up()
+        if all(v == 'ok' for v in status.values()):
+            await run_in_threadpool(upload.get_media_processor)
+
+    # Scheduled Parquet exports; disabled without pyarrow or with EXPORT_SCHEDULER_POLL_SECONDS=0
+    scheduler = None
+    if parquet_exporter.available() and POLL_SECONDS > 0:
+        scheduler = asyncio.create_task(scheduler_loop(POLL_SECONDS))
+    # Replays writes spooled while a backend was unreachable; disabled with an empty SPOOL_DIR
+    drainer = asyncio.create_task(drainer_loop()) if journal.SPOOL_DIR else None
+    try:
+        yield
+    finally:
+        if scheduler is not None:
+            scheduler.cancel()
+        if drainer is not None:
+            drainer.cancel()
+        # Documents still queued for the full-text index are written before the clients close
+        await run_in_threadpool(text_index.shutdown)
+        clients.close_all()
+        await clients.close_all_async()
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
 app.include_router(register_router, prefix="/v1")
-app.include_router(upload_router, prefix="/v1")
\ No newline at end of file
+app.include_router(upload_router, prefix="/v1")
+app.include_router(direct_uploads_router, prefix="/v1")
+app.include_router(tables_router, prefix="/v1")
+app.include_router(collections_router, prefix="/v1")
+app.include_router(exports_router, prefix="/v1")
+app.include_router(search_router, prefix="/v1")
+app.include_router(metrics_router)
+app.include_router(health_router)
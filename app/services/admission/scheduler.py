@@ -0,0 +1,263 @@
+"""
+Admission control and fair scheduling of upload jobs across users
+
+Every upload job takes one of UPLOAD_WORKERS slots for as long as it runs:
+- A per-user token bucket refills QUOTA_BYTES_PER_SEC up to QUOTA_BURST_BYTES. A job is
+  admitted while the bucket is not in debt and is charged its full size, so one large upload
+  gets in and then holds its user back until the bucket has refilled
+- At most QUOTA_CONCURRENT_JOBS jobs of a user run at once, and up to QUOTA_QUEUED_JOBS more wait
+- Free slots go to waiting jobs in weighted fair queuing order (start-time fair queuing):
+  a job's start tag is max(virtual time, its user's last finish tag), its finish tag the start
+  plus (size + JOB_OVERHEAD_BYTES) / weight, and the lowest start tag runs next. A user with a
+  backlog of large jobs cannot push other users' jobs back, and TENANT_WEIGHTS gives some
+  users a larger share
+
+A job that is not admitted raises QuotaExceeded with a retry_after hint in seconds (429 and
+Retry-After at the routes); background jobs wait instead. State lives on the event loop of
+one worker process.
+
+Metrics carry a tenant label: the user id for users listed in TENANT_WEIGHTS, 'other' for
+everyone else, since user ids come from clients and would make label sets unbounded.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict
+from app.utils.metrics import registry as metrics
+
+# 0 disables the scheduler: every job runs immediately
+UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', '32'))
+# 0 disables the byte quota
+QUOTA_BYTES_PER_SEC = float(os.getenv('QUOTA_BYTES_PER_SEC', str(20 * 1024 * 1024)))
+QUOTA_BURST_BYTES = float(os.getenv('QUOTA_BURST_BYTES', str(256 * 1024 * 1024)))
+QUOTA_CONCURRENT_JOBS = int(os.getenv('QUOTA_CONCURRENT_JOBS', '4'))
+QUOTA_QUEUED_JOBS = int(os.getenv('QUOTA_QUEUED_JOBS', '32'))
+QUOTA_MAX_WAIT_SECONDS = float(os.getenv('QUOTA_MAX_WAIT_SECONDS', '30'))
+# Added to every job's size, so a stream of tiny uploads still costs its share
+JOB_OVERHEAD_BYTES = 256 * 1024
+# Idle users are forgotten past this many tracked users (once their bucket is full again)
+MAX_TRACKED_USERS = 10000
+# Metric label of the users not listed in TENANT_WEIGHTS
+OTHER_TENANT = 'other'
+
+
+def parse_weights(value: str) -> Dict[str, float]:
+    """'alice=4,bob=2' -> {'alice': 4.0, 'bob': 2.0}; users not listed weigh 1"""
+    weights = {}
+    for item in (value or '').split(','):
+        if not item.strip():
+            continue
+        user_id, _, weight = item.partition('=')
+        weights[user_id.strip()] = float(weight)
+    return weights
+
+
+class QuotaExceeded(Exception):
+    """Raised when a job is not admitted; retry_after is a hint in seconds"""
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        """Whole seconds for the Retry-After header, at least 1"""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """rate tokens per second up to capacity; take() may drive the bucket into debt"""
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.tokens
+
+    def wait_time(self) -> float:
+        """Seconds until the bucket is out of debt, 0 when it admits now"""
+        tokens = self.refill()
+        return 0.0 if tokens >= 0 else -tokens / self.rate
+
+    def take(self, amount: float):
+        self.refill()
+        self.tokens -= amount
+
+
+class _Job:
+    __slots__ = ('start_tag', 'future', 'enqueued_at')
+
+    def __init__(self, start_tag: float):
+        self.start_tag = start_tag
+        self.future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.monotonic()
+
+
+class _User:
+    def __init__(self, user_id: str, tenant: str, weight: float, bucket: TokenBucket):
+        self.user_id = user_id
+        self.tenant = tenant
+        self.weight = weight
+        self.bucket = bucket
+        self.queue = deque()
+        self.running = 0
+        self.finish_tag = 0.0
+        # Moving average of job run time, for Retry-After hints
+        self.avg_seconds = 1.0
+
+    @property
+    def idle(self) -> bool:
+        return not self.queue and not self.running
+
+
+class UploadScheduler:
+    """Worker slots shared by all users' upload jobs, see the module docstring"""
+
+    def __init__(self, workers: int = None, bytes_per_sec: float = None, burst_bytes: float = None,
+                 concurrent_jobs: int = None, queued_jobs: int = None, max_wait: float = None,
+                 weights: Dict[str, float] = None):
+        self.workers = UPLOAD_WORKERS if workers is None else workers
+        self.bytes_per_sec = QUOTA_BYTES_PER_SEC if bytes_per_sec is None else bytes_per_sec
+        self.burst_bytes = QUOTA_BURST_BYTES if burst_bytes is None else burst_bytes
+        self.concurrent_jobs = QUOTA_CONCURRENT_JOBS if concurrent_jobs is None else concurrent_jobs
+        self.queued_jobs = QUOTA_QUEUED_JOBS if queued_jobs is None else queued_jobs
+        self.max_wait = QUOTA_MAX_WAIT_SECONDS if max_wait is None else max_wait
+        self.weights = parse_weights(os.getenv('TENANT_WEIGHTS', '')) if weights is None else weights
+        self._users = {}
+        # Users with queued jobs, the candidates of _dispatch
+        self._waiting = set()
+        self._running = 0
+        # Running jobs per metric tenant label
+        self._running_by_tenant = {}
+        # Start tag of the job dispatched last
+        self._vtime = 0.0
+
+    @asynccontextmanager
+    async def admit(self, user_id: str, size: int, wait: bool = False):
+        """
+        Hold a worker slot for one job of size bytes
+        Raises QuotaExceeded when the user's byte quota is in debt, their queue is full or
+        no slot freed up within max_wait; with wait=True (background jobs) it waits instead
+        """
+        if self.workers <= 0:
+            yield
+            return
+        user = self._user(user_id)
+        await self._acquire(user, size, wait)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(user, time.monotonic() - started)
+
+    def _user(self, user_id: str) -> _User:
+        user = self._users.get(user_id)
+        if user is None:
+            if len(self._users) >= MAX_TRACKED_USERS:
+                self._forget_idle()
+            tenant = user_id if user_id in self.weights else OTHER_TENANT
+            user = self._users[user_id] = _User(
+                user_id, tenant, self.weights.get(user_id, 1.0), TokenBucket(self.bytes_per_sec, self.burst_bytes)
+            )
+        return user
+
+    def _forget_idle(self):
+        for user_id, user in list(self._users.items()):
+            if user.idle and (self.bytes_per_sec <= 0 or user.bucket.refill() >= user.bucket.capacity):
+                del self._users[user_id]
+
+    def _retry_after(self, user: _User) -> float:
+        """Time for the user's running and queued jobs to drain at their concurrency"""
+        return user.avg_seconds * max(1, len(user.queue) + user.running) / max(1, self.concurrent_jobs)
+
+    def _reject(self, user: _User, reason: str, message: str, retry_after: float):
+        metrics.inc('scheduler_rejected_total', tenant=user.tenant, reason=reason)
+        raise QuotaExceeded(message, retry_after)
+
+    async def _acquire(self, user: _User, size: int, wait: bool):
+        if not wait and len(user.queue) >= self.queued_jobs:
+            self._reject(user, 'queue', f"Too many uploads queued for user '{user.user_id}'", self._retry_after(user))
+        if self.bytes_per_sec > 0:
+            delay = user.bucket.wait_time()
+            while delay > 0:
+                if not wait:
+                    self._reject(user, 'bytes', f"Upload quota of {self.bytes_per_sec:.0f} bytes/s exceeded "
+                                                f"for user '{user.user_id}'", delay)
+                await asyncio.sleep(delay)
+                delay = user.bucket.wait_time()
+            user.bucket.take(size)
+        metrics.inc('scheduler_admitted_bytes_total', size, tenant=user.tenant)
+
+        job = _Job(max(self._vtime, user.finish_tag))
+        user.finish_tag = job.start_tag + (size + JOB_OVERHEAD_BYTES) / user.weight
+        user.queue.append(job)
+        self._waiting.add(user)
+        self._dispatch()
+        self._observe(user.tenant)
+        try:
+            if wait:
+                await job.future
+            else:
+                # shield: the timeout must not cancel a slot that was just handed over
+                await asyncio.wait_for(asyncio.shield(job.future), self.max_wait)
+        except asyncio.TimeoutError:
+            self._withdraw(user, job)
+            if self.bytes_per_sec > 0:
+                user.bucket.tokens += size
+            self._reject(user, 'wait', f"No upload worker was free within {self.max_wait:g}s", self._retry_after(user))
+        except BaseException:
+            self._withdraw(user, job)
+            raise
+
+    def _withdraw(self, user: _User, job: _Job):
+        """Take back a job whose caller gave up, releasing its slot if it had one"""
+        if job in user.queue:
+            user.queue.remove(job)
+            if not user.queue:
+                self._waiting.discard(user)
+            self._observe(user.tenant)
+        elif job.future.done() and not job.future.cancelled():
+            self._release(user, 0.0)
+
+    def _dispatch(self):
+        """Hand free slots to the queued jobs with the lowest start tags"""
+        while self._running < self.workers:
+            user = min(
+                (u for u in self._waiting if u.running < self.concurrent_jobs),
+                key=lambda u: u.queue[0].start_tag, default=None
+            )
+            if user is None:
+                return
+            job = user.queue.popleft()
+            if not user.queue:
+                self._waiting.discard(user)
+            if job.future.done():
+                # Cancelled while queued
+                continue
+            self._vtime = job.start_tag
+            user.running += 1
+            self._running += 1
+            self._running_by_tenant[user.tenant] = self._running_by_tenant.get(user.tenant, 0) + 1
+            job.future.set_result(None)
+            metrics.observe('scheduler_wait_seconds', time.monotonic() - job.enqueued_at, tenant=user.tenant)
+            self._observe(user.tenant)
+
+    def _release(self, user: _User, seconds: float):
+        user.running -= 1
+        self._running -= 1
+        self._running_by_tenant[user.tenant] -= 1
+        user.avg_seconds = 0.8 * user.avg_seconds + 0.2 * seconds
+        self._dispatch()
+        self._observe(user.tenant)
+
+    def _observe(self, tenant: str):
+        metrics.set_gauge('scheduler_queue_depth', sum(len(u.queue) for u in self._waiting if u.tenant == tenant),
+                          tenant=tenant)
+        metrics.set_gauge('scheduler_running_jobs', self._running_by_tenant.get(tenant, 0), tenant=tenant)
@@ -0,0 +1,112 @@
+import asyncio
+import os
+import uuid
+from typing import Any, Dict, List
+from fastapi.concurrency import run_in_threadpool
+from app.db.postgres.client import PostgresClient
+from app.services.export_service.parquet_exporter import ParquetExporter, encode_watermark, decode_watermark
+from app.utils.metrics import registry as metrics
+
+JOB_COLUMNS = ['job_id', 'user_id', 'source_type', 'source', 'watermark_column', 'watermark',
+               'interval_seconds', 'next_run_at', 'last_run_at', 'last_object', 'last_error']
+POLL_SECONDS = int(os.getenv('EXPORT_SCHEDULER_POLL_SECONDS', '60'))
+
+
+def run_export(exporter: ParquetExporter, user_id: str, source_type: str, source: str,
+               watermark_column: str = None, since: Any = None) -> Dict[str, Any]:
+    """Dispatch one export to the table or collection reader"""
+    if source_type == 'collection':
+        return exporter.export_collection(user_id, watermark_column=watermark_column, since=since)
+    return exporter.export_table(user_id, source, watermark_column=watermark_column, since=since)
+
+
+def create_job(pg: PostgresClient, user_id: str, source_type: str, source: str,
+               watermark_column: str, interval_seconds: int) -> Dict[str, Any]:
+    """Store a recurring export; the scheduler picks it up on its next poll"""
+    row = pg.fetch_one(
+        "INSERT INTO export_jobs (job_id, user_id, source_type, source, watermark_column, interval_seconds) "
+        f"VALUES (%s, %s, %s, %s, %s, %s) RETURNING {', '.join(JOB_COLUMNS)}",
+        (str(uuid.uuid4()), user_id, source_type, source, watermark_column, interval_seconds)
+    )
+    return dict(zip(JOB_COLUMNS, row))
+
+
+def list_jobs(pg: PostgresClient, user_id: str) -> List[Dict[str, Any]]:
+    rows = pg.fetch_all(
+        f"SELECT {', '.join(JOB_COLUMNS)} FROM export_jobs WHERE user_id = %s ORDER BY next_run_at",
+        (user_id,)
+    )
+    return [dict(zip(JOB_COLUMNS, row)) for row in rows]
+
+
+def delete_job(pg: PostgresClient, user_id: str, job_id: str) -> bool:
+    return pg.fetch_one(
+        "DELETE FROM export_jobs WHERE job_id = %s AND user_id = %s RETURNING job_id",
+        (job_id, user_id)
+    ) is not None
+
+
+def claim_due_jobs(pg: PostgresClient) -> List[Dict[str, Any]]:
+    """
+    Take every due job and push its next_run_at forward in one statement
+    SKIP LOCKED lets several API workers poll without running a job twice
+    """
+    rows = pg.fetch_all(
+        "UPDATE export_jobs SET next_run_at = now() + make_interval(secs => interval_seconds) "
+        "WHERE job_id IN (SELECT job_id FROM export_jobs WHERE next_run_at <= now() FOR UPDATE SKIP LOCKED) "
+        f"RETURNING {', '.join(JOB_COLUMNS)}"
+    )
+    return [dict(zip(JOB_COLUMNS, row)) for row in rows]
+
+
+def run_job(pg: PostgresClient, exporter: ParquetExporter, job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run one scheduled export from the job's stored watermark and record the outcome
+    The watermark only advances when rows were exported, so a failed run is retried from the same point
+    """
+    try:
+        result = run_export(
+            exporter, job['user_id'], job['source_type'], job['source'],
+            watermark_column=job['watermark_column'], since=decode_watermark(job['watermark'])
+        )
+    except Exception as e:
+        print(f"Export job {job['job_id']} failed: {e}")
+        metrics.inc('ingest_errors_total', stage='export')
+        pg.execute(
+            "UPDATE export_jobs SET last_run_at = now(), last_error = %s WHERE job_id = %s",
+            (str(e), job['job_id'])
+        )
+        return {'job_id': job['job_id'], 'error': str(e)}
+
+    watermark = encode_watermark(result['watermark']) if result['watermark'] is not None else job['watermark']
+    pg.execute(
+        "UPDATE export_jobs SET last_run_at = now(), last_error = NULL, watermark = %s, "
+        "last_object = COALESCE(%s, last_object) WHERE job_id = %s",
+        (watermark, result['object_key'], job['job_id'])
+    )
+    return {'job_id': job['job_id'], **result}
+
+
+def run_due_jobs() -> int:
+    """One scheduler pass on its own connection; returns the number of jobs run"""
+    pg = PostgresClient()
+    try:
+        jobs = claim_due_jobs(pg)
+        if jobs:
+            exporter = ParquetExporter()
+            for job in jobs:
+                run_job(pg, exporter, job)
+        return len(jobs)
+    finally:
+        pg.close()
+
+
+async def scheduler_loop(poll_seconds: int = POLL_SECONDS):
+    """Background task started from the app lifespan; exports run in the threadpool"""
+    while True:
+        try:
+            await run_in_threadpool(run_due_jobs)
+        except Exception as e:
+            print(f"Warning: export scheduler pass failed: {e}")
+            metrics.inc('ingest_errors_total', stage='export_scheduler')
+        await asyncio.sleep(poll_seconds)
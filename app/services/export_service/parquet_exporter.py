@@ -0,0 +1,269 @@
+import json
+import os
+import tempfile
+import uuid
+from datetime import datetime, date, timezone
+from typing import Any, Dict, Iterator, List, Optional
+from bson import json_util
+from app.db import clients
+from app.db.postgres.client import PostgresClient
+from app.db.mongo.client import MongoClient
+from app.db.minio.client import MinioClient
+from app.services.json_service.infer_type.primitive import infer_primitive
+from app.services.json_service.infer_type.infer_object import infer_object
+from app.services.json_service.infer_type.infer_array import infer_array
+from app.services.json_service.normalizer.normalize_schema import normalize_entities
+from app.services.json_service.table_generator.sql_generator import CATALOG_TYPES
+from app.utils.metrics import registry as metrics
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+def available() -> bool:
+    """True when pyarrow is installed"""
+    return pa is not None
+
+
+def arrow_type(t: str):
+    """Map an inferred type to a Parquet column type (objects and arrays are stored as JSON text)"""
+    if t == 'integer':
+        return pa.int64()
+    if t == 'number':
+        return pa.float64()
+    if t == 'boolean':
+        return pa.bool_()
+    if t == 'datetime':
+        return pa.timestamp('us', tz='UTC')
+    if t == 'date':
+        return pa.date32()
+    return pa.string()
+
+
+def _infer(value):
+    """Recursive inference callback, same dispatch as JsonProcessor.infer_fn"""
+    if isinstance(value, dict):
+        return ('object', infer_object(value, _infer))
+    if isinstance(value, list):
+        return ('array', infer_array(value, _infer))
+    return infer_primitive(value)
+
+
+def _to_datetime(value):
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, str):
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    raise ValueError(f"not a datetime: {value!r}")
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(value)
+
+
+def _to_string(value):
+    return value if isinstance(value, str) else str(value)
+
+
+def _to_json(value):
+    return json.dumps(value, default=str)
+
+
+CONVERTERS = {
+    'integer': int,
+    'number': float,
+    'boolean': bool,
+    'datetime': _to_datetime,
+    'date': _to_date,
+    'object': _to_json,
+    'array': _to_json,
+}
+
+
+class ParquetExporter:
+    """
+    Export an ingested table or a user's Mongo collection to a Parquet object in MinIO
+    Rows are read in batches from a server-side cursor and written row group by row group
+    to a temporary file, so memory stays bounded by the batch size
+    """
+
+    def __init__(self, mongo: MongoClient = None, minio: MinioClient = None):
+        if pa is None:
+            raise RuntimeError("pyarrow is not installed; Parquet export is unavailable")
+        self.mongo = mongo
+        self.minio = minio
+        self.bucket = os.getenv('MINIO_BUCKET', 'user-uploads')
+        self.batch_size = int(os.getenv('EXPORT_BATCH_SIZE', '10000'))
+        self.url_expires = int(os.getenv('DEFAULT_URL_EXPIRES', '3600'))
+
+    def export_table(self, user_id: str, table_name: str, watermark_column: str = None, since: Any = None) -> Dict[str, Any]:
+        """
+        Export a Postgres table; column types come from the table's catalog entry mapped back
+        to the inferred types it was generated from
+
+        Args:
+            watermark_column: Optional column for incremental exports (rows are read in its order)
+            since: Only export rows whose watermark_column is greater than this value
+        """
+        # Dedicated connection: the server-side cursor runs in a transaction
+        pg = PostgresClient()
+        try:
+            catalog = pg.fetch_table_columns(table_name)
+            if not catalog:
+                raise LookupError(f"Table '{table_name}' not found")
+            if watermark_column and watermark_column not in catalog:
+                raise ValueError(f"Unknown watermark column '{watermark_column}'")
+
+            query = f'SELECT * FROM "{table_name}"'
+            params = None
+            if watermark_column:
+                if since is not None:
+                    query += f' WHERE "{watermark_column}" > %s'
+                    params = (since,)
+                query += f' ORDER BY "{watermark_column}"'
+
+            rows = pg.stream(query, params, itersize=self.batch_size)
+            columns = next(rows)
+            types = {c: CATALOG_TYPES.get(catalog.get(c), 'string') for c in columns}
+            records = (dict(zip(columns, row)) for row in rows)
+            return self._export(user_id, table_name, columns, types, records, watermark_column)
+        finally:
+            pg.close()
+
+    def export_collection(self, user_id: str, watermark_column: str = None, since: Any = None) -> Dict[str, Any]:
+        """
+        Export the user's Mongo collection; the column set and types are inferred with
+        normalize_entities over the first batch of documents (later fields are not added)
+        since and the returned watermark are Extended JSON (see to_bson)
+        """
+        mongo = self.mongo or clients.get_mongo()
+        query = {watermark_column: {'$gt': to_bson(since)}} if watermark_column and since is not None else {}
+        sort = [(watermark_column, 1)] if watermark_column else None
+        cursor = mongo.iter_find(user_id, query, sort=sort, batch_size=self.batch_size)
+        try:
+            first = []
+            for document in cursor:
+                first.append(document)
+                if len(first) >= self.batch_size:
+                    break
+
+            sample = {}
+            for document in first:
+                for k, v in document.items():
+                    if sample.get(k) is None:
+                        sample[k] = v
+            if '_id' in sample:
+                sample['_id'] = str(sample['_id'])
+            schema = normalize_entities({'root': sample}, _infer)['root']
+            columns = list(schema['properties'])
+            types = {c: info['type'] for c, info in schema['properties'].items()}
+
+            def records():
+                yield from first
+                yield from cursor
+
+            result = self._export(user_id, 'collection', columns, types, records(), watermark_column)
+            if result['watermark'] is not None:
+                result['watermark'] = from_bson(result['watermark'])
+            return result
+        finally:
+            cursor.close()
+
+    def _export(self, user_id: str, source: str, columns: List[str], types: Dict[str, str],
+                records: Iterator[Dict[str, Any]], watermark_column: Optional[str]) -> Dict[str, Any]:
+        """
+        Write records as Parquet row groups and upload the file
+        Values that do not convert to their column type are stored as null and counted
+        Returns: export summary (object key, presigned URL, rows, new watermark)
+        """
+        schema = pa.schema([(c, arrow_type(types[c])) for c in columns])
+        converters = [CONVERTERS.get(types[c], _to_string) for c in columns]
+        result = {'source': source, 'rows': 0, 'null_coerced': 0, 'object_key': None, 'url': None, 'watermark': None}
+
+        with tempfile.NamedTemporaryFile(suffix='.parquet') as tmp:
+            writer = None
+            batch = [[] for _ in columns]
+            last = None
+            try:
+                for record in records:
+                    for i, column in enumerate(columns):
+                        value = record.get(column)
+                        if value is not None:
+                            try:
+                                value = converters[i](value)
+                            except (TypeError, ValueError):
+                                value = None
+                                result['null_coerced'] += 1
+                        batch[i].append(value)
+                    last = record
+                    result['rows'] += 1
+                    if len(batch[0]) >= self.batch_size:
+                        writer = self._write_batch(writer, tmp.name, schema, batch)
+                        batch = [[] for _ in columns]
+                if batch[0]:
+                    writer = self._write_batch(writer, tmp.name, schema, batch)
+            finally:
+                if writer is not None:
+                    writer.close()
+
+            if writer is None:
+                # Nothing new since the last watermark; no object is written
+                return result
+
+            stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+            key = f"users/{user_id}/exports/{source}/{stamp}_{uuid.uuid4().hex[:8]}.parquet"
+            minio = self.minio or clients.get_minio()
+            with metrics.span('export', 'put_object'):
+                minio.put_file(self.bucket, key, tmp.name, 'application/vnd.apache.parquet')
+            result['object_key'] = key
+            result['bytes'] = os.path.getsize(tmp.name)
+            result['url'] = minio.presigned_get(self.bucket, key, expiry=self.url_expires)
+            if watermark_column and last is not None:
+                result['watermark'] = last.get(watermark_column)
+
+        metrics.inc('export_rows_total', result['rows'], source='collection' if source == 'collection' else 'table')
+        return result
+
+    def _write_batch(self, writer, path: str, schema, batch: List[list]):
+        """Append one row group, opening the writer on the first batch"""
+        with metrics.span('export', 'write_row_group'):
+            if writer is None:
+                writer = pq.ParquetWriter(path, schema, compression='zstd')
+            writer.write_batch(pa.record_batch(batch, schema=schema))
+        return writer
+
+
+def encode_watermark(value: Any) -> Optional[str]:
+    """Watermarks are persisted as JSON text so integers stay integers for the next comparison"""
+    if value is None:
+        return None
+    if isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    return json.dumps(value, default=str)
+
+
+def decode_watermark(value: Optional[str]) -> Any:
+    return None if value is None else json.loads(value)
+
+
+def to_bson(value: Any) -> Any:
+    """
+    A collection watermark as sent or stored (Extended JSON) with its BSON type restored:
+    {"$oid": ...} -> ObjectId, {"$date": ...} -> datetime; plain JSON values are unchanged
+    Needed because {'$gt': since} never matches values of another BSON type
+    """
+    return json_util.loads(json.dumps(value))
+
+
+def from_bson(value: Any) -> Any:
+    """A collection watermark as Extended JSON, so it survives the JSON round trip to the next run"""
+    return json.loads(json_util.dumps(value, default=str))
@@ -0,0 +1,77 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+
+class IdempotencyConflict(ValueError):
+    """Raised when an idempotency key is reused for a different request payload"""
+
+
+def fingerprint(user_id: str, filename: str, file_bytes: bytes, *options: str) -> str:
+    """Content hash identifying an upload request; options are request settings that change the result"""
+    h = hashlib.sha256()
+    for part in (user_id.encode('utf-8'), b'\0', (filename or '').encode('utf-8'), b'\0'):
+        h.update(part)
+    for option in options:
+        h.update((option or '').encode('utf-8'))
+        h.update(b'\0')
+    h.update(file_bytes)
+    return h.hexdigest()
+
+
+class IdempotencyStore:
+    """
+    In-process result cache keyed by idempotency key
+    - Completed results are replayed until their TTL expires
+    - A request arriving while the same key is still running awaits that job instead of redoing it
+    - Failed jobs are not cached, so a retry after an error runs again
+    """
+    def __init__(self, ttl: Optional[int] = None, max_entries: Optional[int] = None):
+        self.ttl = ttl if ttl is not None else int(os.getenv('IDEMPOTENCY_TTL', '3600'))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('IDEMPOTENCY_MAX_ENTRIES', '10000'))
+        # key -> (expires_at, fingerprint, future); insertion order == expiry order
+        self._entries = OrderedDict()
+    
+    def _evict(self):
+        now = time.monotonic()
+        while self._entries:
+            key, (expires_at, _, future) = next(iter(self._entries.items()))
+            over_capacity = len(self._entries) > self.max_entries and future.done()
+            if expires_at > now and not over_capacity:
+                break
+            self._entries.popitem(last=False)
+    
+    def discard(self, key: str):
+        """Drop a cached result (e.g. an error response that should not be replayed)"""
+        self._entries.pop(key, None)
+    
+    async def run(self, key: str, request_fingerprint: str, job: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run job once per key
+        Returns: (result, replayed) where replayed is True when the result came from the cache
+        or from attaching to an in-flight job
+        """
+        self._evict()
+        entry = self._entries.get(key)
+        if entry is not None:
+            _, stored_fingerprint, future = entry
+            if stored_fingerprint != request_fingerprint:
+                raise IdempotencyConflict(f"Idempotency key '{key}' was already used for a different request")
+            # shield: a disconnecting retry must not cancel the original job
+            return await asyncio.shield(future), True
+        
+        future = asyncio.get_running_loop().create_future()
+        self._entries[key] = (time.monotonic() + self.ttl, request_fingerprint, future)
+        try:
+            result = await job()
+        except BaseException as e:
+            self.discard(key)
+            future.set_exception(e)
+            # Mark retrieved so asyncio does not log it when nobody else was waiting
+            future.exception()
+            raise
+        future.set_result(result)
+        return result, False
@@ -0,0 +1,164 @@
+import math
+import os
+import random
+from typing import Any, Dict, List
+
+# Weights of the three structural features; their sum over the features found is the NoSQL score
+DEPTH_WEIGHT = 0.4
+ARRAY_WEIGHT = 0.35
+CONSISTENCY_WEIGHT = 0.25
+DEPTH_THRESHOLD = 3
+
+
+def sample_size(confidence: float, tolerance: float) -> int:
+    """
+    Items to draw so that, with probability >= confidence, the sample contains at least one
+    of the items that deviate whenever they make up at least `tolerance` of the array
+    (1 - tolerance) ** n <= 1 - confidence; 0 means no sampling
+    """
+    if confidence >= 1 or tolerance <= 0:
+        return 0
+    return math.ceil(math.log(1 - confidence) / math.log(1 - tolerance))
+
+
+class AdaptiveClassifier:
+    """
+    SQL/NoSQL classification of a parsed JSON document with early exit
+
+    Score = 0.4 if nesting depth > 3, + 0.35 if some array holds objects, + 0.25 if the
+    objects of some array have different key sets; NoSQL when the score reaches the threshold.
+    The features are evaluated in stages and the walk stops as soon as the decision is fixed:
+    the found weights reach the threshold, or the weights still obtainable cannot.
+    The consistency feature needs an array of objects, so a document without one is SQL after
+    the first stage. The key sets of arrays longer than the sample size are compared on a random
+    sample (CLASSIFIER_CONFIDENCE / CLASSIFIER_TOLERANCE); set CLASSIFIER_CONFIDENCE=1 for exact
+    scans. Depth is never sampled: the walk descends into every item.
+    """
+
+    def __init__(self, threshold: float = 0.5, confidence: float = None, tolerance: float = None):
+        self.threshold = threshold
+        confidence = float(os.getenv('CLASSIFIER_CONFIDENCE', '0.99')) if confidence is None else confidence
+        tolerance = float(os.getenv('CLASSIFIER_TOLERANCE', '0.01')) if tolerance is None else tolerance
+        self.sample_size = sample_size(confidence, tolerance)
+
+    def classify(self, doc: Any) -> Dict[str, Any]:
+        """
+        Returns: {'decision': 'sql' | 'nosql', 'score', 'features': {name: True/False, or None
+        when not evaluated}, 'nodes_examined', 'sampled_arrays', 'early_exit'}
+        """
+        report = {
+            'decision': None,
+            'score': 0.0,
+            'features': {'depth': None, 'array': None, 'consistency': None},
+            'nodes_examined': 0,
+            'sampled_arrays': 0,
+            'early_exit': False,
+        }
+
+        has_array = self._find_object_array(doc, report)
+        self._record(report, 'array', has_array, ARRAY_WEIGHT)
+        if not has_array:
+            report['features']['consistency'] = False
+        if not self._decided(report):
+            depth, inconsistent = self._scan_structure(doc, report, find_inconsistency=has_array)
+            self._record(report, 'depth', depth, DEPTH_WEIGHT)
+            if has_array:
+                self._record(report, 'consistency', inconsistent, CONSISTENCY_WEIGHT)
+            self._decided(report, final=True)
+        report['score'] = round(report['score'], 4)
+        return report
+
+    def _record(self, report: Dict[str, Any], feature: str, found: bool, weight: float):
+        report['features'][feature] = found
+        if found:
+            report['score'] += weight
+
+    def _decided(self, report: Dict[str, Any], final: bool = False) -> bool:
+        """
+        Set the decision once the score reaches the threshold or can no longer reach it
+        (features still None count as obtainable unless this is the final check)
+        """
+        features = report['features']
+        reachable = report['score']
+        if not final:
+            reachable += DEPTH_WEIGHT if features['depth'] is None else 0
+            reachable += CONSISTENCY_WEIGHT if features['consistency'] is None else 0
+        if report['score'] >= self.threshold:
+            report['decision'] = 'nosql'
+        elif reachable < self.threshold or final:
+            report['decision'] = 'sql'
+        else:
+            return False
+        # A feature left undecided means the walk was cut short
+        report['early_exit'] = any(v is None for v in features.values())
+        return True
+
+    def _items(self, items: List[Any], report: Dict[str, Any]) -> List[Any]:
+        """The items of a list to look at: all of them, or a seeded sample for long lists"""
+        if not self.sample_size or len(items) <= self.sample_size:
+            return items
+        report['sampled_arrays'] += 1
+        # Seeded by length so the same document always gets the same decision
+        indices = sorted(random.Random(len(items)).sample(range(len(items)), self.sample_size))
+        return [items[i] for i in indices]
+
+    def _find_object_array(self, doc: Any, report: Dict[str, Any]) -> bool:
+        """True as soon as some list holds a dict (exact: stops at the first one)"""
+        report['nodes_examined'] += 1
+        stack = [doc]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                report['nodes_examined'] += len(node)
+                stack.extend(v for v in node.values() if isinstance(v, (dict, list)))
+            elif isinstance(node, list):
+                for i, item in enumerate(node):
+                    if isinstance(item, dict):
+                        report['nodes_examined'] += i + 1
+                        return True
+                report['nodes_examined'] += len(node)
+                stack.extend(v for v in node if isinstance(v, list))
+        return False
+
+    def _scan_structure(self, doc: Any, report: Dict[str, Any], find_inconsistency: bool):
+        """
+        One walk for the depth and key-consistency features that stops once the features
+        found so far bring the score to the threshold
+        Returns: (depth > DEPTH_THRESHOLD, some array of objects has differing key sets),
+        each None when the walk stopped before settling it
+        """
+        need = self.threshold - report['score']
+        deep = False
+        inconsistent = False
+        report['nodes_examined'] += 1
+        stack = [(doc, 1)] if isinstance(doc, (dict, list)) else []
+        while stack:
+            node, level = stack.pop()
+            if level > DEPTH_THRESHOLD and not deep:
+                deep = True
+                if DEPTH_WEIGHT + (CONSISTENCY_WEIGHT if inconsistent else 0) >= need:
+                    return True, inconsistent or None
+            if isinstance(node, dict):
+                report['nodes_examined'] += len(node)
+                children = node.values()
+            else:
+                # The sample only decides consistency; depth descends into every item
+                children = node
+                mismatch = -1
+                if find_inconsistency and not inconsistent:
+                    first = next((i for i in node if isinstance(i, dict)), None)
+                    if first is not None:
+                        keys = first.keys()
+                        mismatch = next((n for n, i in enumerate(self._items(node, report))
+                                         if isinstance(i, dict) and i.keys() != keys), -1)
+                if mismatch < 0:
+                    report['nodes_examined'] += len(children)
+                else:
+                    report['nodes_examined'] += mismatch + 1
+                    inconsistent = True
+                    if CONSISTENCY_WEIGHT + (DEPTH_WEIGHT if deep else 0) >= need:
+                        return deep or None, True
+            if deep and (inconsistent or not find_inconsistency):
+                break
+            stack.extend((v, level + 1) for v in children if isinstance(v, (dict, list)))
+        return deep, inconsistent
@@ -0,0 +1,149 @@
+import re
+from collections import Counter
+from itertools import chain, repeat
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+from app.services.json_service.infer_type.primitive import infer_primitive, ISO_DATETIME_RE
+
+# Type names infer_fn reports for non-string values, keyed by exact Python type
+PY_TYPES = {
+    type(None): 'null',
+    bool: 'boolean',
+    int: 'integer',
+    float: 'number',
+    dict: 'object',
+    list: 'array',
+}
+
+# A newline-joined column of canonical UUIDs / ISO datetimes, checked with one regex call
+UUID_COLUMN_RE = re.compile(r'(?:[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\n)*'
+                            r'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}')
+DATETIME_PREFIX_RE = re.compile(ISO_DATETIME_RE.pattern.lstrip('^'), re.MULTILINE)
+
+# Lines that might be a UUID or an ISO datetime once stripped; only these need the
+# exception-raising checks. The UUID part is a superset of what uuid.UUID accepts:
+# 32+ characters of hex/digits, braces, hyphens, underscores, sign, '0x', 'urn:uuid:' letters, whitespace
+SPECIAL_LINE_RE = re.compile(
+    r'^(?:(?:[0-9a-fA-F{}:_+xXurnid-]|\d|[^\S\n]){32,}'
+    r'|[^\S\n]*\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}.*)$',
+    re.MULTILINE
+)
+
+# Below this many distinct strings the bulk checks cost more than they save
+BULK_MIN_DISTINCT = 32
+
+
+def _is_datetime(value: str) -> bool:
+    try:
+        datetime.fromisoformat(value)
+        return True
+    except ValueError:
+        return False
+
+
+def _plain_type(value: str) -> str:
+    """infer_primitive's answer for a string already known not to be a UUID or datetime"""
+    s = value.strip()
+    if '@' in s and '.' in s and ' ' not in s:
+        return 'email'
+    if s.startswith('http://') or s.startswith('https://'):
+        return 'url'
+    return 'string'
+
+
+def string_type_counts(values: Sequence[str]) -> Counter:
+    """
+    Count infer_primitive type names over a column of strings
+    Each distinct value is classified once. With enough distinct values they are joined
+    and scanned with regexes: an all-UUID or all-datetime column is recognized in one call,
+    otherwise only the lines that could be a UUID or datetime get the full check
+    """
+    distinct = Counter(values)
+    if len(distinct) < BULK_MIN_DISTINCT:
+        counts = Counter()
+        for value, n in distinct.items():
+            counts[infer_primitive(value)[0]] += n
+        return counts
+
+    joined = '\n'.join(distinct)
+    # Line-based scans are only valid when no value contains a newline itself
+    if joined.count('\n') != len(distinct) - 1:
+        special = distinct
+    else:
+        if UUID_COLUMN_RE.fullmatch(joined):
+            return Counter({'uuid': len(values)})
+        if (len(DATETIME_PREFIX_RE.findall(joined)) == len(distinct)
+                and all(map(_is_datetime, distinct))):
+            return Counter({'datetime': len(values)})
+        special = set(SPECIAL_LINE_RE.findall(joined))
+
+    counts = Counter()
+    for value, n in distinct.items():
+        counts[infer_primitive(value)[0] if value in special else _plain_type(value)] += n
+    return counts
+
+
+def type_name(value: Any) -> str:
+    """The type name infer_fn reports for a value (objects and arrays are not descended into)"""
+    if isinstance(value, dict):
+        return 'object'
+    if isinstance(value, list):
+        return 'array'
+    return infer_primitive(value)[0]
+
+
+def column_type_counts(values: Sequence[Any]) -> Counter:
+    """
+    Count the type names infer_fn would report for each value of a column
+    Exact Python types are tallied in one C-level pass and strings go through
+    string_type_counts; anything else (subclasses, driver types) is classified per value
+    Counts are not in first-appearance order
+    """
+    counts = Counter()
+    for py_type, n in Counter(map(type, values)).items():
+        if py_type is str:
+            counts.update(string_type_counts([v for v in values if type(v) is str]))
+        elif py_type in PY_TYPES:
+            counts[PY_TYPES[py_type]] += n
+        else:
+            counts.update(type_name(v) for v in values if type(v) is py_type)
+    return counts
+
+
+def pivot(records: List[Dict[str, Any]], keys: Iterable[str]) -> Dict[str, list]:
+    """Turn records into per-key columns aligned with the records; a missing key reads as None"""
+    return {k: list(map(dict.get, records, repeat(k))) for k in keys}
+
+
+def merged_sample(records: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Each key's first non-null value (None when it has none), keys in first-seen order,
+    plus the keys that are non-null in every record
+    Records that all carry every key are pivoted into columns and scanned with C-level
+    list operations; records with differing keys are walked row by row
+    """
+    width = len(records[0]) if records else 0
+    if sum(map(len, records)) == width * len(records):
+        keys = list(dict.fromkeys(chain.from_iterable(records)))
+        if len(keys) == width:
+            sample, required = {}, []
+            for k, column in pivot(records, keys).items():
+                value = column[0]
+                if value is None:
+                    value = next((v for v in column if v is not None), None)
+                sample[k] = value
+                if None not in column:
+                    required.append(k)
+            return sample, required
+
+    sample = {}
+    counts = {}
+    for record in records:
+        for k, v in record.items():
+            if v is not None:
+                counts[k] = counts.get(k, 0) + 1
+                if sample.get(k) is None:
+                    sample[k] = v
+            else:
+                sample.setdefault(k, None)
+    return sample, [k for k in sample if counts.get(k, 0) == len(records)]
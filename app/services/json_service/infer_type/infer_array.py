@@ -1,29 +1,30 @@
-from collections import Counter
+from app.services.json_service.infer_type.columnar import column_type_counts, type_name
 
 def infer_array(arr, infer_fn):
     """
     Infer the type of array elements
+    Item types are counted over the whole array in one columnar pass; only the type
+    names are kept, so object and array items are not descended into
     Returns dict with array type information
     """
     if not isinstance(arr, list):
         return {'type': 'array', 'items': {'type': 'unknown'}, 'mixed': True}
     
-    stats = Counter()
-    item_types = []
-    
-    for item in arr:
-        t, meta = infer_fn(item)
-        stats[t] += 1
-        item_types.append((t, meta))
-    
-    if not item_types:
+    if not arr:
         return {'type': 'array', 'items': {'type': 'null'}, 'mixed': False}
     
-    most_common_type, _ = stats.most_common(1)[0]
+    stats = column_type_counts(arr)
+    top = max(stats.values())
+    tied = {t for t, n in stats.items() if n == top}
+    if len(tied) == 1:
+        most_common_type = tied.pop()
+    else:
+        # Ties go to the type seen first, as with Counter.most_common
+        most_common_type = next(t for t in map(type_name, arr) if t in tied)
     mixed = len(stats) > 1
     
     return {
         'type': 'array',
         'items': {'type': most_common_type},
         'mixed': mixed
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,14 @@
+from typing import Any, Dict, List
+from app.services.json_service.infer_type.columnar import merged_sample
+from app.services.json_service.infer_type.infer_object import infer_object
+
+def infer_records(records: List[Dict[str, Any]], infer_fn) -> Dict[str, Any]:
+    """
+    Infer one object schema over many records
+    Each key is typed from its first non-null value and only keys that are non-null in
+    every record are required; same result as infer_object over that merged sample
+    """
+    sample, required = merged_sample(records)
+    schema = infer_object(sample, infer_fn)
+    schema['required'] = required
+    return schema
@@ -0,0 +1,66 @@
+import uuid
+from typing import Dict, Any, List
+from app.services.json_service.infer_type.infer_records import infer_records
+from app.services.json_service.table_generator.sql_generator import surrogate_key
+
+
+def _merged_schema(rows: List[Dict[str, Any]], infer_fn) -> Dict[str, Any]:
+    """
+    Infer one object schema over all rows: each key is typed from its first non-null value,
+    and only keys that are non-null in every row are required
+    """
+    return infer_records(rows, infer_fn)
+
+
+def decompose_records(table_name: str, rows: List[Dict[str, Any]], infer_fn, parent_table: str = None, ids: List[str] = None) -> List[Dict[str, Any]]:
+    """
+    Decompose records into a parent table plus child tables for nested arrays of objects
+    Primary keys are generated client-side so every table can be bulk loaded without RETURNING
+    ids optionally pre-assigns the primary keys of the top-level rows (e.g. already referenced elsewhere)
+    Returns list of table plans, parents before children:
+        {'table', 'schema', 'parent', 'foreign_key', 'columns', 'rows'}
+    """
+    if not rows:
+        return []
+    
+    schema = _merged_schema(rows, infer_fn)
+    props = schema['properties']
+    child_keys = [
+        k for k, v in props.items()
+        if v['type'] == 'array' and v['meta'].get('items', {}).get('type') == 'object'
+    ]
+    foreign_key = f'{parent_table}_id' if parent_table else None
+    for k in child_keys + ([foreign_key] if foreign_key else []):
+        props.pop(k, None)
+    schema['required'] = [k for k in schema['required'] if k in props]
+    
+    pk = surrogate_key(schema)
+    columns = [pk] + ([foreign_key] if foreign_key else []) + list(props)
+    
+    table_rows = []
+    children = {k: [] for k in child_keys}
+    for i, row in enumerate(rows):
+        row_id = ids[i] if ids else str(uuid.uuid4())
+        values = [row_id]
+        if foreign_key:
+            values.append(row[foreign_key])
+        values.extend(row.get(k) for k in props)
+        table_rows.append(tuple(values))
+        
+        for k in child_keys:
+            for child in row.get(k) or []:
+                if isinstance(child, dict):
+                    children[k].append({**child, f'{table_name}_id': row_id})
+    
+    plans = [{
+        'table': table_name,
+        'schema': schema,
+        'parent': parent_table,
+        'foreign_key': foreign_key,
+        'columns': columns,
+        'rows': table_rows
+    }]
+    for k, child_rows in children.items():
+        plans.extend(decompose_records(f'{table_name}_{k}', child_rows, infer_fn, parent_table=table_name))
+    
+    return plans
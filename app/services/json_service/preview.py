@@ -0,0 +1,78 @@
+"""
+Size-bounded previews of uploaded values for the sample queries in upload responses
+
+A preview is built by walking the value only as far as the budget allows, so its cost
+depends on the budget, not on the size of the upload. Nothing is deep-copied: scalars are
+shared with the parsed document, and only the containers that are kept get new (truncated) copies.
+"""
+import os
+from typing import Any
+
+# Approximate JSON bytes per preview, and the container depth shown before summarizing
+PREVIEW_MAX_BYTES = int(os.getenv('PREVIEW_MAX_BYTES', '2048'))
+PREVIEW_MAX_DEPTH = int(os.getenv('PREVIEW_MAX_DEPTH', '3'))
+# Kept visible for every string that is cut, so a truncated value is still recognizable
+MIN_STRING_CHARS = 16
+
+
+def preview(value: Any, max_bytes: int = None, max_depth: int = None) -> Any:
+    """
+    Truncated copy of a JSON value that serializes to about max_bytes at most
+    - Containers nested deeper than max_depth become a summary string ("{12 keys}", "[3 items]")
+    - Once the budget is spent, the remaining keys are summarized by a "..." key
+      and the remaining items by a final "... +N items" string
+    - Long strings are cut and end with "... +N chars"
+    """
+    budget = [PREVIEW_MAX_BYTES if max_bytes is None else max_bytes]
+    return _preview(value, budget, PREVIEW_MAX_DEPTH if max_depth is None else max_depth)
+
+
+def _summary(value: Any) -> str:
+    if isinstance(value, dict):
+        return f'{{{len(value)} keys}}'
+    return f'[{len(value)} items]'
+
+
+def _preview(value: Any, budget: list, depth: int) -> Any:
+    if isinstance(value, str):
+        # Quotes included; escapes are not counted, this is an estimate
+        if len(value) + 2 <= budget[0]:
+            budget[0] -= len(value) + 2
+            return value
+        keep = max(budget[0] - 2, MIN_STRING_CHARS)
+        budget[0] = 0
+        return f'{value[:keep]}... +{len(value) - keep} chars'
+    if isinstance(value, (dict, list)):
+        if depth <= 0 or budget[0] <= 2:
+            summary = _summary(value)
+            budget[0] -= len(summary) + 2
+            return summary
+        budget[0] -= 2
+        if isinstance(value, dict):
+            return _preview_dict(value, budget, depth)
+        return _preview_list(value, budget, depth)
+    # Numbers, booleans and null
+    budget[0] -= len(str(value))
+    return value
+
+
+def _preview_dict(value: dict, budget: list, depth: int) -> dict:
+    kept = {}
+    for n, (key, item) in enumerate(value.items()):
+        if budget[0] <= 0:
+            kept['...'] = f'+{len(value) - n} keys'
+            break
+        budget[0] -= len(str(key)) + 4
+        kept[key] = _preview(item, budget, depth - 1)
+    return kept
+
+
+def _preview_list(value: list, budget: list, depth: int) -> list:
+    kept = []
+    for n, item in enumerate(value):
+        if budget[0] <= 0:
+            kept.append(f'... +{len(value) - n} items')
+            break
+        budget[0] -= 1
+        kept.append(_preview(item, budget, depth - 1))
+    return kept
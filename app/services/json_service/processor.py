@@ -1,21 +1,130 @@
+import os
+import re
+import copy
 import json
-from typing import Dict, Any
-from app.services.json_service.infer_type.primitive import infer_primitive
+import uuid
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Tuple
+from app.services.json_service.infer_type.primitive import infer_primitive, is_iso_datetime, is_uuid
 from app.services.json_service.infer_type.infer_object import infer_object
 from app.services.json_service.infer_type.infer_array import infer_array
+from app.services.json_service.infer_type.columnar import merged_sample
+from app.services.json_service.infer_type.field_stats import FieldStats
 from app.services.json_service.entity_extractor.detect_entities import detect_entities_from_json
 from app.services.json_service.entity_extractor.detect_relationships import detect_relationships
 from app.services.json_service.normalizer.normalize_schema import normalize_entities
-from app.services.json_service.table_generator.sql_generator import generate_create_table
+from app.services.json_service.normalizer.decompose import decompose_records
+from app.services.json_service.table_generator.sql_generator import generate_create_table, generate_foreign_key_index, generate_unique_key_index, surrogate_key, map_type, CATALOG_TYPES
+from app.services.json_service.table_generator.partitions import (
+    PARTITION_COLUMNS, USER_COLUMN, parse_partition_by, layout_of, partition_values, period,
+    generate_partitions, generate_time_partition
+)
 from app.services.json_service.table_generator.nosql_generator import to_mongo_validator
+from app.services.json_service.table_generator.index_advisor import advise_sql_indexes, advise_mongo_indexes
 from app.services.json_service.query_generator import QueryGenerator
+from app.services.json_service.preview import preview
+from app.services.json_service.spill import Spiller, new_report
+from app.services.json_service.classifier import AdaptiveClassifier
+from app.services.json_service.schema_checker.versioner import next_version_name
+from app.services.json_service.schema_checker.alter_generator import generate_alter_statements
+from app.services.json_service.reader.line_records import iter_record_batches
+from app.services.spool import journal
+from fastapi.concurrency import run_in_threadpool
+from app.db import clients
+from app.db.bridge import BlockingClient
 from app.db.postgres.client import PostgresClient
 from app.db.mongo.client import MongoClient
+from app.utils.metrics import registry as metrics
+
+# Base schema tables that uploaded files must never be loaded into
+RESERVED_TABLES = {'users', 'export_jobs', 'direct_uploads', 'text_documents'}
+# Types a column can hold as PostgreSQL text
+TEXT_TYPES = {'string', 'email', 'url', 'null'}
+# SQL load modes: append every row, or upsert on a natural key
+INGEST_MODES = ('append', 'merge')
+# Fields used as the merge key when none is requested, first match wins
+NATURAL_KEYS = ('id', 'uuid')
 
 class JsonProcessor:
-    def __init__(self):
-        self.pg = PostgresClient()
-        self.mongo = MongoClient()
+    def __init__(self, pg: PostgresClient = None, mongo: MongoClient = None):
+        # Without explicit clients the process's shared ones are looked up on each use,
+        # so a connection dropped by a failed readiness check is replaced (see app.db.clients)
+        self._pg = pg
+        self._mongo = mongo
+        # Decompose nested arrays of objects into child tables instead of JSONB columns
+        self.decompose_arrays = os.getenv('JSON_DECOMPOSE_ARRAYS', 'false').lower() == 'true'
+        # Store child entities once and reference them from the root row instead of copying them into it
+        self.root_references = os.getenv('JSON_ROOT_REFERENCES', 'false').lower() == 'true'
+        # Index advisor: 'off', 'propose' (report only) or 'create'
+        self.index_advisor = os.getenv('INDEX_ADVISOR', 'propose').lower()
+        # Records parsed and COPY-loaded at a time for CSV/TSV/NDJSON uploads
+        self.record_batch_size = int(os.getenv('RECORD_BATCH_SIZE', '5000'))
+        # SQL/NoSQL scoring with early exit and sampled scans of long arrays
+        self.classifier = AdaptiveClassifier()
+        # 'merge' upserts SQL rows on a natural key instead of appending them (see with_ingest_mode)
+        self.ingest_mode = os.getenv('INGEST_MODE', 'append').lower()
+        # Comma-separated merge key columns; empty = the first of NATURAL_KEYS in the table
+        self.merge_key = os.getenv('MERGE_KEY') or None
+        # Oversized JSONB values and MongoDB fields/documents are moved to MinIO (SPILL_THRESHOLD_BYTES)
+        self.spiller = Spiller()
+        # New SQL tables partitioned by uploading user and/or ingestion time: '', 'user', 'time' or 'user,time'
+        self.partition_by = parse_partition_by(os.getenv('TABLE_PARTITION_BY', ''))
+        self.partition_modulus = int(os.getenv('TABLE_PARTITION_HASH_MODULUS', '8'))
+        # Range partition size: 'day', 'week' or 'month'
+        self.partition_interval = os.getenv('TABLE_PARTITION_INTERVAL', 'month').lower()
+        # Partition layout per table and the time partitions already ensured, shared by copies
+        self._table_layouts = {}
+        self._known_partitions = set()
+    
+    @property
+    def pg(self) -> PostgresClient:
+        return self._pg or clients.get_postgres()
+    
+    @property
+    def mongo(self) -> MongoClient:
+        return self._mongo or clients.get_mongo()
+    
+    def with_clients(self, pg=None, mongo=None) -> 'JsonProcessor':
+        """A shallow copy writing through the given clients; settings and classifier are shared"""
+        bound = copy.copy(self)
+        bound._pg = pg
+        bound._mongo = mongo
+        return bound
+    
+    def with_ingest_mode(self, mode: str = None, merge_key: str = None) -> 'JsonProcessor':
+        """
+        A shallow copy loading SQL tables in the given mode ('append' or 'merge'), for one request
+        merge_key: comma-separated key columns for merge mode, overriding MERGE_KEY
+        """
+        if mode is not None and mode not in INGEST_MODES:
+            raise ValueError(f"Unknown ingest mode '{mode}', expected one of: {', '.join(INGEST_MODES)}")
+        bound = copy.copy(self)
+        bound.ingest_mode = mode or self.ingest_mode
+        bound.merge_key = merge_key or self.merge_key
+        return bound
+    
+    def on_async_clients(self) -> 'JsonProcessor':
+        """
+        A copy for a worker thread whose database calls run on this event loop through
+        the async clients (IO_BACKEND=async); call from a coroutine
+        """
+        loop = asyncio.get_running_loop()
+        return self.with_clients(
+            pg=BlockingClient(clients.get_async_postgres(), loop),
+            mongo=BlockingClient(clients.get_async_mongo(), loop)
+        )
+    
+    async def process_async(self, file_bytes: bytes, user_id: str = 'anonymous') -> Dict[str, Any]:
+        """
+        process() without blocking the event loop: parsing and planning run in the threadpool,
+        the database round trips on the loop, so concurrent uploads overlap their I/O
+        """
+        return await run_in_threadpool(self.on_async_clients().process, file_bytes, user_id)
+    
+    async def process_records_async(self, filename: str, file_bytes: bytes, fmt: str, user_id: str = 'anonymous') -> Dict[str, Any]:
+        """process_records() on the async clients, see process_async"""
+        return await run_in_threadpool(self.on_async_clients().process_records, filename, file_bytes, fmt, user_id)
     
     def infer_fn(self, value):
         """Type inference function for recursive schema detection"""
@@ -33,179 +142,496 @@ class JsonProcessor:
         
         Args:
             file_bytes: JSON file content
-            user_id: User identifier (used as collection name for NoSQL)
+            user_id: User identifier (used as collection name for NoSQL and to partition SQL tables)
         """
+        metrics.observe('ingest_payload_bytes', len(file_bytes), type='json')
         try:
-            data = json.loads(file_bytes.decode('utf-8'))
+            with metrics.span('json', 'parse'):
+                data = json.loads(file_bytes.decode('utf-8'))
 
             # Step 1: Use YOUR algorithm to classify SQL vs NOSQL
-            schema_type = self._detect_schema_type(data)
+            with metrics.span('json', 'classify'):
+                classification = self._classify(data)
+            schema_type = classification['decision']
 
             # Step 2: Extract entities and relationships
-            entities = detect_entities_from_json(data)
-            relationships = detect_relationships(entities)
-            normalized = normalize_entities(entities, self.infer_fn)
+            with metrics.span('json', 'detect_entities'):
+                entities = detect_entities_from_json(data)
+                relationships = detect_relationships(entities)
+            with metrics.span('json', 'normalize'):
+                normalized = normalize_entities(entities, self.infer_fn)
 
+            # Nothing in an upload smaller than the spill threshold can be spilled
+            spill = self.spiller.applies_to(len(file_bytes))
             if schema_type == 'sql':
                 # Step 3a: Process SQL - create tables and insert data
-                return self._process_sql_complete(data, entities, normalized, relationships)
+                result = self._process_sql_complete(data, entities, normalized, relationships, spill=spill, user_id=user_id)
             else:
                 # Step 3b: Process NoSQL - create collections and insert data (use user_id as collection name)
-                return self._process_nosql_complete(data, entities, normalized, user_id)
+                result = self._process_nosql_complete(data, entities, normalized, user_id, spill=spill)
+
+            result['classification'] = classification
+            self._record_written(result)
+            return result
 
         except json.JSONDecodeError as e:
             raise ValueError(f"Invalid JSON: {str(e)}")
 
-    def _detect_schema_type(self, data: Any) -> str:
+    def process_batch(self, documents: List[Tuple[str, Any]], user_id: str = 'anonymous') -> Dict[str, Any]:
         """
-        Detect if JSON schema is SQL or NOSQL using custom algorithm
-        Returns 'sql' or 'nosql'
+        Process many already-parsed JSON documents together (e.g. the JSON entries of a ZIP archive)
+        Records with the same entity name and schema are merged across documents, so each
+        table gets its DDL once and one bulk insert, and each NoSQL schema one insert_many
+        
+        Args:
+            documents: List of (name, parsed_json) tuples
+            user_id: User identifier (used as collection name for NoSQL and to partition SQL tables)
+        
+        Returns:
+            Dict with per-document routing plus per-table and per-collection totals
         """
-        decision = self._classify_json(data)
-        return decision.lower()
-
-    def _get_json_depth(self, obj):
-        """Calculate the maximum depth of the JSON object"""
-        if isinstance(obj, dict):
-            if not obj:
-                return 1
-            return 1 + max(self._get_json_depth(v) for v in obj.values())
-        elif isinstance(obj, list):
-            if not obj:
-                return 1
-            return 1 + max(self._get_json_depth(item) for item in obj)
-        else:
-            return 0
-
-    def _depth_score(self, json_obj, threshold=3, weight=0.4):
-        """Score based on JSON depth - deeper structures suggest NoSQL"""
-        depth = self._get_json_depth(json_obj)
-        return weight if depth > threshold else 0
-
-    def _array_level(self, json_obj):
-        """Check if JSON contains arrays of objects (suggests tabular/SQL data)"""
-        if isinstance(json_obj, dict):
-            for v in json_obj.values():
-                if self._array_level(v) == 1:
-                    return 1
-            return 0
-        elif isinstance(json_obj, list):
-            if any(isinstance(item, dict) for item in json_obj):
-                return 1
-            for item in json_obj:
-                if self._array_level(item) == 1:
-                    return 1
-            return 0
-        else:
-            return 0
-
-    def _array_score(self, json_obj, weight=0.35):
-        """Score based on presence of arrays containing objects"""
-        return weight if self._array_level(json_obj) == 1 else 0
-
-    def _schema_consistency_score(self, json_obj, weight=0.25):
-        """Score based on schema consistency in arrays of objects"""
-        def check_inconsistency(obj):
-            if isinstance(obj, dict):
-                for v in obj.values():
-                    if check_inconsistency(v):
-                        return True
-                return False
-            elif isinstance(obj, list):
-                obj_arrays = [i for i in obj if isinstance(i, dict)]
-                if len(obj_arrays) > 1:
-                    key_sets = [set(i.keys()) for i in obj_arrays]
-                    first_keys = key_sets[0]
-                    for k in key_sets[1:]:
-                        if k != first_keys:
-                            return True
-                for item in obj:
-                    if check_inconsistency(item):
-                        return True
-                return False
+        sql_groups = {}
+        nosql_groups = {}
+        entries = []
+        
+        for name, data in documents:
+            classification = self._classify(data)
+            schema_type = classification['decision']
+            entities = detect_entities_from_json(data)
+            normalized = normalize_entities(entities, self.infer_fn)
+            
+            if schema_type == 'sql':
+                relationships = None if self.root_references else detect_relationships(entities)
+                tables = {}
+                for entry in self._sql_entries(data, entities, normalized):
+                    entity_name = entry['entity']
+                    parent = tables[entry['parent']] if entry['parent'] else None
+                    key = (entity_name, self._schema_signature(entry['schema']), parent)
+                    group = sql_groups.get(key)
+                    if group is None:
+                        # Same entity with a different shape gets its own versioned table
+                        taken = [g['table'] for g in sql_groups.values()]
+                        group = sql_groups[key] = {
+                            'table': next_version_name(entity_name, taken),
+                            'schema': entry['schema'],
+                            'relationships': relationships,
+                            'rows': [],
+                            'ids': None if entry['ids'] is None else [],
+                            'parent': parent,
+                            'parent_ids': [] if parent else None
+                        }
+                    group['rows'].extend(entry['rows'])
+                    if entry['ids'] is not None:
+                        group['ids'].extend(entry['ids'])
+                    if parent:
+                        group['parent_ids'].extend(entry['parent_ids'])
+                    tables[entity_name] = group['table']
+                entries.append({'name': name, 'schema_type': 'sql', 'tables': list(tables.values()),
+                                'classification': classification})
             else:
-                return False
-
-        inconsistent = check_inconsistency(json_obj)
-        return weight if inconsistent else 0
-
-    def _classify_json(self, json_obj, threshold=0.5):
-        """Classify JSON as SQL or NoSQL based on combined scores"""
-        d_score = self._depth_score(json_obj)
-        a_score = self._array_score(json_obj)
-        s_score = self._schema_consistency_score(json_obj)
-
-        total_score = d_score + a_score + s_score
-        decision = "NoSQL" if total_score >= threshold else "SQL"
+                root_schema = normalized.get('root', {})
+                group = nosql_groups.setdefault(
+                    self._schema_signature(root_schema),
+                    {'schema': root_schema, 'documents': []}
+                )
+                if isinstance(data, list):
+                    group['documents'].extend(d for d in data if isinstance(d, dict))
+                elif isinstance(data, dict):
+                    group['documents'].append(data)
+                entries.append({'name': name, 'schema_type': 'nosql', 'collection': user_id,
+                                'classification': classification})
+        
+        if self.decompose_arrays:
+            with metrics.span('json', 'sql_copy'):
+                tables_info = self._load_decomposed(list(sql_groups.values()), spill=self.spiller.threshold > 0, user_id=user_id)
+            sql_groups = {}
+        else:
+            tables_info = []
+        
+        existing_tables = self.pg.list_tables() if sql_groups else []
+        pk_of = {}
+        for group in sql_groups.values():
+            parent = (group['parent'], pk_of[group['parent']]) if group['parent'] else None
+            tables_info.append(self._load_table(
+                group['table'], group['schema'], group['rows'], group['relationships'], existing_tables,
+                ids=group['ids'], parent=parent, parent_ids=group['parent_ids'], spill=self.spiller.threshold > 0,
+                user_id=user_id
+            ))
+            pk_of[group['table']] = surrogate_key(group['schema'])
+        
+        docs = {'inserted': 0, 'spooled': 0}
+        stats = self._new_stats()
+        spilled = new_report() if self.spiller.threshold > 0 else None
+        for group in nosql_groups.values():
+            with metrics.span('json', 'ddl'):
+                self.mongo.create_validator(user_id, to_mongo_validator(group['schema']))
+            with metrics.span('json', 'nosql_insert'):
+                for name, n in self._insert_data_to_collection(user_id, group['schema'], group['documents'], stats, spilled).items():
+                    docs[name] += n
+        
+        collections_info = []
+        if nosql_groups:
+            collections_info.append({
+                'collection_name': user_id,
+                'documents_inserted': docs['inserted'],
+                'indexes': self._apply_mongo_indexes(user_id, stats)
+            })
+            if docs['spooled']:
+                collections_info[-1]['documents_spooled'] = docs['spooled']
+            if spilled and spilled['stored_bytes']:
+                collections_info[-1]['spilled'] = spilled
+        
+        result = {
+            'entries': entries,
+            'tables': tables_info,
+            'collections': collections_info,
+            'status': 'success'
+        }
+        self._record_written(result)
+        return result
 
-        return decision
+    def _classify(self, data: Any) -> Dict[str, Any]:
+        """
+        Classify a parsed document as SQL or NoSQL with the adaptive classifier
+        Returns the classifier report; report['decision'] is 'sql' or 'nosql'
+        """
+        report = self.classifier.classify(data)
+        metrics.observe('classifier_nodes_examined', report['nodes_examined'], decision=report['decision'])
+        return report
     
-
+    def process_records(self, filename: str, file_bytes: bytes, fmt: str, user_id: str = 'anonymous') -> Dict[str, Any]:
+        """
+        Ingest a CSV, TSV or NDJSON file into one table, one batch of records at a time
+        Column types come from infer_primitive/normalize_entities over each batch: the first
+        batch creates (or picks a compatible version of) the table, later batches add columns
+        for new fields and widen columns whose values no longer fit
+        Every batch is a single COPY, so memory is bounded by RECORD_BATCH_SIZE records
+        
+        Args:
+            filename: Upload name, used for the table name
+            file_bytes: File content
+            fmt: 'csv', 'tsv' or 'ndjson' as returned by TypeDetector.detect
+            user_id: Injected partition column value when the table is partitioned by user
+        """
+        metrics.observe('ingest_payload_bytes', len(file_bytes), type=fmt)
+        batches = iter_record_batches(file_bytes, fmt, self.record_batch_size)
+        table_name = None
+        types = {}
+        partition_keys, partition_row = [], ()
+        merge = self.ingest_mode == 'merge'
+        merge_key = merge_error = None
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'spooled': 0}
+        rows_failed = 0
+        errors = []
+        stats = self._new_stats()
+        
+        while True:
+            with metrics.span('records', 'parse'):
+                batch = next(batches, None)
+            if batch is None:
+                break
+            with metrics.span('records', 'normalize'):
+                schema = self._records_schema(batch)
+            with metrics.span('records', 'ddl'):
+                if table_name is None:
+                    table_name, types, layout = self._records_table(self._records_table_name(filename), schema)
+                    if layout:
+                        ingested_at = datetime.now(timezone.utc)
+                        self._ensure_partitions(table_name, layout, ingested_at)
+                        values = partition_values(layout, user_id, ingested_at)
+                        partition_keys, partition_row = list(values), tuple(values.values())
+                    if merge:
+                        merge_key, merge_error = self._merge_key(table_name, schema, layout)
+                self._evolve_records_table(table_name, types, schema, batch)
+            
+            columns = list(types) + partition_keys
+            rows = [tuple(self._fit_value(types[c], record.get(c)) for c in types) + partition_row for record in batch]
+            if stats is not None:
+                for row in rows:
+                    stats.observe(columns, row)
+            targets = [journal.target('postgres', table_name)]
+            op, args = ('pg_merge', (table_name, columns, rows, merge_key)) if merge_key else ('pg_copy', (table_name, columns, rows))
+            if journal.spool(op, targets, args):
+                counts['spooled'] += len(rows)
+                continue
+            try:
+                if merge_key:
+                    with metrics.span('records', 'sql_merge'):
+                        for name, n in self._merge_values(table_name, columns, rows, merge_key).items():
+                            counts[name] += n
+                else:
+                    with metrics.span('records', 'sql_copy'):
+                        self.pg.copy_tables([(table_name, columns, rows)])
+                    counts['inserted'] += len(rows)
+            except Exception as e:
+                if journal.spool(op, targets, args, e):
+                    counts['spooled'] += len(rows)
+                    continue
+                print(f"COPY error for {table_name}: {e}")
+                metrics.inc('ingest_errors_total', stage='records_copy')
+                rows_failed += len(rows)
+                errors.append(str(e))
+        
+        if table_name is None:
+            raise ValueError(f"No records found in {fmt.upper()} file")
+        
+        select_query, _ = QueryGenerator.generate_select_query(table_name, list(types)[:5], limit=10)
+        table_info = {
+            'table_name': table_name,
+            'fields': [{'name': c, 'type': t, 'required': False} for c, t in types.items()],
+            'rows_inserted': counts['inserted'],
+            'rows_failed': rows_failed,
+            'indexes': self._apply_sql_indexes(table_name, stats, skip=partition_keys + (merge_key or []))
+        }
+        if merge:
+            table_info.update(self._merge_info(merge_key, merge_error, counts if merge_key else None))
+        if counts['spooled']:
+            table_info['rows_spooled'] = counts['spooled']
+        if partition_keys:
+            table_info['partitioned_by'] = list(layout)
+        rows_loaded = sum(counts.values())
+        result = {
+            'schema_type': 'sql',
+            'format': fmt,
+            'tables': [table_info],
+            'queries': [{'type': 'SELECT', 'table': table_name, 'query': select_query}],
+            'status': 'success' if not rows_failed else ('partial' if rows_loaded else 'error')
+        }
+        if errors:
+            result['errors'] = errors[:3]
+        self._record_written(result)
+        return result
+    
+    @staticmethod
+    def _records_table_name(filename: str) -> str:
+        """Table name from the file name: lower-case identifier, never a base schema table"""
+        stem = os.path.splitext(os.path.basename(filename))[0].lower()
+        name = re.sub(r'[^a-z0-9_]+', '_', stem).strip('_') or 'records'
+        if name[0].isdigit():
+            name = f't_{name}'
+        if name in RESERVED_TABLES:
+            name = f'{name}_records'
+        return name[:63]
+    
+    def _records_schema(self, batch: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Infer one schema over a batch: each field is typed from its first non-null value
+        Columns are nullable because later batches may leave any field empty
+        """
+        sample, _ = merged_sample(batch)
+        schema = normalize_entities({'root': sample}, self.infer_fn)['root']
+        schema['required'] = []
+        return schema
+    
+    def _records_table(self, base_name: str, schema: Dict[str, Any]) -> Tuple[str, Dict[str, str], Tuple[str, ...]]:
+        """
+        Pick the first of base_name, base_name_v2, ... whose shared columns have the same
+        types as the inferred schema, or create the next free version
+        Returns: (table_name, {column: inferred type} for the columns already present, partition layout)
+        """
+        inferred = {k: v['type'] for k, v in schema['properties'].items()}
+        existing = self.pg.list_tables()
+        name, version = base_name, 1
+        while name in existing:
+            catalog = {c: CATALOG_TYPES.get(t, 'string') for c, t in self.pg.fetch_table_columns(name).items()}
+            shared = [c for c in inferred if c in catalog]
+            if shared and all(self._same_column_type(catalog[c], inferred[c]) for c in shared):
+                return name, {c: catalog[c] for c in shared}, self._partition_layout(name, schema, existing)
+            version += 1
+            name = f'{base_name}_v{version}'
+        
+        layout = self._partition_layout(name, schema, existing)
+        self.pg.execute(generate_create_table(name, schema, partition_by=layout))
+        for stmt in generate_partitions(name, layout, self.partition_modulus):
+            self.pg.execute(stmt)
+        return name, dict(inferred), layout
+    
+    @staticmethod
+    def _same_column_type(column_type: str, inferred_type: str) -> bool:
+        if inferred_type in ('object', 'array'):
+            return column_type == 'object'
+        if inferred_type in TEXT_TYPES:
+            return column_type == 'string'
+        return column_type == inferred_type
+    
+    def _evolve_records_table(self, table_name: str, types: Dict[str, str], schema: Dict[str, Any], batch: List[Dict[str, Any]]):
+        """
+        Add columns for fields first seen in this batch and widen columns holding values
+        that no longer fit (integer -> number, anything else -> text); updates types in place
+        """
+        added = {}
+        for column, info in schema['properties'].items():
+            if column not in types:
+                types[column] = info['type']
+                added[column] = map_type(info['type'])
+        for stmt in generate_alter_statements(table_name, added):
+            self.pg.execute(stmt)
+        
+        for column, t in list(types.items()):
+            misfits = [r.get(column) for r in batch if not self._fits(t, r.get(column))]
+            if not misfits:
+                continue
+            numeric = all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in misfits)
+            widened = 'number' if t == 'integer' and numeric else 'string'
+            sqltype = map_type(widened)
+            self.pg.execute(f'ALTER TABLE "{table_name}" ALTER COLUMN "{column}" TYPE {sqltype} USING "{column}"::{sqltype}')
+            types[column] = widened
+    
+    @staticmethod
+    def _fits(t: str, value: Any) -> bool:
+        """Whether a value can be loaded as-is into a column of inferred type t"""
+        if value is None or t in TEXT_TYPES or t in ('object', 'array'):
+            return True
+        if isinstance(value, bool):
+            return t == 'boolean'
+        if t == 'integer':
+            return isinstance(value, int)
+        if t == 'number':
+            return isinstance(value, (int, float))
+        if t == 'datetime':
+            return isinstance(value, str) and is_iso_datetime(value)
+        if t == 'uuid':
+            return isinstance(value, str) and is_uuid(value)
+        return False
+    
+    @staticmethod
+    def _fit_value(t: str, value: Any) -> Any:
+        """JSONB columns store scalars as JSON text; text columns store objects as JSON text"""
+        if value is None:
+            return None
+        if t in ('object', 'array'):
+            return value if isinstance(value, (dict, list)) else json.dumps(value)
+        if t in TEXT_TYPES and isinstance(value, bool):
+            return 'true' if value else 'false'
+        return value
     
     def _insert_data_to_table(self, table_name: str, schema: Dict[str, Any], data: Any) -> int:
         """
-        Insert data into PostgreSQL table using QueryGenerator
+        Insert data into PostgreSQL table using batched multi-row INSERTs
         Returns: number of rows inserted
         """
-        rows_inserted = 0
-        
-        if isinstance(data, list):
-            # Array of objects - insert each
-            for row in data:
-                if isinstance(row, dict):
-                    query, values = QueryGenerator.generate_sql_insert(table_name, schema, row)
-                    if query:
-                        try:
-                            self.pg.execute(query, values)
-                            rows_inserted += 1
-                        except Exception as e:
-                            print(f"Insert error for {table_name}: {e}")
-        elif isinstance(data, dict):
-            # Single object - insert once
-            query, values = QueryGenerator.generate_sql_insert(table_name, schema, data)
-            if query:
-                try:
-                    self.pg.execute(query, values)
-                    rows_inserted = 1
-                except Exception as e:
-                    print(f"Insert error for {table_name}: {e}")
+        if isinstance(data, dict):
+            data = [data]
+        if not isinstance(data, list):
+            return 0
+        return self._insert_rows(table_name, schema, data)['inserted']
+    
+    def _insert_rows(self, table_name: str, schema: Dict[str, Any], rows: List[Dict[str, Any]], stats: FieldStats = None, keys: List[str] = ()) -> Dict[str, int]:
+        """
+        Bulk insert rows, grouped by the set of schema columns each row provides
+        (missing columns keep their table default, like the single-row INSERT)
+        keys are generated key columns every row carries in addition to the schema columns
+        Falls back to row-at-a-time inserts when a batch fails so good rows are kept, or to
+        the spool when PostgreSQL could not be reached
+        When stats is given, per-field statistics are gathered in the same pass
+        Returns: {'inserted', 'spooled'} row counts
+        """
+        properties = schema.get('properties', {})
+        groups = {}
+        for row in rows:
+            if not isinstance(row, dict):
+                continue
+            columns = tuple(c for c in properties if c in row)
+            if columns:
+                columns = tuple(keys) + columns
+                values = tuple(row[c] for c in columns)
+                groups.setdefault(columns, []).append(values)
+                if stats is not None:
+                    stats.observe(columns, values)
+        
+        counts = {'inserted': 0, 'spooled': 0}
+        targets = [journal.target('postgres', table_name)]
+        for columns, values in groups.items():
+            args = (table_name, list(columns), values)
+            if journal.spool('pg_insert', targets, args):
+                counts['spooled'] += len(values)
+                continue
+            try:
+                counts['inserted'] += self.pg.insert_many(*args)
+            except Exception as e:
+                if journal.spool('pg_insert', targets, args, e):
+                    counts['spooled'] += len(values)
+                    continue
+                print(f"Batch insert error for {table_name}, retrying row by row: {e}")
+                metrics.inc('ingest_errors_total', stage='sql_batch_insert')
+                for value in values:
+                    try:
+                        counts['inserted'] += self.pg.insert_many(table_name, list(columns), [value])
+                    except Exception as row_error:
+                        print(f"Insert error for {table_name}: {row_error}")
+                        metrics.inc('ingest_errors_total', stage='sql_insert')
         
-        return rows_inserted
+        return counts
     
-
+    def _entity_rows(self, entity_name: str, original_data: Any, entities: Dict) -> List[Dict[str, Any]]:
+        """
+        Collect every record of an entity from the original payload
+        (entities only hold the first record, which is used as the inference sample)
+        """
+        if entity_name == 'root':
+            source = original_data
+        elif isinstance(original_data, dict) and entity_name in original_data:
+            source = original_data[entity_name]
+        else:
+            source = entities.get(entity_name)
+        
+        if isinstance(source, list):
+            return [row for row in source if isinstance(row, dict)]
+        if isinstance(source, dict):
+            return [source]
+        return []
+    
+    @staticmethod
+    def _schema_signature(schema: Dict[str, Any]) -> Tuple:
+        """Hashable (field, type) signature used to merge records of the same shape"""
+        return tuple(sorted(
+            (name, info.get('type') if isinstance(info, dict) else info)
+            for name, info in schema.get('properties', {}).items()
+        ))
     
-    def _process_sql_complete(self, original_data: Any, entities: Dict, normalized: Dict, relationships: list) -> Dict[str, Any]:
+    @staticmethod
+    def _schema_fields(schema: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Field name/type/required listing returned in upload responses"""
+        fields = []
+        for field_name, field_info in schema.get('properties', {}).items():
+            fields.append({
+                'name': field_name,
+                'type': field_info.get('type', 'string'),
+                'required': field_name in schema.get('required', [])
+            })
+        return fields
+    
+    def _process_sql_complete(self, original_data: Any, entities: Dict, normalized: Dict, relationships: list,
+                              spill: bool = False, user_id: str = 'anonymous') -> Dict[str, Any]:
         """
         Complete SQL processing: create tables, insert data, return table info with sample queries
+        spill: move oversized JSONB values to MinIO (see app.services.json_service.spill)
+        user_id: value of the injected partition column in tables partitioned by user
         """
+        entries = self._sql_entries(original_data, entities, normalized)
+        if self.decompose_arrays:
+            return self._process_sql_decomposed(entries, spill=spill, user_id=user_id)
+        if self.root_references:
+            # Links between root and children are the explicit key columns of each entry
+            relationships = None
+        
         existing_tables = self.pg.list_tables()
         tables_info = []
         all_queries = []
+        pk_of = {}
         
-        for entity_name, schema in normalized.items():
-            # Generate and execute CREATE TABLE
-            ddl = generate_create_table(entity_name, schema, relationships)
-            
-            table_used = entity_name
-            if entity_name not in existing_tables:
-                self.pg.execute(ddl)
-            
-            # Insert data into table
-            entity_data = entities.get(entity_name, {})
-            rows_inserted = self._insert_data_to_table(table_used, schema, entity_data)
-            
-            # Extract field information
-            fields = []
-            for field_name, field_info in schema.get('properties', {}).items():
-                field_type = field_info.get('type', 'string')
-                fields.append({
-                    'name': field_name,
-                    'type': field_type,
-                    'required': field_name in schema.get('required', [])
-                })
+        for entry in entries:
+            table_used = entry['entity']
+            schema = entry['schema']
+            parent = (entry['parent'], pk_of[entry['parent']]) if entry['parent'] else None
+            info = self._load_table(
+                table_used, schema, entry['rows'], relationships, existing_tables,
+                ids=entry['ids'], parent=parent, parent_ids=entry['parent_ids'], spill=spill, user_id=user_id
+            )
+            pk_of[table_used] = surrogate_key(schema)
             
             # Generate sample queries (1-3 queries per table)
-            sample_data = entity_data if isinstance(entity_data, dict) else (entity_data[0] if isinstance(entity_data, list) and entity_data else {})
+            sample_data = entry['rows'][0] if entry['rows'] else {}
             
             if sample_data:
                 # 1. INSERT query
@@ -215,18 +641,22 @@ class JsonProcessor:
                         'type': 'INSERT',
                         'table': table_used,
                         'query': insert_query,
-                        'sample_values': list(insert_values)
+                        'sample_values': preview(list(insert_values))
                     })
                 
-                # 2. SELECT query
+                # 2. SELECT query (scoped to the user on tables partitioned by user, so it is pruned)
                 columns = list(schema.get('properties', {}).keys())[:5]  # First 5 columns
-                select_query, _ = QueryGenerator.generate_select_query(table_used, columns, limit=10)
+                where = {USER_COLUMN: user_id} if 'user' in info.get('partitioned_by', ()) else None
+                select_query, select_values = QueryGenerator.generate_select_query(table_used, columns, where_conditions=where, limit=10)
                 if select_query:
-                    all_queries.append({
+                    select_info = {
                         'type': 'SELECT',
                         'table': table_used,
                         'query': select_query
-                    })
+                    }
+                    if select_values:
+                        select_info['sample_values'] = preview(list(select_values))
+                    all_queries.append(select_info)
                 
                 # 3. UPDATE query (if there's a primary key or id field)
                 pk_field = None
@@ -246,14 +676,10 @@ class JsonProcessor:
                                 'type': 'UPDATE',
                                 'table': table_used,
                                 'query': update_query,
-                                'sample_values': list(update_values)
+                                'sample_values': preview(list(update_values))
                             })
             
-            tables_info.append({
-                'table_name': table_used,
-                'fields': fields,
-                'rows_inserted': rows_inserted
-            })
+            tables_info.append(info)
         
         # Return table info with sample queries (limit to first 3 queries)
         return {
@@ -263,35 +689,574 @@ class JsonProcessor:
             'status': 'success'
         }
     
-
+    def _sql_entries(self, original_data: Any, entities: Dict, normalized: Dict) -> List[Dict[str, Any]]:
+        """
+        Records to load per entity, in load order (parents before children):
+            {'entity', 'schema', 'rows', 'ids', 'parent', 'parent_ids'}
+        By default every entity is loaded as-is (ids/parent None), so a nested payload's
+        children are also copied into the root row as JSONB
+        In root-reference mode the root row keeps only its own fields plus references and
+        each child record is stored once under a client-side id:
+        one-to-one children are referenced from the root through a "{child}_id" column,
+        one-to-many children carry a "root_id" foreign key back to the root row
+        """
+        children = [name for name in normalized if name != 'root']
+        if not self.root_references or not isinstance(original_data, dict) or 'root' not in normalized or not children:
+            return [
+                {
+                    'entity': name,
+                    'schema': schema,
+                    'rows': self._entity_rows(name, original_data, entities),
+                    'ids': None,
+                    'parent': None,
+                    'parent_ids': None
+                }
+                for name, schema in normalized.items()
+            ]
+        
+        root_schema = normalized['root']
+        properties = {k: v for k, v in root_schema.get('properties', {}).items() if k not in children}
+        required = [k for k in root_schema.get('required', []) if k not in children]
+        root_row = {k: v for k, v in original_data.items() if k not in children}
+        root_id = str(uuid.uuid4())
+        root = {
+            'entity': 'root',
+            'schema': {**root_schema, 'properties': properties, 'required': required},
+            'rows': [root_row],
+            'ids': [root_id],
+            'parent': None,
+            'parent_ids': None
+        }
+        
+        entries = [root]
+        for name in children:
+            rows = self._entity_rows(name, original_data, entities)
+            ids = [str(uuid.uuid4()) for _ in rows]
+            entry = {
+                'entity': name,
+                'schema': normalized[name],
+                'rows': rows,
+                'ids': ids,
+                'parent': None,
+                'parent_ids': None
+            }
+            if isinstance(original_data.get(name), dict):
+                column = f'{name}_id'
+                properties[column] = {'type': 'uuid', 'meta': {}}
+                required.append(column)
+                root_row[column] = ids[0]
+            else:
+                entry['parent'] = 'root'
+                entry['parent_ids'] = [root_id] * len(rows)
+            entries.append(entry)
+        return entries
+    
+    def _partition_layout(self, table_name: str, schema: Dict[str, Any], existing_tables: List[str]) -> Tuple[str, ...]:
+        """
+        Partition layout of a table: TABLE_PARTITION_BY for a new table, read back from the
+        injected columns of an existing one, so changing the setting never breaks old tables
+        """
+        layout = self._table_layouts.get(table_name)
+        if layout is None:
+            if table_name in existing_tables:
+                layout = layout_of(self.pg.fetch_table_columns(table_name))
+            elif any(PARTITION_COLUMNS[kind] in schema.get('properties', {}) for kind in self.partition_by):
+                # The data already has a field named like an injected column
+                layout = ()
+            else:
+                layout = self.partition_by
+            self._table_layouts[table_name] = layout
+        return layout
+    
+    def _ensure_partitions(self, table_name: str, layout: Tuple[str, ...], ingested_at: datetime):
+        """Create the time partition (and its hash partitions) rows ingested at ingested_at go to"""
+        if 'time' not in layout:
+            return
+        start, end = period(ingested_at, self.partition_interval)
+        if (table_name, start) in self._known_partitions:
+            return
+        try:
+            with metrics.span('json', 'ddl'):
+                for stmt in generate_time_partition(table_name, layout, start, end, self.partition_modulus):
+                    self.pg.execute(stmt)
+            metrics.inc('table_partitions_ensured_total')
+        except Exception as e:
+            # e.g. a concurrent upload created it first, or an existing partition of another
+            # interval already covers the period; either way the insert is routed
+            print(f"Partition error for {table_name}: {e}")
+            metrics.inc('ingest_errors_total', stage='sql_partition')
+        self._known_partitions.add((table_name, start))
+    
+    def _load_table(self, table_name: str, schema: Dict[str, Any], rows: List[Dict[str, Any]], relationships: list,
+                    existing_tables: List[str], ids: List[str] = None, parent: Tuple[str, str] = None,
+                    parent_ids: List[str] = None, spill: bool = False, user_id: str = 'anonymous') -> Dict[str, Any]:
+        """
+        Create the table if it is missing and bulk insert its rows
+        
+        Args:
+            ids: Optional client-side primary keys, one per row
+            parent: Optional (parent_table, parent_key) adding an indexed "{parent_table}_id" foreign key
+            parent_ids: Foreign key value per row when parent is given
+            spill: Move JSONB values above SPILL_THRESHOLD_BYTES to MinIO, leaving pointers
+            user_id: Injected partition column value when the table is partitioned by user
+        
+        Returns:
+            Table info entry for the upload response
+        """
+        keys = []
+        if ids is not None:
+            pk = surrogate_key(schema)
+            keys.append(pk)
+            rows = [{**row, pk: row_id} for row, row_id in zip(rows, ids)]
+        if parent:
+            foreign_key = f'{parent[0]}_id'
+            keys.append(foreign_key)
+            rows = [{**row, foreign_key: parent_id} for row, parent_id in zip(rows, parent_ids)]
+        layout = self._partition_layout(table_name, schema, existing_tables)
+        partition_keys = [PARTITION_COLUMNS[kind] for kind in layout]
+        if layout:
+            ingested_at = datetime.now(timezone.utc)
+            values = partition_values(layout, user_id, ingested_at)
+            rows = [{**row, **values} for row in rows]
+        
+        spilled = None
+        if spill:
+            spilled = new_report()
+            jsonb = [c for c, t in schema.get('properties', {}).items() if isinstance(t, dict) and t.get('type') in ('object', 'array')]
+            rows = self.spiller.place_rows(table_name, rows, jsonb, spilled)
+        
+        if table_name not in existing_tables:
+            with metrics.span('json', 'ddl'):
+                self.pg.execute(generate_create_table(table_name, schema, relationships, parent=parent, partition_by=layout))
+                for stmt in generate_partitions(table_name, layout, self.partition_modulus):
+                    self.pg.execute(stmt)
+                if parent:
+                    self.pg.execute(generate_foreign_key_index(table_name, foreign_key))
+        if layout:
+            self._ensure_partitions(table_name, layout, ingested_at)
+        
+        # Rows carrying generated keys are new by construction, so only plain tables are merged
+        merge = self.ingest_mode == 'merge' and not keys
+        merge_key, merge_error = self._merge_key(table_name, schema, layout) if merge else (None, None)
+        
+        stats = self._new_stats()
+        if merge_key:
+            with metrics.span('json', 'sql_merge'):
+                counts = self._merge_rows(table_name, schema, rows, merge_key, stats, keys=partition_keys)
+        else:
+            with metrics.span('json', 'sql_insert'):
+                counts = self._insert_rows(table_name, schema, rows, stats, keys=keys + partition_keys)
+        
+        info = {
+            'table_name': table_name,
+            'fields': self._schema_fields(schema),
+            'rows_inserted': counts['inserted'],
+            # Generated primary and foreign keys, partition columns and the merge key are already indexed
+            'indexes': self._apply_sql_indexes(table_name, stats, skip=keys + partition_keys + (merge_key or []))
+        }
+        if merge:
+            info.update(self._merge_info(merge_key, merge_error, counts if merge_key else None))
+        if counts['spooled']:
+            info['rows_spooled'] = counts['spooled']
+        if spilled and spilled['values']:
+            info['spilled'] = spilled
+        if layout:
+            info['partitioned_by'] = list(layout)
+        if parent:
+            info['parent_table'] = parent[0]
+            info['foreign_key'] = foreign_key
+        return info
     
-    def _insert_data_to_collection(self, collection_name: str, schema: Dict[str, Any], data: Any) -> int:
+    def _merge_key(self, table_name: str, schema: Dict[str, Any], layout: Tuple[str, ...] = ()) -> Tuple[List[str], str]:
+        """
+        Pick the natural key of a table for merge mode and make sure it has a unique index
+        The key is the requested merge_key when the table has all of its columns, otherwise
+        the first of NATURAL_KEYS it has; object and array fields never qualify
+        On tables partitioned by user the key is scoped to the user (unique indexes must
+        include the partition columns); tables partitioned by time cannot be merged
+        Returns: (key columns or None to append, error creating the index or None)
+        """
+        if 'time' in layout:
+            return None, "Tables partitioned by ingestion time are always appended"
+        properties = schema.get('properties', {})
+        if self.merge_key:
+            candidates = [[c.strip() for c in self.merge_key.split(',') if c.strip()]]
+        else:
+            candidates = [[name] for name in NATURAL_KEYS]
+        key = next((k for k in candidates if k and all(
+            c in properties and properties[c].get('type') not in ('object', 'array') for c in k
+        )), None)
+        if key is None:
+            return None, None
+        key = key + [PARTITION_COLUMNS[kind] for kind in layout]
+        try:
+            with metrics.span('json', 'ddl'):
+                self.pg.execute(generate_unique_key_index(table_name, key))
+        except Exception as e:
+            # e.g. rows appended earlier already repeat the key
+            print(f"Merge key error for {table_name}, appending instead: {e}")
+            metrics.inc('ingest_errors_total', stage='sql_merge_key')
+            return None, str(e)
+        return key, None
+    
+    @staticmethod
+    def _merge_info(key: List[str], error: str, counts: Dict[str, int]) -> Dict[str, Any]:
+        """Merge fields of a table entry in the upload response"""
+        info = {'mode': 'merge' if key else 'append', 'merge_key': key}
+        if counts is not None:
+            info['rows_updated'] = counts['updated']
+            info['rows_unchanged'] = counts['unchanged']
+        if error:
+            info['merge_error'] = error
+        return info
+    
+    def _merge_rows(self, table_name: str, schema: Dict[str, Any], rows: List[Dict[str, Any]], key: List[str],
+                    stats: FieldStats = None, keys: List[str] = ()) -> Dict[str, int]:
+        """
+        Upsert rows on the key columns, grouped by the set of schema columns each row provides
+        like _insert_rows, so a row leaves the columns it lacks untouched
+        keys are injected columns every row carries in addition to the schema columns
+        Groups are spooled when PostgreSQL could not be reached
+        Returns: {'inserted', 'updated', 'unchanged', 'spooled', 'failed'} row counts
+        """
+        properties = schema.get('properties', {})
+        groups = {}
+        for row in rows:
+            if not isinstance(row, dict):
+                continue
+            columns = tuple(c for c in properties if c in row)
+            if columns:
+                columns = tuple(keys) + columns
+                values = tuple(row[c] for c in columns)
+                groups.setdefault(columns, []).append(values)
+                if stats is not None:
+                    stats.observe(columns, values)
+        return self._merge_groups(table_name, groups, key)
+    
+    def _merge_groups(self, table_name: str, groups: Dict[tuple, List[tuple]], key: List[str]) -> Dict[str, int]:
+        """
+        Upsert {columns: value tuples} groups with _merge_values, spooling a group when
+        PostgreSQL could not be reached
+        Returns: {'inserted', 'updated', 'unchanged', 'spooled', 'failed'} row counts
+        """
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'spooled': 0, 'failed': 0}
+        targets = [journal.target('postgres', table_name)]
+        for columns, values in groups.items():
+            args = (table_name, list(columns), values, key)
+            if journal.spool('pg_merge', targets, args):
+                counts['spooled'] += len(values)
+                continue
+            try:
+                for name, n in self._merge_values(*args).items():
+                    counts[name] += n
+            except Exception as e:
+                if journal.spool('pg_merge', targets, args, e):
+                    counts['spooled'] += len(values)
+                    continue
+                print(f"Merge error for {table_name}: {e}")
+                metrics.inc('ingest_errors_total', stage='sql_merge')
+                counts['failed'] += len(values)
+        return counts
+    
+    def _merge_values(self, table_name: str, columns: List[str], values: List[tuple], key: List[str]) -> Dict[str, int]:
+        """
+        Upsert value tuples on the key columns in one staged statement
+        Tuples without a full key are appended; a key repeated in values keeps its last tuple
+        Returns: {'inserted', 'updated', 'unchanged'} row counts
+        """
+        if not all(k in columns for k in key):
+            return {'inserted': self.pg.insert_many(table_name, columns, values), 'updated': 0, 'unchanged': 0}
+        positions = [columns.index(k) for k in key]
+        by_key = {}
+        keyless = []
+        for value in values:
+            key_value = tuple(value[p] for p in positions)
+            if None in key_value:
+                keyless.append(value)
+            else:
+                by_key[key_value] = value
+        inserted, updated = self.pg.merge_rows(table_name, columns, list(by_key.values()), key)
+        unchanged = len(by_key) - inserted - updated
+        if keyless:
+            inserted += self.pg.insert_many(table_name, columns, keyless)
+        return {'inserted': inserted, 'updated': updated, 'unchanged': unchanged}
+    
+    def _load_decomposed(self, entries: List[Dict[str, Any]], spill: bool = False, user_id: str = 'anonymous') -> List[Dict[str, Any]]:
+        """
+        Decompose each entry's records into parent/child tables, create any missing tables
+        with indexed foreign keys, then COPY every table in one transaction (parents first)
+        Tables get the same partition layout and injected partition columns as _load_table
+        In merge mode, tables that are neither parent nor child of another table are upserted
+        on their natural key instead; linked tables are keyed by generated ids and appended
+        When the COPY fails it is spooled if PostgreSQL could not be reached, else each table
+        is inserted on its own (row by row when its batch fails too) and rejected rows are
+        reported as rows_failed
+        
+        Args:
+            entries: {'table', 'rows'} plus optional client-side 'ids' and a 'parent' table
+                     with one 'parent_ids' value per row (see _sql_entries)
+            spill: Move JSONB values above SPILL_THRESHOLD_BYTES to MinIO, leaving pointers
+            user_id: Injected partition column value when a table is partitioned by user
+        
+        Returns:
+            Table info list for the response
+        """
+        plans = []
+        for entry in entries:
+            rows = entry['rows']
+            parent = entry.get('parent')
+            if parent:
+                rows = [{**row, f'{parent}_id': parent_id} for row, parent_id in zip(rows, entry['parent_ids'])]
+            plans.extend(decompose_records(entry['table'], rows, self.infer_fn, parent_table=parent, ids=entry.get('ids')))
+        
+        existing_tables = self.pg.list_tables()
+        ingested_at = datetime.now(timezone.utc)
+        pk_of = {}
+        for plan in plans:
+            pk_of[plan['table']] = plan['columns'][0]
+            layout = plan['layout'] = self._partition_layout(plan['table'], plan['schema'], existing_tables)
+            if layout:
+                values = partition_values(layout, user_id, ingested_at)
+                plan['columns'] = plan['columns'] + list(values)
+                plan['rows'] = [row + tuple(values.values()) for row in plan['rows']]
+            jsonb = [c for c, t in plan['schema'].get('properties', {}).items() if isinstance(t, dict) and t.get('type') in ('object', 'array')]
+            if spill and jsonb:
+                plan['spilled'] = new_report()
+                columns = plan['columns']
+                placed = self.spiller.place_rows(plan['table'], [dict(zip(columns, row)) for row in plan['rows']], jsonb, plan['spilled'])
+                plan['rows'] = [tuple(row[c] for c in columns) for row in placed]
+            if plan['table'] not in existing_tables:
+                parent = (plan['parent'], pk_of[plan['parent']]) if plan['parent'] else None
+                self.pg.execute(generate_create_table(plan['table'], plan['schema'], parent=parent, partition_by=layout))
+                for stmt in generate_partitions(plan['table'], layout, self.partition_modulus):
+                    self.pg.execute(stmt)
+                if plan['foreign_key']:
+                    self.pg.execute(generate_foreign_key_index(plan['table'], plan['foreign_key']))
+            if layout:
+                self._ensure_partitions(plan['table'], layout, ingested_at)
+        
+        merge = self.ingest_mode == 'merge'
+        if merge:
+            linked = {p['parent'] for p in plans if p['parent']} | {e['table'] for e in entries if e.get('ids') is not None}
+            for plan in plans:
+                if plan['parent'] or plan['table'] in linked:
+                    plan['merge_key'], plan['merge_error'] = None, "Decomposed parent and child tables are always appended"
+                else:
+                    plan['merge_key'], plan['merge_error'] = self._merge_key(plan['table'], plan['schema'], plan['layout'])
+        merged = [i for i, p in enumerate(plans) if p.get('merge_key')]
+        copied = [i for i in range(len(plans)) if i not in merged]
+        
+        loads = [(plans[i]['table'], plans[i]['columns'], plans[i]['rows']) for i in copied]
+        try:
+            self.pg.copy_tables(loads)
+            load_counts = [{'inserted': len(rows), 'spooled': 0, 'failed': 0} for _, _, rows in loads]
+        except Exception as e:
+            load_counts = self._load_after_copy_error(loads, e)
+        counts = dict(zip(copied, load_counts))
+        for i in merged:
+            plan = plans[i]
+            # Without the generated primary key, so a merged row keeps the one it was first stored under
+            groups = {tuple(plan['columns'][1:]): [row[1:] for row in plan['rows']]}
+            with metrics.span('json', 'sql_merge'):
+                counts[i] = self._merge_groups(plan['table'], groups, plan['merge_key'])
+        
+        tables_info = []
+        for i, plan in enumerate(plans):
+            count = counts[i]
+            stats = self._new_stats()
+            if stats is not None:
+                for row in plan['rows']:
+                    stats.observe(plan['columns'], row)
+            # Primary and foreign keys and partition columns are already indexed
+            keys = plan['columns'][:2] if plan['foreign_key'] else plan['columns'][:1]
+            keys += [PARTITION_COLUMNS[kind] for kind in plan['layout']] + (plan.get('merge_key') or [])
+            info = {
+                'table_name': plan['table'],
+                'fields': self._schema_fields(plan['schema']),
+                'parent_table': plan['parent'],
+                'foreign_key': plan['foreign_key'],
+                'rows_inserted': count['inserted'],
+                **({'rows_spooled': count['spooled']} if count['spooled'] else {}),
+                **({'rows_failed': count['failed']} if count['failed'] else {}),
+                'indexes': self._apply_sql_indexes(plan['table'], stats, skip=keys)
+            }
+            if merge:
+                info.update(self._merge_info(plan['merge_key'], plan['merge_error'], count if plan['merge_key'] else None))
+            if plan.get('spilled') and plan['spilled']['values']:
+                info['spilled'] = plan['spilled']
+            if plan['layout']:
+                info['partitioned_by'] = list(plan['layout'])
+            tables_info.append(info)
+        return tables_info
+    
+    def _load_after_copy_error(self, loads: List[tuple], error: Exception) -> List[Dict[str, int]]:
+        """
+        Salvage the loads of a failed copy_tables call, in order (parents first)
+        Returns: {'inserted', 'spooled', 'failed'} row counts per load
+        """
+        counts = []
+        for table_name, columns, rows in loads:
+            count = {'inserted': 0, 'spooled': 0, 'failed': 0}
+            counts.append(count)
+            if journal.spool('pg_copy', [journal.target('postgres', table_name)], (table_name, columns, rows), error):
+                count['spooled'] = len(rows)
+                continue
+            if not rows:
+                continue
+            try:
+                count['inserted'] = self.pg.insert_many(table_name, list(columns), rows)
+                continue
+            except Exception as e:
+                print(f"COPY and batch insert error for {table_name}, retrying row by row: {error}; {e}")
+                metrics.inc('ingest_errors_total', stage='sql_copy')
+            for row in rows:
+                try:
+                    count['inserted'] += self.pg.insert_many(table_name, list(columns), [row])
+                except Exception as row_error:
+                    print(f"Insert error for {table_name}: {row_error}")
+                    metrics.inc('ingest_errors_total', stage='sql_insert')
+                    count['failed'] += 1
+        return counts
+    
+    def _process_sql_decomposed(self, entries: List[Dict[str, Any]], spill: bool = False, user_id: str = 'anonymous') -> Dict[str, Any]:
+        """
+        SQL processing in decomposition mode: nested arrays of objects become child tables
+        keyed back to their parent row, all loaded in one batched COPY pass
+        """
+        with metrics.span('json', 'sql_copy'):
+            tables_info = self._load_decomposed([{**entry, 'table': entry['entity']} for entry in entries], spill=spill, user_id=user_id)
+        
+        all_queries = []
+        for info in tables_info:
+            columns = [f['name'] for f in info['fields']][:5]
+            if info['foreign_key']:
+                columns = [info['foreign_key']] + columns[:4]
+            # Scoped to the user on tables partitioned by user, so it is pruned
+            where = {USER_COLUMN: user_id} if 'user' in info.get('partitioned_by', ()) else None
+            select_query, select_values = QueryGenerator.generate_select_query(info['table_name'], columns, where_conditions=where, limit=10)
+            select_info = {
+                'type': 'SELECT',
+                'table': info['table_name'],
+                'query': select_query
+            }
+            if select_values:
+                select_info['sample_values'] = preview(list(select_values))
+            all_queries.append(select_info)
+        
+        return {
+            'schema_type': 'sql',
+            'tables': tables_info,
+            'queries': all_queries[:3],
+            'status': 'success'
+        }
+    
+    @staticmethod
+    def _record_written(result: Dict[str, Any]):
+        """Observe rows/documents written by one upload"""
+        rows = sum(t.get('rows_inserted', 0) + t.get('rows_updated', 0) for t in result.get('tables', []))
+        docs = sum(c.get('documents_inserted', 0) for c in result.get('collections', []))
+        if result.get('tables'):
+            metrics.observe('ingest_written', rows, kind='rows')
+        if result.get('collections'):
+            metrics.observe('ingest_written', docs, kind='docs')
+    
+    def _new_stats(self):
+        """Fresh per-field statistics collector, or None when the index advisor is off"""
+        return FieldStats() if self.index_advisor != 'off' else None
+    
+    def _apply_sql_indexes(self, table_name: str, stats: FieldStats, skip: List[str] = None) -> List[Dict[str, Any]]:
+        """
+        Propose (and in 'create' mode, build) indexes for a table from its field stats
+        Returns: index proposals for the response
+        """
+        if stats is None:
+            return []
+        proposals = advise_sql_indexes(table_name, stats.summary(), skip=skip)
+        for proposal in proposals:
+            proposal['created'] = False
+            if self.index_advisor == 'create':
+                try:
+                    self.pg.execute(proposal['ddl'])
+                    proposal['created'] = True
+                except Exception as e:
+                    print(f"Index creation error for {table_name}: {e}")
+                    metrics.inc('ingest_errors_total', stage='sql_index')
+        return proposals
+    
+    def _apply_mongo_indexes(self, collection_name: str, stats: FieldStats) -> List[Dict[str, Any]]:
+        """
+        Propose (and in 'create' mode, build) MongoDB indexes for a collection from its field stats
+        Returns: index proposals for the response
+        """
+        if stats is None:
+            return []
+        proposals = advise_mongo_indexes(stats.summary())
+        for proposal in proposals:
+            proposal['created'] = False
+            if self.index_advisor == 'create':
+                try:
+                    proposal['name'] = self.mongo.create_index(collection_name, proposal['keys'])
+                    proposal['created'] = True
+                except Exception as e:
+                    print(f"Index creation error for {collection_name}: {e}")
+                    metrics.inc('ingest_errors_total', stage='nosql_index')
+        return proposals
+    
+    def _insert_data_to_collection(self, collection_name: str, schema: Dict[str, Any], data: Any, stats: FieldStats = None,
+                                   spilled: Dict[str, Any] = None) -> Dict[str, int]:
         """
         Insert data into MongoDB collection using QueryGenerator
-        Returns: number of documents inserted
+        When stats is given, per-field statistics of the inserted documents are gathered
+        When spilled (a spill report) is given, oversized fields and documents are moved to MinIO first
+        Documents go to the spool when MongoDB could not be reached
+        Returns: {'inserted', 'spooled'} document counts
         """
-        docs_inserted = 0
-        collection = self.mongo.get_collection(collection_name)
+        counts = {'inserted': 0, 'spooled': 0}
+        targets = [journal.target('mongo', collection_name)]
+        args = None
         
         try:
             if isinstance(data, list):
                 # Array of documents - prepare and insert
                 documents = QueryGenerator.prepare_mongodb_batch(schema, data)
+                if spilled is not None:
+                    documents = [self.spiller.place_document(collection_name, d, spilled) for d in documents]
+                if stats is not None:
+                    for document in documents:
+                        stats.observe_row(document)
                 if documents:
-                    result = collection.insert_many(documents)
-                    docs_inserted = len(result.inserted_ids)
+                    args = (collection_name, documents)
+                    if journal.spool('mongo_insert', targets, args):
+                        counts['spooled'] = len(documents)
+                    else:
+                        result = self.mongo.insert_many(*args)
+                        counts['inserted'] = len(result.inserted_ids)
             elif isinstance(data, dict):
                 # Single document - prepare and insert
                 document = QueryGenerator.prepare_mongodb_document(schema, data)
+                if spilled is not None and document:
+                    document = self.spiller.place_document(collection_name, document, spilled)
+                if stats is not None and document:
+                    stats.observe_row(document)
                 if document:
-                    result = collection.insert_one(document)
-                    docs_inserted = 1
+                    args = (collection_name, [document])
+                    if journal.spool('mongo_insert', targets, args):
+                        counts['spooled'] = 1
+                    else:
+                        self.mongo.insert_one(collection_name, document)
+                        counts['inserted'] = 1
         except Exception as e:
-            print(f"MongoDB insert error for {collection_name}: {e}")
+            # args is only set once the documents are ready, so only failed inserts are spooled
+            if args is not None and journal.spool('mongo_insert', targets, args, e):
+                counts['spooled'] = len(args[1])
+            else:
+                print(f"MongoDB insert error for {collection_name}: {e}")
+                metrics.inc('ingest_errors_total', stage='nosql_insert')
         
-        return docs_inserted
+        return counts
     
-    def _process_nosql_complete(self, original_data: Any, entities: Dict, normalized: Dict, user_id: str) -> Dict[str, Any]:
+    def _process_nosql_complete(self, original_data: Any, entities: Dict, normalized: Dict, user_id: str,
+                                spill: bool = False) -> Dict[str, Any]:
         """
         Complete NoSQL processing: create user-specific collection, insert data, return collection info with sample queries
         
@@ -300,6 +1265,7 @@ class JsonProcessor:
             entities: Detected entities
             normalized: Normalized schemas
             user_id: User identifier to use as collection name
+            spill: Move oversized fields and documents to MinIO (see app.services.json_service.spill)
         """
         # Use user_id as collection name (one collection per user)
         collection_name = user_id
@@ -309,33 +1275,32 @@ class JsonProcessor:
         
         # Generate and apply MongoDB validator
         validator = to_mongo_validator(root_schema)
-        self.mongo.create_validator(collection_name, validator)
+        with metrics.span('json', 'ddl'):
+            self.mongo.create_validator(collection_name, validator)
         
         # Insert the complete original data as a single document
-        docs_inserted = self._insert_data_to_collection(collection_name, root_schema, original_data)
+        stats = self._new_stats()
+        spilled = new_report() if spill else None
+        with metrics.span('json', 'nosql_insert'):
+            docs = self._insert_data_to_collection(collection_name, root_schema, original_data, stats, spilled)
         
         # Extract field information from root schema
-        fields = []
-        for field_name, field_info in root_schema.get('properties', {}).items():
-            field_type = field_info.get('type', 'string')
-            fields.append({
-                'name': field_name,
-                'type': field_type,
-                'required': field_name in root_schema.get('required', [])
-            })
+        fields = self._schema_fields(root_schema)
         
         # Generate sample MongoDB queries using original data
         all_queries = []
         
+        # Samples hold bounded previews of the data, never the whole upload
         if original_data:
-            # 1. insertOne query - show the complete document that was inserted
-            insert_doc = QueryGenerator.prepare_mongodb_document(root_schema, original_data)
+            # 1. insertOne query - a preview of the (first) document that was inserted
+            sample_doc = original_data[0] if isinstance(original_data, list) and original_data else original_data
+            insert_doc = QueryGenerator.prepare_mongodb_document(root_schema, sample_doc) if isinstance(sample_doc, dict) else None
             if insert_doc:
                 all_queries.append({
                     'type': 'insertOne',
                     'collection': collection_name,
                     'operation': f'db.{collection_name}.insertOne(...)',
-                    'document': insert_doc
+                    'document': preview(insert_doc)
                 })
             
             # 2. find query - use first available field for filter
@@ -355,7 +1320,7 @@ class JsonProcessor:
                     'type': 'find',
                     'collection': collection_name,
                     'operation': f'db.{collection_name}.find(...)',
-                    'filter': filter_obj
+                    'filter': preview(filter_obj)
                 })
             
             # 3. updateOne query
@@ -367,15 +1332,20 @@ class JsonProcessor:
                     'type': 'updateOne',
                     'collection': collection_name,
                     'operation': f'db.{collection_name}.updateOne(...)',
-                    'filter': {first_key: original_data[first_key]},
-                    'update': {'$set': {second_key: original_data[second_key]}}
+                    'filter': preview({first_key: original_data[first_key]}),
+                    'update': {'$set': preview({second_key: original_data[second_key]})}
                 })
         
         collections_info = [{
             'collection_name': collection_name,
             'fields': fields,
-            'documents_inserted': docs_inserted
+            'documents_inserted': docs['inserted'],
+            'indexes': self._apply_mongo_indexes(collection_name, stats)
         }]
+        if docs['spooled']:
+            collections_info[0]['documents_spooled'] = docs['spooled']
+        if spilled and spilled['stored_bytes']:
+            collections_info[0]['spilled'] = spilled
         
         # Return collection info with sample queries (limit to first 3 queries)
         return {
@@ -3,6 +3,7 @@ Query Generator Module
 Handles INSERT query generation for SQL and NoSQL databases
 """
 from typing import Dict, Any, Tuple, Optional, List
+from app.services.query_service.filters import OPERATORS
 
 
 class QueryGenerator:
@@ -144,6 +145,47 @@ class QueryGenerator:
         
         return query, tuple(values)
     
+    @staticmethod
+    def generate_keyset_select(table_name: str, columns: Optional[List[str]], filters: List[Tuple[str, str, Any]], order_by: str, after: Optional[Any] = None, limit: Optional[int] = None) -> Tuple[str, tuple]:
+        """
+        Generate a keyset-paginated SELECT for PostgreSQL
+        
+        Args:
+            table_name: Name of the target table
+            columns: Columns to select (None means SELECT *)
+            filters: (column, op, value) tuples, op one of eq/ne/lt/lte/gt/gte
+            order_by: Column the pages are ordered by (should be unique, e.g. the primary key)
+            after: Return rows with order_by greater than this value
+            limit: Optional page size
+        
+        Returns:
+            Tuple of (query_string, values_tuple)
+        
+        Example:
+            query, values = generate_keyset_select('users', ['id', 'age'], [('age', 'gte', 18)], 'id', after='42', limit=100)
+            # Returns: ('SELECT "id", "age" FROM "users" WHERE "age" >= %s AND "id" > %s ORDER BY "id" LIMIT %s', (18, '42', 100))
+        """
+        cols = ', '.join(f'"{col}"' for col in columns) if columns else '*'
+        query = f'SELECT {cols} FROM "{table_name}"'
+        
+        conditions = []
+        values = []
+        for col, op, val in filters:
+            conditions.append(f'"{col}" {OPERATORS[op]} %s')
+            values.append(val)
+        if after is not None:
+            conditions.append(f'"{order_by}" > %s')
+            values.append(after)
+        if conditions:
+            query += f' WHERE {" AND ".join(conditions)}'
+        
+        query += f' ORDER BY "{order_by}"'
+        if limit:
+            query += ' LIMIT %s'
+            values.append(limit)
+        
+        return query, tuple(values)
+    
     @staticmethod
     def generate_delete_query(table_name: str, where_conditions: Dict[str, Any]) -> Tuple[str, tuple]:
         """
@@ -0,0 +1,162 @@
+"""
+Size-aware placement of oversized JSON values
+
+Before rows and documents are written, objects and arrays whose JSON encoding is larger
+than SPILL_THRESHOLD_BYTES are compressed and stored in MinIO. The row or document keeps
+a small pointer in their place:
+
+    {"_spilled": {"key", "codec", "bytes", "stored_bytes", "type", "summary"}}
+
+- PostgreSQL: JSONB column values (object and array columns), so TOAST stays small
+- MongoDB: top-level object and array fields; a document still larger than
+  SPILL_DOCUMENT_BYTES afterwards (MongoDB rejects documents over 16 MB) is stored
+  whole and only its pointer is inserted
+
+Compression is zstd when the zstandard package is installed, zlib otherwise; the pointer
+records which one. Readers call rehydrate() on the rows they return.
+"""
+import hashlib
+import json
+import os
+import zlib
+from typing import Any, Dict, List
+from app.db import clients
+from app.services.json_service.preview import preview
+from app.utils.metrics import registry as metrics
+from app.utils.responses.fast_json import dumps
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 0 disables spilling
+SPILL_THRESHOLD_BYTES = int(os.getenv('SPILL_THRESHOLD_BYTES', str(1024 * 1024)))
+# Headroom under MongoDB's 16 MB BSON limit, measured as JSON
+SPILL_DOCUMENT_BYTES = int(os.getenv('SPILL_DOCUMENT_BYTES', str(15 * 1024 * 1024)))
+SPILL_SUMMARY_BYTES = int(os.getenv('SPILL_SUMMARY_BYTES', '256'))
+POINTER_FIELD = '_spilled'
+CODEC_TYPES = {'zstd': 'application/zstd', 'zlib': 'application/zlib'}
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return zlib.compress(data, 6)
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('Reading zstd-compressed spilled values requires zstandard (pip install zstandard)')
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def is_pointer(value: Any) -> bool:
+    return isinstance(value, dict) and isinstance(value.get(POINTER_FIELD), dict) and 'key' in value[POINTER_FIELD]
+
+
+def new_report() -> Dict[str, Any]:
+    return {'values': 0, 'documents': 0, 'bytes': 0, 'stored_bytes': 0, 'fields': []}
+
+
+class Spiller:
+    """Moves oversized values to MinIO and loads them back"""
+
+    def __init__(self, minio=None, threshold: int = None, document_bytes: int = None):
+        self._minio = minio
+        self.threshold = SPILL_THRESHOLD_BYTES if threshold is None else threshold
+        self.document_bytes = SPILL_DOCUMENT_BYTES if document_bytes is None else document_bytes
+        self.bucket = os.getenv('SPILL_BUCKET') or os.getenv('MINIO_BUCKET', 'user-uploads')
+        self.codec = 'zstd' if zstandard is not None else 'zlib'
+
+    @property
+    def minio(self):
+        return self._minio or clients.get_minio()
+
+    def applies_to(self, payload_bytes: int) -> bool:
+        """Whether anything in an upload of this size can be spilled; smaller uploads skip the stage"""
+        return self.threshold > 0 and payload_bytes > min(self.threshold, self.document_bytes)
+
+    def _store(self, prefix: str, value: Any, encoded: bytes, report: Dict[str, Any]) -> Dict[str, Any]:
+        body = compress(encoded, self.codec)
+        # Content-addressed: an identical value re-uploaded gets the same pointer, so merge
+        # mode sees no change and the object is simply overwritten
+        key = f'{prefix}/{hashlib.sha256(encoded).hexdigest()}.json.{self.codec}'
+        with metrics.span('json', 'spill'):
+            self.minio.put_object(self.bucket, key, body, CODEC_TYPES[self.codec])
+        report['bytes'] += len(encoded)
+        report['stored_bytes'] += len(body)
+        metrics.inc('spilled_bytes_total', len(encoded), kind='raw')
+        metrics.inc('spilled_bytes_total', len(body), kind='stored')
+        return {POINTER_FIELD: {
+            'key': key,
+            'codec': self.codec,
+            'bytes': len(encoded),
+            'stored_bytes': len(body),
+            'type': 'array' if isinstance(value, list) else 'object',
+            'summary': preview(value, max_bytes=SPILL_SUMMARY_BYTES, max_depth=1)
+        }}
+
+    def _place_fields(self, prefix: str, row: Dict[str, Any], fields, report: Dict[str, Any]) -> Dict[str, Any]:
+        placed = row
+        for field in fields:
+            value = row.get(field)
+            if not isinstance(value, (dict, list)) or is_pointer(value):
+                continue
+            encoded = dumps(value)
+            if len(encoded) <= self.threshold:
+                continue
+            if placed is row:
+                # Copy on the first spill only; rows without large values are passed through
+                placed = dict(row)
+            placed[field] = self._store(prefix, value, encoded, report)
+            report['values'] += 1
+            if field not in report['fields']:
+                report['fields'].append(field)
+        return placed
+
+    def place_rows(self, table_name: str, rows: List[Dict[str, Any]], fields: List[str], report: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Rows with their oversized values in the given (JSONB) fields replaced by pointers"""
+        if not fields:
+            return rows
+        prefix = f'spill/tables/{table_name}'
+        return [self._place_fields(prefix, row, fields, report) if isinstance(row, dict) else row for row in rows]
+
+    def place_document(self, collection_name: str, document: Dict[str, Any], report: Dict[str, Any]) -> Dict[str, Any]:
+        """A document with oversized top-level fields (or, past SPILL_DOCUMENT_BYTES, itself) spilled"""
+        prefix = f'spill/collections/{collection_name}'
+        encoded = dumps(document)
+        if len(encoded) <= self.threshold:
+            return document
+        placed = self._place_fields(prefix, document, list(document), report)
+        if placed is not document:
+            encoded = dumps(placed)
+        if len(encoded) <= self.document_bytes:
+            return placed
+        # Stored with the pointers of its spilled fields, so nothing is uploaded twice
+        report['documents'] += 1
+        return self._store(prefix, placed, encoded, report)
+
+    def load(self, pointer: Dict[str, Any]) -> Any:
+        """The original value of a pointer"""
+        info = pointer[POINTER_FIELD]
+        metrics.inc('spill_loads_total')
+        data = self.minio.read(self.bucket, info['key'])
+        return json.loads(decompress(data, info['codec']))
+
+    def rehydrate(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """A row or document with its spilled values loaded back (MongoDB's _id is kept)"""
+        if is_pointer(row):
+            document = self.rehydrate(self.load(row))
+            if '_id' in row:
+                document = {'_id': row['_id'], **document}
+            return document
+        spilled = [k for k, v in row.items() if is_pointer(v)]
+        if not spilled:
+            return row
+        row = dict(row)
+        for k in spilled:
+            row[k] = self.load(row[k])
+        return row
@@ -0,0 +1,89 @@
+from typing import Dict, Any, List
+
+KEY_TYPES = {'uuid', 'email'}
+# Fields this selective are treated as (near-)unique lookup keys
+KEY_SELECTIVITY = 0.5
+# Below this many distinct values an equality index rarely beats a scan
+MIN_DISTINCT = 3
+
+
+def _is_reference(name: str) -> bool:
+    leaf = name.rsplit('.', 1)[-1]
+    return leaf == 'id' or leaf.endswith('_id')
+
+
+def _index_reason(name: str, stat: Dict[str, Any]) -> str:
+    """Why a scalar field is worth a B-tree index, or None"""
+    t = stat['type']
+    if t == 'datetime':
+        return 'datetime field used for range filters and sorting'
+    if stat['distinct'] < MIN_DISTINCT and stat['selectivity'] < 1.0:
+        return None
+    if t in KEY_TYPES and stat['selectivity'] >= KEY_SELECTIVITY:
+        return f'{t} field with selectivity {stat["selectivity"]}'
+    if _is_reference(name) and t not in ('object', 'array', 'boolean'):
+        return f'identifier/reference field with {stat["distinct"]} distinct values'
+    return None
+
+
+def advise_sql_indexes(table_name: str, stats: Dict[str, Dict[str, Any]], skip: List[str] = None) -> List[Dict[str, Any]]:
+    """
+    Propose PostgreSQL indexes for a generated table from per-field stats
+    B-tree for likely keys (uuid/email/id-like) and datetime columns, GIN for JSONB containment
+    Returns list of {'columns', 'method', 'reason', 'ddl'}
+    """
+    skip = set(skip or [])
+    proposals = []
+    
+    for name, stat in stats.items():
+        if '.' in name or name in skip:
+            continue
+        if stat['type'] == 'object':
+            proposals.append({
+                'columns': [name],
+                'method': 'gin',
+                'reason': 'JSONB column, supports @> containment queries',
+                'ddl': f'CREATE INDEX IF NOT EXISTS "{table_name}_{name}_gin_idx" ON "{table_name}" USING GIN ("{name}" jsonb_path_ops);'
+            })
+            continue
+        reason = _index_reason(name, stat)
+        if reason:
+            proposals.append({
+                'columns': [name],
+                'method': 'btree',
+                'reason': reason,
+                'ddl': f'CREATE INDEX IF NOT EXISTS "{table_name}_{name}_idx" ON "{table_name}" ("{name}");'
+            })
+    
+    return proposals
+
+
+def advise_mongo_indexes(stats: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Propose MongoDB indexes from per-field stats (dotted paths included)
+    Single-field indexes for likely keys and datetimes, plus one compound
+    (key, datetime desc) index for the common "filter by key, newest first" query
+    Returns list of {'keys': [(field, direction)], 'reason'}
+    """
+    proposals = []
+    key_fields = []
+    time_fields = []
+    
+    for name, stat in stats.items():
+        reason = _index_reason(name, stat)
+        if not reason:
+            continue
+        proposals.append({'keys': [(name, 1)], 'reason': reason})
+        if stat['type'] == 'datetime':
+            time_fields.append(name)
+        else:
+            key_fields.append((stat['selectivity'], name))
+    
+    if key_fields and time_fields:
+        _, key = max(key_fields)
+        proposals.append({
+            'keys': [(key, 1), (time_fields[0], -1)],
+            'reason': f'equality on {key} with newest-first sort on {time_fields[0]}'
+        })
+    
+    return proposals
@@ -0,0 +1,116 @@
+"""
+Declarative partitioning of generated tables
+
+A partitioned table gets injected columns that are not part of the uploaded data:
+
+    "_user_id"      TEXT         'user': PARTITION BY HASH, a fixed number of partitions
+    "_ingested_at"  TIMESTAMPTZ  'time': PARTITION BY RANGE, one partition per interval
+
+With both, ingestion time is the outer level and every period is hash-partitioned by user,
+so old periods can be detached or dropped whole and a per-user query scans one partition
+per period. Hash partitions and an index on "_user_id" are created with their parent, time
+partitions the first time an upload falls into their period. Rows are inserted into the
+parent and PostgreSQL routes them.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Tuple
+
+USER_COLUMN = '_user_id'
+TIME_COLUMN = '_ingested_at'
+# Partition kind -> injected column, in layout order
+PARTITION_COLUMNS = {'user': USER_COLUMN, 'time': TIME_COLUMN}
+COLUMN_DDL = {
+    'user': f'"{USER_COLUMN}" TEXT NOT NULL',
+    'time': f'"{TIME_COLUMN}" TIMESTAMPTZ NOT NULL DEFAULT now()',
+}
+INTERVALS = ('day', 'week', 'month')
+# PostgreSQL truncates longer identifiers
+MAX_IDENTIFIER = 63
+
+
+def parse_partition_by(value: str) -> Tuple[str, ...]:
+    """'user', 'time', 'user,time' (any order) or '' -> layout tuple in PARTITION_COLUMNS order"""
+    kinds = {k.strip().lower() for k in (value or '').split(',') if k.strip()}
+    unknown = kinds - set(PARTITION_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown partitioning '{', '.join(sorted(unknown))}', expected user, time or both")
+    return tuple(k for k in PARTITION_COLUMNS if k in kinds)
+
+
+def layout_of(columns: Iterable[str]) -> Tuple[str, ...]:
+    """Layout of an existing table, read back from its injected columns"""
+    columns = set(columns)
+    return tuple(k for k, c in PARTITION_COLUMNS.items() if c in columns)
+
+
+def partition_values(layout: Tuple[str, ...], user_id: str, ingested_at: datetime) -> Dict[str, object]:
+    """Injected column values of one upload's rows"""
+    values = {'user': user_id, 'time': ingested_at}
+    return {PARTITION_COLUMNS[k]: values[k] for k in layout}
+
+
+def partition_clause(layout: Tuple[str, ...]) -> str:
+    if 'time' in layout:
+        return f' PARTITION BY RANGE ("{TIME_COLUMN}")'
+    if 'user' in layout:
+        return f' PARTITION BY HASH ("{USER_COLUMN}")'
+    return ''
+
+
+def period(ts: datetime, interval: str) -> Tuple[datetime, datetime]:
+    """[start, end) in UTC of the day, ISO week or month containing ts"""
+    if interval not in INTERVALS:
+        raise ValueError(f"Unknown partition interval '{interval}', expected one of: {', '.join(INTERVALS)}")
+    day = ts.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == 'day':
+        return day, day + timedelta(days=1)
+    if interval == 'week':
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=7)
+    start = day.replace(day=1)
+    return start, (start + timedelta(days=32)).replace(day=1)
+
+
+def child_name(table_name: str, suffix: str) -> str:
+    return f'{table_name[:MAX_IDENTIFIER - len(suffix)]}{suffix}'
+
+
+def generate_hash_partitions(table_name: str, modulus: int) -> List[str]:
+    """CREATE TABLE DDL for the modulus hash partitions of a table partitioned by user"""
+    return [
+        f'CREATE TABLE IF NOT EXISTS "{child_name(table_name, f"_h{r}")}" PARTITION OF "{table_name}" '
+        f'FOR VALUES WITH (MODULUS {modulus}, REMAINDER {r});'
+        for r in range(modulus)
+    ]
+
+
+def generate_partitions(table_name: str, layout: Tuple[str, ...], modulus: int) -> List[str]:
+    """
+    DDL run right after a new partitioned table's CREATE TABLE: an index on the user column,
+    which every partition inherits since a hash partition still holds many users, and the
+    hash partitions themselves (time partitions come later, see generate_time_partition)
+    """
+    ddl = []
+    if 'user' in layout:
+        ddl.append(f'CREATE INDEX IF NOT EXISTS "{child_name(table_name, f"_{USER_COLUMN}_idx")}" '
+                   f'ON "{table_name}" ("{USER_COLUMN}");')
+    if layout == ('user',):
+        ddl.extend(generate_hash_partitions(table_name, modulus))
+    return ddl
+
+
+def generate_time_partition(table_name: str, layout: Tuple[str, ...], start: datetime, end: datetime,
+                            modulus: int) -> List[str]:
+    """
+    CREATE TABLE DDL for the [start, end) partition of a table partitioned by time,
+    itself hash-partitioned by user when the layout has both
+    """
+    name = child_name(table_name, f'_{start:%Y%m%d}')
+    sub = f' PARTITION BY HASH ("{USER_COLUMN}")' if 'user' in layout else ''
+    ddl = [
+        f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table_name}" '
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}'){sub};"
+    ]
+    if sub:
+        ddl.extend(generate_hash_partitions(name, modulus))
+    return ddl
@@ -1,4 +1,5 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
+from app.services.json_service.table_generator.partitions import PARTITION_COLUMNS, COLUMN_DDL, partition_clause
 
 TYPE_MAP = {
     'integer': 'BIGINT',
@@ -13,16 +14,58 @@ TYPE_MAP = {
     'null': 'TEXT',
 }
 
+# information_schema data_type -> inferred type, for reading generated tables back
+CATALOG_TYPES = {
+    'bigint': 'integer',
+    'integer': 'integer',
+    'smallint': 'integer',
+    'double precision': 'number',
+    'real': 'number',
+    'numeric': 'number',
+    'boolean': 'boolean',
+    'text': 'string',
+    'character varying': 'string',
+    'timestamp with time zone': 'datetime',
+    'timestamp without time zone': 'datetime',
+    'date': 'date',
+    'uuid': 'uuid',
+    'jsonb': 'object',
+    'json': 'object',
+}
+
 def map_type(t: str) -> str:
     """Map inferred type to PostgreSQL type"""
     return TYPE_MAP.get(t, 'JSONB')
 
-def generate_create_table(entity_name: str, schema: Dict[str, Any], relationships: list = None) -> str:
+def surrogate_key(schema: Dict[str, Any]) -> str:
+    """
+    Name of the generated UUID primary key column
+    Falls back to "_row_id" when the data already has its own "id" field
+    """
+    return '_row_id' if 'id' in schema.get('properties', {}) else 'id'
+
+def generate_create_table(entity_name: str, schema: Dict[str, Any], relationships: list = None, parent: tuple = None,
+                          partition_by: Tuple[str, ...] = ()) -> str:
     """
     Generate CREATE TABLE DDL for PostgreSQL
+    parent: optional (parent_table, parent_key) adding a "{parent_table}_id" foreign key column
+    partition_by: 'user' and/or 'time' creates a partitioned parent with the injected
+    partition columns (see partitions.py); the primary key then includes them, and the
+    parent column carries no REFERENCES since a partitioned parent's id alone is not unique
     """
+    pk = surrogate_key(schema)
     cols = []
-    cols.append('id UUID PRIMARY KEY DEFAULT gen_random_uuid()')
+    if partition_by:
+        cols.append(f'"{pk}" UUID NOT NULL DEFAULT gen_random_uuid()')
+    else:
+        cols.append(f'"{pk}" UUID PRIMARY KEY DEFAULT gen_random_uuid()')
+    
+    if parent:
+        parent_table, parent_key = parent
+        if partition_by:
+            cols.append(f'"{parent_table}_id" UUID NOT NULL')
+        else:
+            cols.append(f'"{parent_table}_id" UUID NOT NULL REFERENCES "{parent_table}" ("{parent_key}") ON DELETE CASCADE')
     
     props = schema.get('properties', {})
     required = set(schema.get('required', []))
@@ -45,7 +88,25 @@ def generate_create_table(entity_name: str, schema: Dict[str, Any], relationship
             if parent == entity_name and rtype == 'one-to-one':
                 cols.append(f'"{child}_id" UUID')
     
+    if partition_by:
+        cols.extend(COLUMN_DDL[kind] for kind in partition_by)
+        key_sql = ', '.join(f'"{c}"' for c in [pk] + [PARTITION_COLUMNS[kind] for kind in partition_by])
+        cols.append(f'PRIMARY KEY ({key_sql})')
+    
     cols_sql = ',\n    '.join(cols)
-    ddl = f'CREATE TABLE IF NOT EXISTS "{entity_name}" (\n    {cols_sql}\n);'
+    ddl = f'CREATE TABLE IF NOT EXISTS "{entity_name}" (\n    {cols_sql}\n){partition_clause(partition_by)};'
     
-    return ddl
\ No newline at end of file
+    return ddl
+
+def generate_foreign_key_index(table_name: str, column: str) -> str:
+    """
+    Generate CREATE INDEX DDL for a foreign key column (Postgres does not index them implicitly)
+    """
+    return f'CREATE INDEX IF NOT EXISTS "{table_name}_{column}_idx" ON "{table_name}" ("{column}");'
+
+def generate_unique_key_index(table_name: str, columns: List[str]) -> str:
+    """
+    Generate CREATE UNIQUE INDEX DDL for a natural key, the conflict target of merge loads
+    """
+    cols_sql = ', '.join(f'"{c}"' for c in columns)
+    return f'CREATE UNIQUE INDEX IF NOT EXISTS "{table_name}_{"_".join(columns)}_key" ON "{table_name}" ({cols_sql});'
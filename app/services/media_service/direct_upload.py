@@ -0,0 +1,252 @@
+"""
+Direct-to-storage uploads: clients PUT files straight to MinIO through presigned URLs
+
+initiate_upload plans the object under the usual users/{user_id}/{folder}/ layout and
+records it in direct_uploads. Large files get a multipart upload with one presigned URL
+per part. Once the bytes are in MinIO, claim_upload (from the complete call or a bucket
+notification) takes the upload exactly once, and process_upload runs the steps a proxied
+upload would get on the stored object: classification, ingestion of JSON and record
+files, ZIP extraction, and the catalog entry with its download URL.
+"""
+import itertools
+import math
+import os
+import tempfile
+import threading
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+from app.db import clients
+from app.db.postgres.client import PostgresClient
+from app.services.media_service.processor import MediaProcessor
+from app.services.search_service import text_index
+from app.utils.detectors.type_detector import TypeDetector, RECORD_FORMATS, SNIFF_BYTES
+from app.utils.metrics import registry as metrics
+from app.utils.responses.fast_json import dumps
+
+UPLOAD_COLUMNS = ['upload_id', 'user_id', 'object_key', 'filename', 'folder', 'content_type', 'size',
+                  'multipart_id', 'ingest_mode', 'merge_key', 'status', 'result',
+                  'created_at', 'completed_at', 'processed_at']
+PART_SIZE = int(os.getenv('DIRECT_UPLOAD_PART_SIZE', str(64 * 1024 * 1024)))
+URL_EXPIRES = int(os.getenv('DIRECT_UPLOAD_URL_EXPIRES', '3600'))
+# ZIP archives larger than this are spooled to disk while they are extracted
+SPOOL_BYTES = int(os.getenv('DIRECT_UPLOAD_SPOOL_BYTES', str(64 * 1024 * 1024)))
+# S3 limits: parts of at least 5 MiB (except the last), at most 10000 of them, 5 TiB per object
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+MAX_OBJECT_BYTES = 5 * 1024 ** 4
+
+detector = TypeDetector()
+_worker_ids = itertools.count()
+_local = threading.local()
+
+
+def part_size_for(size: int) -> int:
+    """PART_SIZE, grown when the file would need more than MAX_PARTS parts"""
+    return max(PART_SIZE, MIN_PART_SIZE, math.ceil(size / MAX_PARTS))
+
+
+def _row(row) -> Optional[Dict[str, Any]]:
+    return dict(zip(UPLOAD_COLUMNS, row)) if row is not None else None
+
+
+def initiate_upload(pg: PostgresClient, media: MediaProcessor, user_id: str, filename: str, size: int,
+                    content_type: str = None, ingest_mode: str = None, merge_key: str = None) -> Dict[str, Any]:
+    """
+    Plan the object and presign its upload
+    Returns the upload id and key with either one PUT url, or a multipart part_size and
+    one url per part (the client sends each part's ETag back in the complete call)
+    """
+    if size > MAX_OBJECT_BYTES:
+        raise ValueError(f"Files are limited to {MAX_OBJECT_BYTES} bytes")
+    entry = media.plan_object(user_id, filename, size, content_type)
+    minio, key = media.minio, entry['key']
+    upload = {
+        'upload_id': str(uuid.uuid4()),
+        'bucket': media.bucket,
+        'key': key,
+        'folder': entry['folder'],
+        'content_type': entry['mime'],
+        'size': size,
+        'expires_in': URL_EXPIRES,
+    }
+
+    part_size = part_size_for(size)
+    multipart_id = None
+    if size > part_size:
+        multipart_id = minio.create_multipart_upload(media.bucket, key, entry['mime'])
+        upload['method'] = 'multipart'
+        upload['part_size'] = part_size
+        upload['parts'] = [
+            {'part_number': n, 'url': minio.presigned_upload_part(media.bucket, key, multipart_id, n, expiry=URL_EXPIRES)}
+            for n in range(1, math.ceil(size / part_size) + 1)
+        ]
+    else:
+        upload['method'] = 'PUT'
+        upload['url'] = minio.presigned_put(media.bucket, key, expiry=URL_EXPIRES)
+        upload['headers'] = {'Content-Type': entry['mime']}
+
+    pg.execute(
+        "INSERT INTO direct_uploads (upload_id, user_id, object_key, filename, folder, content_type, size, "
+        "multipart_id, ingest_mode, merge_key) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+        (upload['upload_id'], user_id, key, filename, entry['folder'], entry['mime'], size,
+         multipart_id, ingest_mode, merge_key)
+    )
+    metrics.inc('direct_uploads_total', stage='initiated')
+    return upload
+
+
+def get_upload(pg: PostgresClient, upload_id: str) -> Optional[Dict[str, Any]]:
+    return _row(pg.fetch_one(
+        f"SELECT {', '.join(UPLOAD_COLUMNS)} FROM direct_uploads WHERE upload_id = %s", (upload_id,)
+    ))
+
+
+def find_upload_by_key(pg: PostgresClient, object_key: str) -> Optional[Dict[str, Any]]:
+    return _row(pg.fetch_one(
+        f"SELECT {', '.join(UPLOAD_COLUMNS)} FROM direct_uploads WHERE object_key = %s", (object_key,)
+    ))
+
+
+def claim_upload(pg: PostgresClient, media: MediaProcessor, upload: Dict[str, Any],
+                 parts: List[Tuple[int, str]] = None) -> Tuple[Dict[str, Any], bool]:
+    """
+    Finish the client's upload and take it for processing
+    Only one caller wins the claim, so a complete call racing a bucket notification (or a
+    retried complete) processes the file once; the others get the current row back.
+    Multipart uploads are assembled here from the client's (part_number, etag) list.
+    Returns: (upload row, claimed); raises ValueError and releases the claim when the
+    object is missing or the parts do not assemble
+    """
+    row = _row(pg.fetch_one(
+        "UPDATE direct_uploads SET status = 'processing', completed_at = now() "
+        f"WHERE upload_id = %s AND status = 'initiated' RETURNING {', '.join(UPLOAD_COLUMNS)}",
+        (upload['upload_id'],)
+    ))
+    if row is None:
+        return get_upload(pg, upload['upload_id']), False
+
+    try:
+        if row['multipart_id']:
+            if not parts:
+                raise ValueError("Multipart uploads are completed with the ETag of every part")
+            try:
+                media.minio.complete_multipart_upload(media.bucket, row['object_key'], row['multipart_id'], parts)
+            except Exception as e:
+                raise ValueError(f"Could not assemble the uploaded parts: {e}")
+        stat = media.minio.stat(media.bucket, row['object_key'])
+        if stat is None:
+            raise ValueError("The file has not been uploaded yet")
+    except ValueError:
+        pg.execute(
+            "UPDATE direct_uploads SET status = 'initiated', completed_at = NULL WHERE upload_id = %s",
+            (row['upload_id'],)
+        )
+        raise
+
+    if stat.size != row['size']:
+        # The declared size only chose the upload method; the stored object is what gets processed
+        row['size'] = stat.size
+        pg.execute("UPDATE direct_uploads SET size = %s WHERE upload_id = %s", (stat.size, row['upload_id']))
+    metrics.inc('direct_uploads_total', stage='completed')
+    metrics.observe('direct_upload_bytes', stat.size)
+    return row, True
+
+
+def _read(media: MediaProcessor, upload: Dict[str, Any], offset: int = 0, length: int = 0) -> bytes:
+    data = media.minio.read(media.bucket, upload['object_key'], offset=offset, length=length)
+    metrics.inc('direct_upload_read_bytes', len(data))
+    return data
+
+
+def _process(media: MediaProcessor, upload: Dict[str, Any]) -> Dict[str, Any]:
+    user_id, filename, size = upload['user_id'], upload['filename'], upload['size']
+    # Classification only needs the first bytes; most media objects are never read further
+    with metrics.span('direct_upload', 'classify'):
+        head = _read(media, upload, length=min(size, SNIFF_BYTES)) if size else b''
+        mime_type, folder, ext = media._detect_type_and_folder(head, filename)
+
+    if ext == "zip" or mime_type == "application/zip":
+        with metrics.span('direct_upload', 'zip_extract'), \
+                tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES) as archive_file:
+            media.minio.read_into(media.bucket, upload['object_key'], archive_file)
+            metrics.inc('direct_upload_read_bytes', size)
+            archive_file.seek(0)
+            archive = media._process_zip_archive(user_id, archive_file)
+        return {'type': 'media', 'result': media._archive_response(filename, archive)}
+
+    if media.json_processor is not None and detector.may_be_structured(filename):
+        file_bytes = head if len(head) == size else _read(media, upload)
+        detected_type = detector.detect(filename, file_bytes)
+        if detected_type == 'json':
+            return {'type': 'json', 'result': media.json_processor.process(file_bytes, user_id=user_id)}
+        if detected_type in RECORD_FORMATS:
+            return {'type': detected_type, 'result': media.json_processor.process_records(filename, file_bytes, detected_type, user_id=user_id)}
+
+    # Kept as uploaded: the catalog entry is the sniffed type and a download URL
+    entry = {
+        'key': upload['object_key'],
+        'url': media.minio.presigned_get(media.bucket, upload['object_key'], expiry=media.default_url_expires),
+        'mime': mime_type,
+        'folder': upload['folder'],
+        'size': size,
+        'original_filename': filename
+    }
+    if text_index.accepts(entry):
+        text_index.submit(user_id, entry, head if len(head) == size else _read(media, upload, length=min(size, text_index.MAX_TEXT_BYTES)))
+    return {'type': 'media', 'result': media._file_response(entry)}
+
+
+def process_upload(pg: PostgresClient, media: MediaProcessor, upload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Process a claimed upload and record the outcome in its row (status completed or failed)
+    media is bound to the JSON processor and load mode the upload was initiated with
+    Returns: the upload response, shaped like POST /v1/upload's
+    """
+    try:
+        with metrics.span('direct_upload', 'process'):
+            result = _process(media, upload)
+    except Exception as e:
+        print(f"Direct upload {upload['upload_id']} failed: {e}")
+        metrics.inc('ingest_errors_total', stage='direct_upload')
+        result = {'type': None, 'result': {'status': 'error', 'message': f'Processing failed: {e}', 'error': type(e).__name__}}
+
+    status = 'failed' if result['result'].get('status') == 'error' else 'processed'
+    metrics.inc('direct_uploads_total', stage=status)
+    pg.execute(
+        "UPDATE direct_uploads SET status = %s, result = %s::jsonb, processed_at = now() WHERE upload_id = %s",
+        (status, dumps(result).decode('utf-8'), upload['upload_id'])
+    )
+    return result
+
+
+def worker_pg() -> PostgresClient:
+    """
+    This thread's own connection for background processing
+    COPY and merge loads switch autocommit and commit or roll back on their connection, so
+    they must not share one with the request handlers; one per threadpool thread
+    """
+    if not hasattr(_local, 'name'):
+        _local.name = f'direct-upload-{next(_worker_ids)}'
+    return clients.get_postgres(_local.name)
+
+
+def process_upload_in_worker(media: MediaProcessor, upload: Dict[str, Any]) -> Dict[str, Any]:
+    """process_upload from a background thread, with ingestion and the status update on worker_pg()"""
+    pg = worker_pg()
+    if media.json_processor is not None:
+        media = media.with_json_processor(media.json_processor.with_clients(pg=pg, mongo=media.json_processor._mongo))
+    return process_upload(pg, media, upload)
+
+
+def abort_upload(pg: PostgresClient, media: MediaProcessor, upload: Dict[str, Any]) -> bool:
+    """Cancel an upload that was never completed, discarding any uploaded parts"""
+    row = pg.fetch_one(
+        "DELETE FROM direct_uploads WHERE upload_id = %s AND status = 'initiated' RETURNING multipart_id",
+        (upload['upload_id'],)
+    )
+    if row is None:
+        return False
+    if row[0]:
+        media.minio.abort_multipart_upload(media.bucket, upload['object_key'], row[0])
+    metrics.inc('direct_uploads_total', stage='aborted')
+    return True
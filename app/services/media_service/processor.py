@@ -1,10 +1,19 @@
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, Optional
+from fastapi.concurrency import run_in_threadpool
+from app.db import clients
 from app.db.minio.client import MinioClient
+from app.utils.detectors.type_detector import TypeDetector, RECORD_FORMATS
+from app.services.json_service.processor import JsonProcessor
+from app.services.search_service import text_index
+from app.services.spool import journal
+from app.utils.metrics import registry as metrics
 import os
 import io
+import copy
+import mimetypes
 import uuid
+import asyncio
 import zipfile
-import tempfile
 import string
 
 try:
@@ -20,12 +29,25 @@ class MediaProcessor:
     VIDEO_EXTS = {"mp4", "mov", "m4v", "webm", "mkv", "avi", "mpg", "mpeg", "flv", "3gp", "wmv"}
     ARCHIVE_EXTS = {"zip", "tar", "gz", "tgz", "7z", "rar"}
     
-    def __init__(self):
-        self.minio = MinioClient()
+    def __init__(self, json_processor: Optional[JsonProcessor] = None, minio: MinioClient = None):
+        self._minio = minio
+        # JSON entries found inside archives are routed here instead of MinIO when set
+        self.json_processor = json_processor
+        self.detector = TypeDetector()
         self.bucket = os.getenv('MINIO_BUCKET', 'user-uploads')
         self.default_url_expires = int(os.getenv('DEFAULT_URL_EXPIRES', '3600'))
         self._ensure_bucket()
     
+    @property
+    def minio(self) -> MinioClient:
+        return self._minio or clients.get_minio()
+    
+    def with_json_processor(self, json_processor: JsonProcessor) -> 'MediaProcessor':
+        """A shallow copy routing archive JSON and record entries to the given processor"""
+        bound = copy.copy(self)
+        bound.json_processor = json_processor
+        return bound
+    
     def _ensure_bucket(self):
         """Ensure the bucket exists"""
         try:
@@ -44,6 +66,25 @@ class MediaProcessor:
         """Extract file extension"""
         return os.path.splitext(filename or "")[1].lower().lstrip(".")
     
+    @staticmethod
+    def _folder_for_mime(mime: Optional[str]) -> Optional[str]:
+        """Folder category of a MIME type, None when only the extension can tell"""
+        if not mime:
+            return None
+        if mime.startswith("image/"):
+            return "images"
+        if mime.startswith("audio/"):
+            return "audio"
+        if mime.startswith("video/"):
+            return "video"
+        if mime == "application/pdf":
+            return "documents"
+        if mime.startswith("text/") or mime in ("application/json", "application/xml"):
+            return "documents"
+        if "officedocument" in mime or "word" in mime:
+            return "documents"
+        return None
+    
     def _detect_type_and_folder(self, file_bytes: bytes, filename: str) -> tuple:
         """
         Detect MIME type and determine folder category
@@ -52,7 +93,7 @@ class MediaProcessor:
         mime = None
         
         # Try python-magic for accurate detection
-        if magic:
+        if magic and file_bytes:
             try:
                 mime = magic.from_buffer(file_bytes, mime=True)
             except Exception:
@@ -61,19 +102,9 @@ class MediaProcessor:
         ext = self._get_extension(filename or "")
         
         # MIME-based detection (most accurate)
-        if mime:
-            if mime.startswith("image/"):
-                return mime, "images", ext
-            if mime.startswith("audio/"):
-                return mime, "audio", ext
-            if mime.startswith("video/"):
-                return mime, "video", ext
-            if mime == "application/pdf":
-                return mime, "documents", ext
-            if mime.startswith("text/") or mime in ("application/json", "application/xml"):
-                return mime, "documents", ext
-            if "officedocument" in (mime or "") or "word" in (mime or ""):
-                return mime, "documents", ext
+        folder = self._folder_for_mime(mime)
+        if folder:
+            return mime, folder, ext
         
         # Extension-based fallback
         if ext in self.IMAGE_EXTS:
@@ -109,56 +140,159 @@ class MediaProcessor:
         
         return (mime or "application/octet-stream"), "others", ext
     
-    def _upload_single_file(self, user_id: str, filename: str, file_bytes: bytes) -> Dict[str, Any]:
-        """Upload a single file to MinIO in organized folder structure"""
-        mime_type, folder, ext = self._detect_type_and_folder(file_bytes, filename)
+    def _object_entry(self, user_id: str, filename: str, file_bytes: bytes) -> Dict[str, Any]:
+        """Detect the type and pick the object key: users/{user_id}/{category}/{uuid}_{filename}"""
+        with metrics.span('media', 'detect_type'):
+            mime_type, folder, ext = self._detect_type_and_folder(file_bytes, filename)
         
         # Generate unique ID and sanitize filename
         uid = str(uuid.uuid4())
         safe_name = self._sanitize_filename(filename)
         
-        # Construct object key: users/{user_id}/{category}/{uuid}_{filename}
-        object_key = f"users/{user_id}/{folder}/{uid}_{safe_name}"
-        
-        # Upload to MinIO
-        self.minio.put_object(self.bucket, object_key, file_bytes, mime_type)
-        
-        # Generate presigned URL
-        url = self.minio.presigned_get(self.bucket, object_key, expiry=self.default_url_expires)
-        
         return {
-            'key': object_key,
-            'url': url,
+            'key': f"users/{user_id}/{folder}/{uid}_{safe_name}",
+            'url': None,
             'mime': mime_type,
             'folder': folder,
             'size': len(file_bytes),
             'original_filename': filename
         }
     
-    def _process_zip_archive(self, user_id: str, file_bytes: bytes) -> List[Dict[str, Any]]:
-        """Extract and upload all files from a ZIP archive"""
+    def plan_object(self, user_id: str, filename: str, size: int, content_type: Optional[str] = None) -> Dict[str, Any]:
+        """
+        _object_entry for a file the client will upload itself, before any byte is seen
+        The folder comes from the declared (or extension-guessed) content type, else from the extension
+        """
+        content_type = content_type or mimetypes.guess_type(filename)[0]
+        folder = self._folder_for_mime(content_type)
+        if folder is None:
+            # No content yet: detection falls back to the extension
+            mime, folder, _ = self._detect_type_and_folder(b'', filename)
+            content_type = content_type or mime
+        return {
+            'key': f"users/{user_id}/{folder}/{uuid.uuid4()}_{self._sanitize_filename(filename)}",
+            'url': None,
+            'mime': content_type,
+            'folder': folder,
+            'size': size,
+            'original_filename': filename
+        }
+    
+    def _upload_single_file(self, user_id: str, filename: str, file_bytes: bytes) -> Dict[str, Any]:
+        """
+        Upload a single file to MinIO in organized folder structure
+        When MinIO cannot be reached the put is spooled and the entry gets 'spooled': True, no URL
+        Text files are then queued for the full-text index (GET /v1/search)
+        """
+        result = self._object_entry(user_id, filename, file_bytes)
+        
+        # Upload to MinIO
+        args = (self.bucket, result['key'], file_bytes, result['mime'])
+        with metrics.span('media', 'put_object'):
+            try:
+                self.minio.put_object(*args)
+            except Exception as e:
+                if not journal.spool('minio_put', [journal.target('minio', f"{self.bucket}/{result['key']}")], args, e):
+                    raise
+                result['spooled'] = True
+        
+        text_index.submit(user_id, result, file_bytes)
+        if result.get('spooled'):
+            return result
+        
+        # Generate presigned URL
+        with metrics.span('media', 'presign'):
+            result['url'] = self.minio.presigned_get(self.bucket, result['key'], expiry=self.default_url_expires)
+        
+        return result
+    
+    async def _store_async(self, result: Dict[str, Any], file_bytes: bytes, user_id: str):
+        """Put an object described by _object_entry with the async client and fill in its URL"""
+        minio = clients.get_async_minio()
+        args = (self.bucket, result['key'], file_bytes, result['mime'])
+        with metrics.span('media', 'put_object'):
+            try:
+                await minio.put_object(*args)
+            except Exception as e:
+                targets = [journal.target('minio', f"{self.bucket}/{result['key']}")]
+                if not await run_in_threadpool(journal.spool, 'minio_put', targets, args, e):
+                    raise
+                result['spooled'] = True
+        if text_index.accepts(result):
+            # submit may block on a full index queue
+            await run_in_threadpool(text_index.submit, user_id, result, file_bytes)
+        if result.get('spooled'):
+            return
+        with metrics.span('media', 'presign'):
+            result['url'] = await minio.presigned_get(self.bucket, result['key'], expiry=self.default_url_expires)
+    
+    def _process_zip_archive(self, user_id: str, file_bytes: bytes, store: Callable = None) -> Dict[str, Any]:
+        """
+        Extract a ZIP archive: JSON entries are ingested into the databases in one
+        merged batch, CSV/TSV/NDJSON entries are loaded into their own tables,
+        every other entry is uploaded to MinIO
+        file_bytes may also be a seekable binary file, so a stored archive need not be read into memory
+        store(entry, bytes), when given, takes over the MinIO uploads (see _process_zip_archive_async)
+        Returns: dict with uploaded files, JSON batch result and per-entry routing
+        """
         uploaded_files = []
+        json_documents = []
+        entries = []
         
-        with tempfile.TemporaryDirectory() as td:
-            zip_path = os.path.join(td, "incoming.zip")
-            
-            # Write zip to temp file
-            with open(zip_path, "wb") as f:
-                f.write(file_bytes)
-            
-            # Extract and process each file
-            with zipfile.ZipFile(zip_path, 'r') as z:
-                for zi in z.infolist():
-                    if zi.is_dir():
+        source = io.BytesIO(file_bytes) if isinstance(file_bytes, (bytes, bytearray)) else file_bytes
+        with zipfile.ZipFile(source, 'r') as z:
+            for zi in z.infolist():
+                if zi.is_dir():
+                    continue
+                
+                # Read entry
+                with z.open(zi) as entry:
+                    entry_bytes = entry.read()
+                
+                # The JSON document decoded by detection is ingested as is, not parsed a second time
+                detected, document = self.detector.detect_parsed(zi.filename, entry_bytes) if self.json_processor is not None else ('media', None)
+                if detected == 'json':
+                    json_documents.append((zi.filename, document))
+                    entries.append({'filename': zi.filename, 'route': 'database'})
+                    continue
+                if detected in RECORD_FORMATS:
+                    try:
+                        records = self.json_processor.process_records(zi.filename, entry_bytes, detected, user_id=user_id)
+                    except ValueError as e:
+                        entries.append({'filename': zi.filename, 'route': 'database', 'format': detected, 'error': str(e)})
                         continue
-                    
-                    # Read entry
-                    with z.open(zi) as entry:
-                        entry_bytes = entry.read()
-                        entry_result = self._upload_single_file(user_id, zi.filename, entry_bytes)
-                        uploaded_files.append(entry_result)
+                    entries.append({
+                        'filename': zi.filename,
+                        'route': 'database',
+                        'format': detected,
+                        'tables': [t['table_name'] for t in records['tables']],
+                        'rows_inserted': records['tables'][0]['rows_inserted']
+                    })
+                    continue
+                
+                if store is None:
+                    entry_result = self._upload_single_file(user_id, zi.filename, entry_bytes)
+                else:
+                    entry_result = self._object_entry(user_id, zi.filename, entry_bytes)
+                    store(entry_result, entry_bytes)
+                uploaded_files.append(entry_result)
+                entries.append({'filename': zi.filename, 'route': 'storage', 'key': entry_result['key']})
+        
+        json_result = None
+        if json_documents:
+            json_result = self.json_processor.process_batch(json_documents, user_id=user_id)
+            routed = iter(json_result.pop('entries'))
+            for entry in entries:
+                if entry['route'] == 'database' and 'format' not in entry:
+                    detail = next(routed)
+                    entry.update({k: v for k, v in detail.items() if k != 'name'})
         
-        return uploaded_files
+        return {
+            'files': uploaded_files,
+            'json_files_count': len(json_documents),
+            'json': json_result,
+            'entries': entries
+        }
     
     def process(self, filename: str, file_bytes: bytes, user_id: str = 'anonymous') -> Dict[str, Any]:
         """
@@ -173,40 +307,114 @@ class MediaProcessor:
         Returns:
             Dict with upload results including URLs and metadata
         """
+        metrics.observe('ingest_payload_bytes', len(file_bytes), type='media')
         try:
-            mime_type, folder, ext = self._detect_type_and_folder(file_bytes, filename)
+            with metrics.span('media', 'detect_type'):
+                mime_type, folder, ext = self._detect_type_and_folder(file_bytes, filename)
             
             # Handle ZIP archives - extract and upload each file
             if ext == "zip" or mime_type == "application/zip":
-                uploaded_files = self._process_zip_archive(user_id, file_bytes)
-                return {
-                    'type': 'archive',
-                    'status': 'extracted_and_uploaded',
-                    'archive_name': filename,
-                    'files_count': len(uploaded_files),
-                    'files': uploaded_files,
-                    'message': f'ZIP archive extracted: {len(uploaded_files)} files uploaded'
-                }
+                with metrics.span('media', 'zip_extract'):
+                    archive = self._process_zip_archive(user_id, file_bytes)
+                return self._archive_response(filename, archive)
             
             # Handle regular files
             result = self._upload_single_file(user_id, filename, file_bytes)
+            return self._file_response(result)
+        
+        except Exception as e:
+            return self._error_response(e)
+    
+    async def process_async(self, filename: str, file_bytes: bytes, user_id: str = 'anonymous') -> Dict[str, Any]:
+        """
+        process() on the async clients (IO_BACKEND=async); same arguments and response
+        A single file is put and presigned on the event loop. A ZIP is extracted in the
+        threadpool, where JSON and record entries are loaded into the databases while the
+        storage entries are already being put to MinIO concurrently on the loop
+        """
+        metrics.observe('ingest_payload_bytes', len(file_bytes), type='media')
+        try:
+            with metrics.span('media', 'detect_type'):
+                mime_type, folder, ext = self._detect_type_and_folder(file_bytes, filename)
+            
+            if ext == "zip" or mime_type == "application/zip":
+                with metrics.span('media', 'zip_extract'):
+                    archive = await self._process_zip_archive_async(user_id, file_bytes)
+                return self._archive_response(filename, archive)
             
+            result = self._object_entry(user_id, filename, file_bytes)
+            await self._store_async(result, file_bytes, user_id)
+            return self._file_response(result)
+        
+        except Exception as e:
+            return self._error_response(e)
+    
+    async def _process_zip_archive_async(self, user_id: str, file_bytes: bytes) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        worker = self
+        if self.json_processor is not None:
+            worker = self.with_json_processor(self.json_processor.on_async_clients())
+        pending = []
+        
+        def store(entry: Dict[str, Any], entry_bytes: bytes):
+            # Called from the extracting thread; the put starts on the loop right away
+            pending.append(asyncio.run_coroutine_threadsafe(self._store_async(entry, entry_bytes, user_id), loop))
+        
+        try:
+            archive = await run_in_threadpool(worker._process_zip_archive, user_id, file_bytes, store)
+        finally:
+            # Also on failure, so no put is left running unobserved
+            stored = await asyncio.gather(*(asyncio.wrap_future(f) for f in pending), return_exceptions=True)
+        errors = [e for e in stored if isinstance(e, BaseException)]
+        if errors:
+            raise errors[0]
+        return archive
+    
+    @staticmethod
+    def _archive_response(filename: str, archive: Dict[str, Any]) -> Dict[str, Any]:
+        uploaded_files = archive['files']
+        metrics.observe('ingest_written', len(uploaded_files), kind='objects')
+        return {
+            'type': 'archive',
+            'status': 'extracted_and_uploaded',
+            'archive_name': filename,
+            'files_count': len(uploaded_files),
+            'files': uploaded_files,
+            'json_files_count': archive['json_files_count'],
+            'json': archive['json'],
+            'entries': archive['entries'],
+            'message': f"ZIP archive extracted: {len(uploaded_files)} files uploaded, {archive['json_files_count']} JSON files ingested"
+        }
+    
+    @staticmethod
+    def _file_response(result: Dict[str, Any]) -> Dict[str, Any]:
+        if result.get('spooled'):
             return {
                 'type': 'file',
-                'status': 'uploaded',
+                'status': 'spooled',
                 'file': result,
-                'message': 'File uploaded successfully'
+                'message': 'Storage is unavailable; the file is spooled and will be uploaded when it is back'
             }
-        
-        except zipfile.BadZipFile:
+        metrics.observe('ingest_written', 1, kind='objects')
+        return {
+            'type': 'file',
+            'status': 'uploaded',
+            'file': result,
+            'message': 'File uploaded successfully'
+        }
+    
+    @staticmethod
+    def _error_response(e: Exception) -> Dict[str, Any]:
+        if isinstance(e, zipfile.BadZipFile):
+            metrics.inc('ingest_errors_total', stage='zip_extract')
             return {
                 'status': 'error',
                 'message': 'Invalid ZIP file',
                 'error': 'BadZipFile'
             }
-        except Exception as e:
-            return {
-                'status': 'error',
-                'message': f'Upload failed: {str(e)}',
-                'error': type(e).__name__
-            }
\ No newline at end of file
+        metrics.inc('ingest_errors_total', stage='media_upload')
+        return {
+            'status': 'error',
+            'message': f'Upload failed: {str(e)}',
+            'error': type(e).__name__
+        }
@@ -0,0 +1,62 @@
+import json
+from typing import Any, Dict, List, Tuple
+
+# Filter operators shared by the table and collection query APIs
+OPERATORS = {
+    'eq': '=',
+    'ne': '<>',
+    'lt': '<',
+    'lte': '<=',
+    'gt': '>',
+    'gte': '>=',
+}
+
+
+def parse_filters(filters: List[str]) -> List[Tuple[str, str, Any]]:
+    """
+    Parse "field:op:value" filter expressions (value may itself contain ':')
+    e.g. ["age:gte:18", "country:eq:IN"] -> [('age', 'gte', '18'), ('country', 'eq', 'IN')]
+    Raises ValueError for malformed expressions or unknown operators
+    """
+    parsed = []
+    for expr in filters or []:
+        parts = expr.split(':', 2)
+        if len(parts) != 3 or not parts[0]:
+            raise ValueError(f"Invalid filter '{expr}', expected field:op:value")
+        field, op, value = parts
+        if op not in OPERATORS:
+            raise ValueError(f"Unknown filter operator '{op}', expected one of {', '.join(OPERATORS)}")
+        parsed.append((field, op, value))
+    return parsed
+
+
+MONGO_OPERATORS = {
+    'eq': '$eq',
+    'ne': '$ne',
+    'lt': '$lt',
+    'lte': '$lte',
+    'gt': '$gt',
+    'gte': '$gte',
+}
+
+
+def coerce_value(value: str) -> Any:
+    """
+    Interpret a filter value as a JSON literal (number, true/false/null, "quoted string")
+    so it matches typed BSON values; anything else stays a plain string
+    """
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def to_mongo_query(filters: List[Tuple[str, str, Any]]) -> Dict[str, Any]:
+    """
+    Translate parsed filters into a MongoDB query document
+    e.g. [('age', 'gte', '18'), ('age', 'lt', '65')] -> {'age': {'$gte': 18, '$lt': 65}}
+    """
+    query = {}
+    for field, op, value in filters:
+        query.setdefault(field, {})[MONGO_OPERATORS[op]] = coerce_value(value)
+    return query
@@ -0,0 +1,218 @@
+"""
+Full-text index of the text files stored in MinIO, searched by GET /v1/search
+
+Stored uploads of text files (txt, md, csv, srt and other text/* types) are handed to
+submit(), which queues them for a pool of SEARCH_INDEX_WORKERS threads. A worker decodes
+the first SEARCH_MAX_TEXT_BYTES and upserts one text_documents row per object key. Words
+are tokenized and stemmed by PostgreSQL (to_tsvector with SEARCH_TEXT_CONFIG); every worker
+thread has its own connection, so documents are tokenized in parallel by separate backends.
+Filename terms weigh more than body terms. The GIN index over (user_id, document) answers a
+user's search in one index scan.
+
+Indexing runs after the upload has returned, so a file becomes searchable a moment later.
+At most SEARCH_INDEX_QUEUE documents wait for a worker; submit() blocks past that, slowing
+uploads down rather than holding unbounded text in memory. A document that fails to index
+is reported and counted without failing its upload; while PostgreSQL is unreachable the
+row is spooled like any other write.
+"""
+import codecs
+import itertools
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from app.db import clients
+from app.db.postgres.client import PostgresClient
+from app.services.spool import journal
+from app.utils.metrics import registry as metrics
+
+# false: nothing is indexed (GET /v1/search still serves what was indexed before)
+ENABLED = os.getenv('SEARCH_INDEX', 'true').lower() == 'true'
+WORKERS = int(os.getenv('SEARCH_INDEX_WORKERS', '4'))
+QUEUE = int(os.getenv('SEARCH_INDEX_QUEUE', '256'))
+MAX_TEXT_BYTES = int(os.getenv('SEARCH_MAX_TEXT_BYTES', str(512 * 1024)))
+# PostgreSQL text search configuration: language of stemming and stop words
+TEXT_CONFIG = os.getenv('SEARCH_TEXT_CONFIG', 'english')
+
+TEXT_EXTS = {'txt', 'md', 'markdown', 'csv', 'srt'}
+SUBTITLE_EXTS = {'srt', 'vtt'}
+# Subtitle cue numbers, timings and the WebVTT header carry no words
+CUE_LINE = re.compile(r'^\s*(\d+|WEBVTT.*|[\d:.,]+\s*-->.*)\s*$')
+# A NUL byte this early means binary content behind a text extension
+BINARY_SNIFF_BYTES = 8192
+# SQLSTATE program_limit_exceeded: the document's tsvector came out over 1 MB
+PROGRAM_LIMIT_EXCEEDED = '54000'
+TARGETS = [journal.target('postgres', 'text_documents')]
+
+UPSERT_SQL = (
+    "INSERT INTO text_documents (object_key, user_id, filename, content_type, size, document) "
+    "VALUES (%s, %s, %s, %s, %s, "
+    "setweight(to_tsvector(%s::regconfig, %s), 'A') || setweight(to_tsvector(%s::regconfig, %s), 'B')) "
+    "ON CONFLICT (object_key) DO UPDATE SET document = EXCLUDED.document, indexed_at = now()"
+)
+RESULT_COLUMNS = ['key', 'filename', 'content_type', 'size', 'indexed_at', 'score']
+SEARCH_SQL = (
+    "SELECT object_key, filename, content_type, size, indexed_at, ts_rank_cd(document, query) AS score "
+    "FROM text_documents, websearch_to_tsquery(%s::regconfig, %s) query "
+    "WHERE user_id = %s AND document @@ query "
+    "ORDER BY score DESC, object_key LIMIT %s OFFSET %s"
+)
+
+_lock = threading.Lock()
+_pool = None
+_slots = None
+_pool_pid = None
+_worker_ids = itertools.count()
+_local = threading.local()
+
+
+def _extension(filename: str) -> str:
+    return os.path.splitext(filename or '')[1].lstrip('.').lower()
+
+
+def is_text(ext: str, mime: Optional[str]) -> bool:
+    return ext in TEXT_EXTS or (mime or '').startswith('text/')
+
+
+def accepts(entry: Dict[str, Any]) -> bool:
+    """Whether submit() would index the object described by an _object_entry"""
+    return ENABLED and is_text(_extension(entry['original_filename']), entry['mime'])
+
+
+def extract_text(data: bytes, ext: str = '', complete: bool = True) -> Optional[str]:
+    """
+    Decode the first MAX_TEXT_BYTES of a file as text; None when the content is binary
+    complete=False: data is itself a prefix of the file
+    """
+    head = data[:MAX_TEXT_BYTES]
+    # A character cut in two by the limit is dropped instead of failing the decode
+    cut = not complete or len(data) > MAX_TEXT_BYTES
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        text = head.decode('utf-16', errors='ignore')
+    elif b'\x00' in head[:BINARY_SNIFF_BYTES]:
+        return None
+    else:
+        try:
+            text = codecs.getincrementaldecoder('utf-8-sig')().decode(head, final=not cut)
+        except UnicodeDecodeError:
+            text = head.decode('cp1252', errors='replace')
+    if ext in SUBTITLE_EXTS:
+        text = '\n'.join(line for line in text.splitlines() if not CUE_LINE.match(line))
+    # PostgreSQL text cannot hold NUL
+    return text.replace('\x00', ' ')
+
+
+def _filename_terms(filename: str) -> str:
+    """'q3_sales-report.md' -> 'q3 sales report md', so each part is its own word"""
+    return re.sub(r'[_\-.]+', ' ', os.path.basename(filename or ''))
+
+
+def write(pg: PostgresClient, object_key: str, user_id: str, filename: str, content_type: str,
+          size: int, text: str):
+    """Upsert one document; a text whose tsvector exceeds PostgreSQL's limit is cut in half until it fits"""
+    while True:
+        try:
+            pg.execute(UPSERT_SQL, (object_key, user_id, filename, content_type, size,
+                                    TEXT_CONFIG, _filename_terms(filename), TEXT_CONFIG, text))
+            return
+        except Exception as e:
+            if getattr(e, 'pgcode', None) != PROGRAM_LIMIT_EXCEEDED or len(text) < 1024:
+                raise
+            text = text[:len(text) // 2]
+
+
+def _connection_name() -> str:
+    """Each worker thread writes over its own connection"""
+    if not hasattr(_local, 'name'):
+        _local.name = f'search-{next(_worker_ids)}'
+    return _local.name
+
+
+def index(user_id: str, object_key: str, filename: str, content_type: str, size: int, data: bytes) -> str:
+    """Index one stored object (runs on a worker); returns the outcome counted in search_documents_total"""
+    start = time.perf_counter()
+    text = extract_text(data, _extension(filename), complete=len(data) >= size)
+    if text is None:
+        outcome = 'skipped'
+    else:
+        args = (object_key, user_id, filename, content_type, size, text)
+        if journal.spool('text_index', TARGETS, args):
+            outcome = 'spooled'
+        else:
+            name = _connection_name()
+            try:
+                write(clients.get_postgres(name), *args)
+                outcome = 'indexed'
+            except Exception as e:
+                if journal.is_unavailable(e):
+                    clients.discard('postgres', name)
+                if journal.spool('text_index', TARGETS, args, e):
+                    outcome = 'spooled'
+                else:
+                    print(f"Text index error for {object_key}: {e}")
+                    metrics.inc('ingest_errors_total', stage='text_index')
+                    outcome = 'failed'
+    metrics.inc('search_documents_total', outcome=outcome)
+    metrics.observe('search_index_seconds', time.perf_counter() - start)
+    return outcome
+
+
+def _executor():
+    global _pool, _slots, _pool_pid
+    # A pool inherited through fork has no threads; the child builds its own
+    if _pool is None or _pool_pid != os.getpid():
+        with _lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='text-index')
+                _slots = threading.BoundedSemaphore(QUEUE)
+                _pool_pid = os.getpid()
+    return _pool, _slots
+
+
+def submit(user_id: str, entry: Dict[str, Any], data: bytes) -> bool:
+    """
+    Queue a stored object (an _object_entry) for indexing when it is a text file
+    Blocks while SEARCH_INDEX_QUEUE documents are waiting; returns whether it was queued
+    """
+    if not accepts(entry):
+        return False
+    pool, slots = _executor()
+    slots.acquire()
+    try:
+        # Only the indexed prefix is kept, not the whole upload
+        future = pool.submit(index, user_id, entry['key'], entry['original_filename'], entry['mime'],
+                             entry['size'], bytes(data[:MAX_TEXT_BYTES]))
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return True
+
+
+def drain():
+    """Wait until every queued document is indexed"""
+    if _pool is None or _pool_pid != os.getpid():
+        return
+    for _ in range(QUEUE):
+        _slots.acquire()
+    for _ in range(QUEUE):
+        _slots.release()
+
+
+def shutdown():
+    """Index what is queued and stop the workers (app shutdown)"""
+    global _pool
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.shutdown(wait=True)
+    _pool = None
+
+
+def search(pg: PostgresClient, user_id: str, query: str, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+    """
+    A user's documents matching query (websearch syntax: words, "phrases", or, -word), best first
+    Returns: dicts of RESULT_COLUMNS; score is ts_rank_cd, higher is better
+    """
+    _, rows = pg.fetch_prepared(SEARCH_SQL, (TEXT_CONFIG, query, user_id, limit, offset))
+    return [dict(zip(RESULT_COLUMNS, row)) for row in rows]
@@ -0,0 +1,163 @@
+"""
+Replays spooled writes (app.services.spool.journal) once their backend answers again
+
+Every worker runs drainer_loop as a background task (started from the app lifespan) and goes
+through its lane in order. When a replay fails because the backend is still unreachable, that
+backend is retried after SPOOL_RETRY_BASE_SECONDS, doubling up to SPOOL_RETRY_MAX_SECONDS
+(with jitter), and every later record of the failed record's targets waits behind it while
+other targets go ahead. A record failing for any other reason (e.g. a row the table rejects)
+would never succeed: it is copied to dead.seg and skipped. Lanes left by workers that no
+longer run are adopted and drained too.
+
+Replay is at least once: a write cut off mid-way may be partly stored already, and an ack
+not yet flushed when the process dies is replayed again. Documents keep the _id they were
+given, so a repeated MongoDB insert skips them, and merge-mode upserts are idempotent.
+"""
+import asyncio
+import os
+import random
+import time
+from typing import Dict, List
+from fastapi.concurrency import run_in_threadpool
+from pymongo.errors import BulkWriteError
+from app.db import clients
+from app.services.spool import journal
+from app.utils.metrics import registry as metrics
+
+POLL_SECONDS = float(os.getenv('SPOOL_POLL_SECONDS', '1'))
+RETRY_BASE_SECONDS = float(os.getenv('SPOOL_RETRY_BASE_SECONDS', '1'))
+RETRY_MAX_SECONDS = float(os.getenv('SPOOL_RETRY_MAX_SECONDS', '60'))
+# How often lanes of other (gone) workers are looked for
+ORPHAN_SCAN_SECONDS = 60
+# MongoDB duplicate key error
+DUPLICATE_KEY = 11000
+
+
+class Backoff:
+    """Exponential backoff with jitter per backend ('postgres', 'mongo', 'minio')"""
+
+    def __init__(self, base: float = RETRY_BASE_SECONDS, cap: float = RETRY_MAX_SECONDS):
+        self.base = base
+        self.cap = cap
+        self._failures: Dict[str, int] = {}
+        self._until: Dict[str, float] = {}
+
+    def ready(self, backend: str, now: float) -> bool:
+        return self._until.get(backend, 0.0) <= now
+
+    def failed(self, backend: str, now: float):
+        failures = self._failures[backend] = self._failures.get(backend, 0) + 1
+        delay = min(self.cap, self.base * 2 ** (failures - 1))
+        self._until[backend] = now + delay * random.uniform(0.5, 1.0)
+
+    def succeeded(self, backend: str):
+        self._failures.pop(backend, None)
+        self._until.pop(backend, None)
+
+
+def backend_of(entry: journal.Entry) -> str:
+    return entry.targets[0].partition(':')[0]
+
+
+def _insert_documents(collection_name: str, documents: List[Dict]):
+    """insert_many that skips documents already stored by an earlier, cut-off attempt"""
+    try:
+        clients.get_mongo().get_collection(collection_name).insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        details = e.details or {}
+        if details.get('writeConcernErrors') or any(
+            err.get('code') != DUPLICATE_KEY for err in details.get('writeErrors', [])
+        ):
+            raise
+
+
+def replay(record: Dict):
+    """Run one spooled write against its backend"""
+    op, args = record['op'], record['args']
+    if op == 'pg_insert':
+        clients.get_postgres('spool').insert_many(*args)
+    elif op == 'pg_copy':
+        clients.get_postgres('spool').copy_tables([args])
+    elif op == 'pg_merge':
+        from app.services.json_service.processor import JsonProcessor
+        JsonProcessor(pg=clients.get_postgres('spool'))._merge_values(*args)
+    elif op == 'mongo_insert':
+        _insert_documents(*args)
+    elif op == 'minio_put':
+        clients.get_minio().put_object(*args)
+    elif op == 'text_index':
+        from app.services.search_service import text_index
+        text_index.write(clients.get_postgres('spool'), *args)
+    else:
+        raise ValueError(f"Unknown spooled operation '{op}'")
+
+
+def drain(spool: journal.Spool, backoff: Backoff) -> int:
+    """One pass over a lane in order; returns the number of records replayed"""
+    replayed = 0
+    blocked = set()
+    now = time.monotonic()
+    try:
+        for entry in spool.entries():
+            backend = backend_of(entry)
+            if blocked.intersection(entry.targets) or not backoff.ready(backend, now):
+                # Nothing queued behind a waiting record may go first
+                blocked.update(entry.targets)
+                continue
+            try:
+                replay(spool.read(entry))
+            except Exception as e:
+                if journal.is_unavailable(e):
+                    now = time.monotonic()
+                    backoff.failed(backend, now)
+                    blocked.update(entry.targets)
+                    metrics.inc('spool_replay_errors_total', op=entry.op, reason='unavailable')
+                    if backend == 'postgres':
+                        clients.discard('postgres', 'spool')
+                    continue
+                print(f"Spooled {entry.op} for {', '.join(entry.targets)} failed, moved to dead.seg: {e}")
+                metrics.inc('spool_replay_errors_total', op=entry.op,
+                            reason='corrupt' if isinstance(e, journal.CorruptRecord) else 'dead')
+                spool.bury(entry)
+                continue
+            spool.ack([entry])
+            backoff.succeeded(backend)
+            metrics.inc('spool_replayed_total', op=entry.op)
+            replayed += 1
+    finally:
+        spool.flush()
+    return replayed
+
+
+def drain_orphans(backoff: Backoff) -> int:
+    """Drain the lanes of workers that are gone, as far as their backends allow"""
+    replayed = 0
+    for spool in journal.orphan_lanes():
+        try:
+            while True:
+                n = drain(spool, backoff)
+                replayed += n
+                if not n:
+                    break
+        finally:
+            spool.close()
+    return replayed
+
+
+async def drainer_loop(poll_seconds: float = POLL_SECONDS):
+    """Background task started from the app lifespan; replays run in the threadpool"""
+    spool = await run_in_threadpool(journal.get)
+    backoff = Backoff()
+    scanned = 0.0
+    while True:
+        replayed = 0
+        try:
+            replayed = await run_in_threadpool(drain, spool, backoff)
+            if time.monotonic() - scanned >= ORPHAN_SCAN_SECONDS:
+                scanned = time.monotonic()
+                replayed += await run_in_threadpool(drain_orphans, backoff)
+        except Exception as e:
+            print(f"Warning: spool drain pass failed: {e}")
+            metrics.inc('ingest_errors_total', stage='spool_drain')
+        if not replayed:
+            await asyncio.sleep(poll_seconds)
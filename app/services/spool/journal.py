@@ -0,0 +1,412 @@
+"""
+Durable local spool for writes whose backend could not be reached
+
+When PostgreSQL, MongoDB or MinIO drops a write mid-upload, the processors append the batch
+here instead of losing it (spool()), and the drainer (app.services.spool.drainer) replays it
+once the backend answers again.
+
+SPOOL_DIR holds one lane per worker process, lane-{n}/, claimed with an exclusive flock so a
+restarted worker picks up what its predecessor left. A lane is a series of append-only
+segment files {first_seq}.seg of framed records:
+
+    length (4 bytes) | crc32 (4 bytes) | seq (8 bytes) | pickled record
+
+plus a {first_seq}.ack file per segment listing the seqs already replayed. Appends are
+group-committed: a writer returns once an fsync covers its record, and writers arriving while
+an fsync runs share the next one. A frame whose checksum does not match ends the segment
+(a torn write at the tail of the last one is truncated). A segment is deleted once all its
+records are acked. Records are only written by this service, so pickle, which keeps
+datetimes and BSON types intact, is safe to read back.
+
+Each record names the targets it writes ('postgres:orders', 'mongo:alice', ...). While a
+target has records in the spool, later writes to it are spooled behind them, so spooled
+rows are never overtaken.
+"""
+import fcntl
+import os
+import pickle
+import struct
+import threading
+import zlib
+from typing import Dict, Iterator, List, Optional
+from app.utils.metrics import registry as metrics
+
+# Empty disables spooling: failed writes are reported as before
+SPOOL_DIR = os.getenv('SPOOL_DIR', 'spool')
+SPOOL_SEGMENT_BYTES = int(os.getenv('SPOOL_SEGMENT_BYTES', str(64 * 1024 * 1024)))
+# 0 = unbounded; a full spool refuses new records
+SPOOL_MAX_BYTES = int(os.getenv('SPOOL_MAX_BYTES', str(4 * 1024 ** 3)))
+
+HEADER = struct.Struct('<IIQ')
+ACK = struct.Struct('<Q')
+# Exception classes (anywhere in the MRO) raised when a backend cannot be reached, besides
+# OSError: psycopg2, pymongo, urllib3 (minio) and asyncpg names, so none has to be imported
+UNAVAILABLE_ERRORS = {
+    'OperationalError', 'InterfaceError',
+    'ConnectionFailure', 'AutoReconnect', 'ServerSelectionTimeoutError', 'NetworkTimeout',
+    'MaxRetryError', 'NewConnectionError', 'ProtocolError',
+    'ConnectionDoesNotExistError', 'CannotConnectNowError', 'TooManyConnectionsError',
+}
+
+
+class SpoolFull(Exception):
+    """Raised by append when the record would take the spool past SPOOL_MAX_BYTES"""
+
+
+class CorruptRecord(ValueError):
+    """Raised by read when a record's checksum does not match"""
+
+
+def is_unavailable(e: BaseException) -> bool:
+    """Whether an exception means the backend was unreachable (worth retrying later)"""
+    return isinstance(e, OSError) or any(cls.__name__ in UNAVAILABLE_ERRORS for cls in type(e).__mro__)
+
+
+def target(backend: str, name: str) -> str:
+    return f'{backend}:{name}'
+
+
+def _checksum(seq: int, payload) -> int:
+    return zlib.crc32(payload, zlib.crc32(ACK.pack(seq)))
+
+
+def _write(fd: int, data):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+class _Segment:
+    __slots__ = ('first_seq', 'path', 'fd', 'ack_fd', 'size', 'pending')
+
+    def __init__(self, path: str, first_seq: int, fd: int):
+        self.first_seq = first_seq
+        self.path = path
+        self.fd = fd
+        self.ack_fd = None
+        self.size = 0
+        self.pending = 0
+
+    @property
+    def ack_path(self) -> str:
+        return self.path[:-len('.seg')] + '.ack'
+
+
+class Entry:
+    """A record not replayed yet; the payload stays on disk until read()"""
+    __slots__ = ('seq', 'segment', 'offset', 'length', 'op', 'targets')
+
+    def __init__(self, seq: int, segment: _Segment, offset: int, length: int, op: str, targets: List[str]):
+        self.seq = seq
+        self.segment = segment
+        self.offset = offset
+        self.length = length
+        self.op = op
+        self.targets = targets
+
+
+class Spool:
+    """One lane: see the module docstring. Raises BlockingIOError when another process holds it"""
+
+    def __init__(self, path: str, segment_bytes: int = None, max_bytes: int = None):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.segment_bytes = SPOOL_SEGMENT_BYTES if segment_bytes is None else segment_bytes
+        self.max_bytes = SPOOL_MAX_BYTES if max_bytes is None else max_bytes
+        os.makedirs(path, exist_ok=True)
+        self._lock_fd = os.open(os.path.join(path, 'lock'), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(self._lock_fd)
+            raise
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._segments: Dict[int, _Segment] = {}
+        self._active: Optional[_Segment] = None
+        # seq -> Entry, in seq order
+        self._entries: Dict[int, Entry] = {}
+        # target -> records waiting for it
+        self._targets: Dict[str, int] = {}
+        self._bytes = 0
+        self._next_seq = 1
+        self._synced_seq = 0
+        self._dirty = set()
+        self._dirty_acks = set()
+        self._recover()
+        self._synced_seq = self._next_seq - 1
+        self._collect()
+        self._observe()
+
+    def append(self, op: str, targets: List[str], args: tuple) -> int:
+        """Write a record and return its seq once it is on disk"""
+        payload = pickle.dumps({'op': op, 'targets': targets, 'args': args}, protocol=pickle.HIGHEST_PROTOCOL)
+        size = HEADER.size + len(payload)
+        with self._lock:
+            if self.max_bytes and self._bytes + size > self.max_bytes:
+                raise SpoolFull(f"Spool {self.path} is full ({self._bytes} of {self.max_bytes} bytes)")
+            segment = self._segment_for(size)
+            seq = self._next_seq
+            offset = segment.size
+            try:
+                _write(segment.fd, HEADER.pack(len(payload), _checksum(seq, payload), seq))
+                _write(segment.fd, payload)
+            except BaseException:
+                # A torn frame would hide every record appended after it
+                os.ftruncate(segment.fd, offset)
+                raise
+            self._next_seq += 1
+            segment.size += size
+            self._bytes += size
+            self._add(Entry(seq, segment, offset, len(payload), op, targets))
+            self._dirty.add(segment)
+        self._sync(seq)
+        metrics.inc('spool_appended_total', op=op)
+        self._observe()
+        return seq
+
+    def pending(self, targets: List[str]) -> bool:
+        """Whether records for any of the targets are waiting"""
+        return any(self._targets.get(t) for t in targets)
+
+    def entries(self) -> List[Entry]:
+        """Records waiting for replay, in order (only those already on disk)"""
+        with self._lock:
+            return [e for e in self._entries.values() if e.seq <= self._synced_seq]
+
+    def read(self, entry: Entry) -> Dict:
+        """The record of an entry: {'op', 'targets', 'args'}"""
+        frame = os.pread(entry.segment.fd, HEADER.size + entry.length, entry.offset)
+        length, checksum, seq = HEADER.unpack_from(frame)
+        payload = memoryview(frame)[HEADER.size:]
+        if seq != entry.seq or length != entry.length or _checksum(seq, payload) != checksum:
+            raise CorruptRecord(f"Spool record {entry.seq} in {entry.segment.path} is corrupt")
+        return pickle.loads(payload)
+
+    def ack(self, entries: List[Entry]):
+        """Mark records replayed; acks are on disk after the next flush()"""
+        with self._lock:
+            for entry in entries:
+                if self._entries.pop(entry.seq, None) is None:
+                    continue
+                segment = entry.segment
+                if segment.ack_fd is None:
+                    segment.ack_fd = os.open(segment.ack_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+                _write(segment.ack_fd, ACK.pack(entry.seq))
+                segment.pending -= 1
+                self._dirty_acks.add(segment)
+                for t in entry.targets:
+                    self._targets[t] -= 1
+                    if not self._targets[t]:
+                        del self._targets[t]
+
+    def bury(self, entry: Entry):
+        """Copy a record that can never be replayed to dead.seg (same framing) and ack it"""
+        frame = os.pread(entry.segment.fd, HEADER.size + entry.length, entry.offset)
+        fd = os.open(os.path.join(self.path, 'dead.seg'), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        try:
+            _write(fd, frame)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        self.ack([entry])
+
+    def flush(self):
+        """fsync the acks written since the last flush and delete segments with nothing left"""
+        with self._lock:
+            dirty = [s.ack_fd for s in self._dirty_acks if s.ack_fd is not None]
+            self._dirty_acks.clear()
+        for fd in dirty:
+            os.fsync(fd)
+        with self._lock:
+            self._collect()
+        self._observe()
+
+    def stats(self) -> Dict[str, int]:
+        return {'records': len(self._entries), 'bytes': self._bytes, 'segments': len(self._segments)}
+
+    def close(self):
+        with self._lock:
+            for segment in self._segments.values():
+                self._close(segment)
+            self._segments.clear()
+            os.close(self._lock_fd)
+
+    def _segment_for(self, size: int) -> _Segment:
+        """The segment to append to, starting a new one past segment_bytes"""
+        active = self._active
+        if active is not None and (not active.size or active.size + size <= self.segment_bytes):
+            return active
+        path = os.path.join(self.path, f'{self._next_seq:020d}.seg')
+        segment = _Segment(path, self._next_seq, os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o600))
+        # Make the new file's directory entry durable too
+        dir_fd = os.open(self.path, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        self._segments[segment.first_seq] = segment
+        self._active = segment
+        return segment
+
+    def _sync(self, seq: int):
+        """Group commit: one fsync covers every record appended before it started"""
+        with self._sync_lock:
+            if self._synced_seq >= seq:
+                return
+            with self._lock:
+                upto = self._next_seq - 1
+                dirty = list(self._dirty)
+                self._dirty.clear()
+            for segment in dirty:
+                os.fsync(segment.fd)
+            self._synced_seq = upto
+        metrics.inc('spool_fsyncs_total')
+
+    def _add(self, entry: Entry):
+        self._entries[entry.seq] = entry
+        entry.segment.pending += 1
+        for t in entry.targets:
+            self._targets[t] = self._targets.get(t, 0) + 1
+
+    def _recover(self):
+        """Index the records of existing segments that were not acked"""
+        names = sorted(n for n in os.listdir(self.path) if n.endswith('.seg') and n[:-4].isdigit())
+        for i, name in enumerate(names):
+            segment = _Segment(os.path.join(self.path, name), int(name[:-4]), None)
+            segment.fd = os.open(segment.path, os.O_RDWR | os.O_APPEND)
+            self._segments[segment.first_seq] = segment
+            acked = set()
+            if os.path.exists(segment.ack_path):
+                with open(segment.ack_path, 'rb') as f:
+                    data = f.read()
+                acked = {ACK.unpack_from(data, o)[0] for o in range(0, len(data) - len(data) % ACK.size, ACK.size)}
+            offset, end = 0, os.fstat(segment.fd).st_size
+            while offset < end:
+                entry = self._read_entry(segment, offset, end)
+                if entry is None:
+                    print(f"Warning: corrupt spool record at {segment.path}:{offset}, "
+                          f"dropping the {end - offset} bytes after it")
+                    metrics.inc('spool_replay_errors_total', op='unknown', reason='corrupt')
+                    if i == len(names) - 1:
+                        os.ftruncate(segment.fd, offset)
+                    break
+                if entry.seq not in acked:
+                    self._add(entry)
+                offset += HEADER.size + entry.length
+                self._next_seq = max(self._next_seq, entry.seq + 1)
+            segment.size = offset
+            self._bytes += offset
+
+    @staticmethod
+    def _read_entry(segment: _Segment, offset: int, end: int) -> Optional[Entry]:
+        """The entry of the frame at offset, None when it is torn or corrupt"""
+        if end - offset < HEADER.size:
+            return None
+        length, checksum, seq = HEADER.unpack(os.pread(segment.fd, HEADER.size, offset))
+        if offset + HEADER.size + length > end:
+            return None
+        payload = os.pread(segment.fd, length, offset + HEADER.size)
+        if _checksum(seq, payload) != checksum:
+            return None
+        record = pickle.loads(payload)
+        return Entry(seq, segment, offset, length, record['op'], record['targets'])
+
+    def _collect(self):
+        """Delete segments whose records are all acked and on disk (call with the lock held)"""
+        for first_seq, segment in list(self._segments.items()):
+            if segment.pending or segment in self._dirty or segment in self._dirty_acks:
+                continue
+            if segment is self._active:
+                self._active = None
+            self._close(segment)
+            for path in (segment.path, segment.ack_path):
+                if os.path.exists(path):
+                    os.unlink(path)
+            self._bytes -= segment.size
+            del self._segments[first_seq]
+
+    @staticmethod
+    def _close(segment: _Segment):
+        for fd in (segment.fd, segment.ack_fd):
+            if fd is not None:
+                os.close(fd)
+        segment.fd = segment.ack_fd = None
+
+    def _observe(self):
+        metrics.set_gauge('spool_depth_records', len(self._entries), lane=self.name)
+        metrics.set_gauge('spool_bytes', self._bytes, lane=self.name)
+
+
+def open_lane(root: str = SPOOL_DIR) -> Spool:
+    """Lock and open the first lane of root that no other process holds"""
+    os.makedirs(root, exist_ok=True)
+    n = 0
+    while True:
+        try:
+            return Spool(os.path.join(root, f'lane-{n}'))
+        except BlockingIOError:
+            n += 1
+
+
+def orphan_lanes(root: str = SPOOL_DIR) -> Iterator[Spool]:
+    """Lanes no process holds that still have segments, opened (so locked) for draining; close each"""
+    if not root or not os.path.isdir(root):
+        return
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+        if not name.startswith('lane-') or not any(n.endswith('.seg') for n in os.listdir(path)):
+            continue
+        try:
+            spool = Spool(path)
+        except BlockingIOError:
+            continue
+        yield spool
+
+
+_lane: Optional[Spool] = None
+_lane_pid = None
+_lane_lock = threading.Lock()
+
+
+def get() -> Optional[Spool]:
+    """This process's lane, opened on first use; None when SPOOL_DIR is empty"""
+    global _lane, _lane_pid
+    if not SPOOL_DIR:
+        return None
+    # A lane inherited through fork belongs to the parent
+    if _lane is None or _lane_pid != os.getpid():
+        with _lane_lock:
+            if _lane is None or _lane_pid != os.getpid():
+                _lane, _lane_pid = open_lane(SPOOL_DIR), os.getpid()
+    return _lane
+
+
+def current() -> Optional[Spool]:
+    """This process's lane if it is open, without opening it"""
+    return _lane if _lane_pid == os.getpid() else None
+
+
+def spool(op: str, targets: List[str], args: tuple, error: Exception = None) -> bool:
+    """
+    Hand a write to the spool for the drainer to replay: with error, when it says the backend
+    was unreachable; without, when earlier writes to one of the targets are still spooled,
+    so this one queues behind them
+    Returns: whether the write was spooled; False leaves it to the caller as before
+    """
+    if error is None:
+        lane = current()
+        if lane is None or not lane.pending(targets):
+            return False
+    elif not is_unavailable(error):
+        return False
+    try:
+        lane = get()
+        if lane is None:
+            return False
+        lane.append(op, targets, args)
+    except Exception as e:
+        print(f"Spool error for {', '.join(targets)}: {e}")
+        metrics.inc('ingest_errors_total', stage='spool_append')
+        return False
+    return True
@@ -1,25 +1,97 @@
+import csv
 import json
 import mimetypes
-from typing import Union
+from typing import Any, Tuple
+
+# Line-oriented record formats, ingested in chunks by JsonProcessor.process_records
+RECORD_FORMATS = ('csv', 'tsv', 'ndjson')
+RECORD_EXTENSIONS = {'.csv': 'csv', '.tsv': 'tsv', '.tab': 'tsv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+SNIFF_BYTES = 64 * 1024
+# parse_json's result for content that is not valid JSON (None is the valid document null)
+INVALID = object()
 
 class TypeDetector:
     def detect(self, filename: str, file_bytes: bytes) -> str:
         """
-        Detect if the file is JSON or non-JSON (media/other)
-        Returns: 'json' or 'media'
+        Detect if the file is JSON, a line-oriented record format or non-JSON (media/other)
+        Returns: 'json', 'csv', 'tsv', 'ndjson' or 'media'
+        """
+        return self.detect_parsed(filename, file_bytes)[0]
+
+    def detect_parsed(self, filename: str, file_bytes: bytes) -> Tuple[str, Any]:
+        """
+        detect(), also handing back the document decoded on the way
+        Returns: (type, document); document is INVALID unless the type is 'json'
         """
         # First check file extension
         mime_type, _ = mimetypes.guess_type(filename)
+        lower = filename.lower()
 
         # If mime type suggests JSON or if filename ends with .json
-        if mime_type == 'application/json' or filename.lower().endswith('.json'):
+        if mime_type == 'application/json' or lower.endswith('.json'):
             # Verify it's actually valid JSON
-            try:
-                json.loads(file_bytes.decode('utf-8'))
-                return 'json'
-            except (json.JSONDecodeError, UnicodeDecodeError):
-                pass
+            document = self.parse_json(file_bytes)
+            if document is not INVALID:
+                return 'json', document
+            # JSON Lines saved with a .json extension
+            if self._looks_like_ndjson(file_bytes):
+                return 'ndjson', INVALID
+
+        fmt = next((f for ext, f in RECORD_EXTENSIONS.items() if lower.endswith(ext)), None)
+        if fmt == 'ndjson' and self._looks_like_ndjson(file_bytes):
+            return 'ndjson', INVALID
+        if fmt in ('csv', 'tsv') and self._looks_like_delimited(file_bytes):
+            return fmt, INVALID
 
         # For now, treat everything else as media
         # Later this can be expanded to detect other types
-        return 'media'
\ No newline at end of file
+        return 'media', INVALID
+
+    def may_be_structured(self, filename: str) -> bool:
+        """Whether detect() can return something other than 'media' for this filename"""
+        mime_type, _ = mimetypes.guess_type(filename)
+        lower = filename.lower()
+        return mime_type == 'application/json' or lower.endswith('.json') or any(lower.endswith(ext) for ext in RECORD_EXTENSIONS)
+
+    def parse_json(self, file_bytes: bytes) -> Any:
+        """Decode JSON content, returning INVALID when it is not valid JSON"""
+        try:
+            return json.loads(file_bytes.decode('utf-8'))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return INVALID
+
+    @staticmethod
+    def _head_lines(file_bytes: bytes, count: int):
+        """First non-empty lines of the first 64 KB (the last, possibly cut, line is dropped)"""
+        head = file_bytes[:SNIFF_BYTES]
+        lines = head.split(b'\n')
+        if len(file_bytes) > SNIFF_BYTES:
+            lines = lines[:-1]
+        return [line for line in lines if line.strip()][:count]
+
+    def _looks_like_ndjson(self, file_bytes: bytes) -> bool:
+        """The first line is a JSON object"""
+        lines = self._head_lines(file_bytes, 1)
+        if not lines:
+            return False
+        try:
+            return isinstance(json.loads(lines[0]), dict)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return False
+
+    def _looks_like_delimited(self, file_bytes: bytes) -> bool:
+        """UTF-8 text whose first lines mostly have as many fields as the header row"""
+        lines = self._head_lines(file_bytes, 20)
+        try:
+            text = [line.decode('utf-8-sig') for line in lines]
+        except UnicodeDecodeError:
+            return False
+        if not text or '\x00' in text[0]:
+            return False
+        try:
+            dialect = csv.Sniffer().sniff('\n'.join(text), delimiters=',;|\t')
+        except csv.Error:
+            dialect = csv.excel
+        widths = [len(row) for row in csv.reader(text, dialect)]
+        # Quoted cells may span lines, so a few mismatches are tolerated
+        return sum(1 for w in widths if w == widths[0]) * 2 > len(widths)
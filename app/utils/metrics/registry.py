@@ -0,0 +1,165 @@
+"""
+Lightweight in-process metrics (counters, histograms, timing spans) rendered in
+Prometheus text format by GET /metrics
+Set METRICS_ENABLED=false to turn every call into a no-op
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Tuple
+
+ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 10 * 1024 ** 2, 100 * 1024 ** 2, 1024 ** 3)
+COUNT_BUCKETS = (1, 10, 100, 1000, 10_000, 100_000, 1_000_000)
+
+HELP = {
+    'ingest_stage_duration_seconds': ('histogram', 'Time spent in each ingestion pipeline stage', LATENCY_BUCKETS),
+    'ingest_payload_bytes': ('histogram', 'Size of uploaded payloads', SIZE_BUCKETS),
+    'upload_response_bytes': ('histogram', 'Size of encoded upload responses', SIZE_BUCKETS),
+    'direct_uploads_total': ('counter', 'Direct-to-storage uploads by stage (initiated, completed, processed, failed, aborted)', None),
+    'direct_upload_bytes': ('histogram', 'Size of objects clients uploaded straight to MinIO', SIZE_BUCKETS),
+    'direct_upload_read_bytes': ('counter', 'Bytes of direct uploads read back by completion processing', None),
+    'ingest_written': ('histogram', 'Rows, documents or objects written per upload', COUNT_BUCKETS),
+    'backend_round_trips_total': ('counter', 'Round trips to PostgreSQL, MongoDB and MinIO', None),
+    'ingest_errors_total': ('counter', 'Errors swallowed by the ingestion pipeline', None),
+    'export_rows_total': ('counter', 'Rows and documents written to Parquet exports', None),
+    'spilled_bytes_total': ('counter', 'Bytes of oversized JSON values moved to MinIO, raw and stored (compressed)', None),
+    'spill_loads_total': ('counter', 'Spilled values loaded back from MinIO by readers', None),
+    'table_partitions_ensured_total': ('counter', 'Time partitions of partitioned SQL tables created (or found) for an upload', None),
+    'scheduler_queue_depth': ('gauge', 'Upload jobs waiting for a worker slot, per tenant', None),
+    'scheduler_running_jobs': ('gauge', 'Upload jobs holding a worker slot, per tenant', None),
+    'scheduler_wait_seconds': ('histogram', 'Time upload jobs waited for a worker slot, per tenant', LATENCY_BUCKETS),
+    'scheduler_rejected_total': ('counter', 'Upload jobs answered 429 by tenant and reason (bytes, queue, wait)', None),
+    'scheduler_admitted_bytes_total': ('counter', 'Bytes of admitted upload jobs, per tenant', None),
+    'spool_depth_records': ('gauge', 'Spooled writes waiting for replay, per spool lane', None),
+    'spool_bytes': ('gauge', 'Size of the spool segment files, per spool lane', None),
+    'spool_appended_total': ('counter', 'Writes spooled because their backend was unreachable (or still had spooled writes)', None),
+    'spool_replayed_total': ('counter', 'Spooled writes replayed to their backend', None),
+    'spool_replay_errors_total': ('counter', 'Failed replays by reason (unavailable = retried with backoff, dead and corrupt = set aside)', None),
+    'spool_fsyncs_total': ('counter', 'Group-commit fsyncs of spool segments; appended / fsyncs is the batching factor', None),
+    'search_documents_total': ('counter', 'Text files handed to the full-text index by outcome (indexed, spooled, skipped = binary, failed)', None),
+    'search_index_seconds': ('histogram', 'Time to extract and index one text file', LATENCY_BUCKETS),
+    'search_query_seconds': ('histogram', 'GET /v1/search latency, query and presigning', LATENCY_BUCKETS),
+    'classifier_nodes_examined': ('histogram', 'JSON nodes looked at by the SQL/NoSQL classifier per document', COUNT_BUCKETS),
+}
+
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, Tuple], float] = {}
+_histograms: Dict[Tuple[str, Tuple], list] = {}
+_gauges: Dict[Tuple[str, Tuple], float] = {}
+
+
+def register(name: str, kind: str, help_text: str, buckets: tuple = None):
+    """Declare a metric's type, help text and (for histograms) bucket bounds"""
+    HELP[name] = (kind, help_text, buckets)
+
+
+def inc(name: str, amount: float = 1, **labels):
+    """Increment a counter"""
+    if not ENABLED:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def set_gauge(name: str, value: float, **labels):
+    """Set a gauge to an absolute value"""
+    if not ENABLED:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _gauges[key] = value
+
+
+def observe(name: str, value: float, **labels):
+    """Record a histogram observation"""
+    if not ENABLED:
+        return
+    buckets = HELP.get(name, (None, None, LATENCY_BUCKETS))[2] or LATENCY_BUCKETS
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            # [per-bucket counts..., +Inf count, sum]
+            hist = _histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+        hist[bisect_left(buckets, value)] += 1
+        hist[-1] += value
+
+
+@contextmanager
+def _timed(pipeline: str, stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe('ingest_stage_duration_seconds', time.perf_counter() - start, pipeline=pipeline, stage=stage)
+
+
+_NULL_SPAN = nullcontext()
+
+
+def span(pipeline: str, stage: str):
+    """Context manager timing one pipeline stage into ingest_stage_duration_seconds"""
+    if not ENABLED:
+        return _NULL_SPAN
+    return _timed(pipeline, stage)
+
+
+def _escape(value) -> str:
+    """Label value escaping of the Prometheus text format: backslash, double quote and newline"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs: Tuple, extra: str = '') -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in pairs]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def render() -> str:
+    """Render all metrics in Prometheus text exposition format"""
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        histograms = {k: list(v) for k, v in _histograms.items()}
+    
+    lines = []
+    seen = set()
+    
+    def header(name, default_kind):
+        if name in seen:
+            return
+        seen.add(name)
+        kind, help_text, _ = HELP.get(name, (default_kind, name, None))
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+    
+    for (name, pairs), value in sorted(counters.items()):
+        header(name, 'counter')
+        lines.append(f'{name}{_labels(pairs)} {value}')
+    
+    for (name, pairs), value in sorted(gauges.items()):
+        header(name, 'gauge')
+        lines.append(f'{name}{_labels(pairs)} {value}')
+    
+    for (name, pairs), hist in sorted(histograms.items()):
+        header(name, 'histogram')
+        buckets = HELP.get(name, (None, None, LATENCY_BUCKETS))[2] or LATENCY_BUCKETS
+        cumulative = 0
+        for bound, count in zip(buckets, hist):
+            cumulative += count
+            le = f'le="{bound}"'
+            lines.append(f'{name}_bucket{_labels(pairs, le)} {cumulative}')
+        cumulative += hist[len(buckets)]
+        inf = 'le="+Inf"'
+        lines.append(f'{name}_bucket{_labels(pairs, inf)} {cumulative}')
+        lines.append(f'{name}_sum{_labels(pairs)} {hist[-1]}')
+        lines.append(f'{name}_count{_labels(pairs)} {cumulative}')
+    
+    return '\n'.join(lines) + '\n'
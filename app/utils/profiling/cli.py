@@ -0,0 +1,78 @@
+"""
+List and render captured upload profiles
+
+Usage:
+    python -m app.utils.profiling.cli list
+    python -m app.utils.profiling.cli show <request_id> [--sort cumulative] [--limit 30]
+"""
+import argparse
+import json
+import os
+import pstats
+import sys
+
+from app.utils.profiling.profiler import PROFILE_DIR
+
+
+def list_profiles(profile_dir: str):
+    if not os.path.isdir(profile_dir):
+        print(f"No profiles in {profile_dir}")
+        return
+    rows = []
+    for request_id in os.listdir(profile_dir):
+        meta_path = os.path.join(profile_dir, request_id, 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                rows.append(json.load(f))
+    rows.sort(key=lambda m: m.get('captured_at', ''), reverse=True)
+    for meta in rows:
+        print(f"{meta['captured_at']}  {meta['request_id']}  {meta['mode']:<8}  {meta['duration_ms']:>10.1f} ms  "
+              f"{meta.get('user_id', '')}  {meta.get('filename', '')}")
+
+
+def show_profile(profile_dir: str, request_id: str, sort: str, limit: int):
+    out_dir = os.path.join(profile_dir, request_id)
+    if not os.path.isdir(out_dir):
+        sys.exit(f"Profile {request_id} not found in {profile_dir}")
+    with open(os.path.join(out_dir, 'meta.json')) as f:
+        print(json.dumps(json.load(f), indent=2))
+    
+    pstats_path = os.path.join(out_dir, 'profile.pstats')
+    if os.path.exists(pstats_path):
+        print(f"\n== cProfile (top {limit} by {sort}) ==")
+        pstats.Stats(pstats_path).strip_dirs().sort_stats(sort).print_stats(limit)
+    
+    alloc_path = os.path.join(out_dir, 'allocations.txt')
+    if os.path.exists(alloc_path):
+        print("== Top allocations ==")
+        with open(alloc_path) as f:
+            print(f.read())
+    
+    stacks_path = os.path.join(out_dir, 'stacks.txt')
+    if os.path.exists(stacks_path):
+        print(f"== Sampled stacks (top {limit}, leaf frame) ==")
+        with open(stacks_path) as f:
+            for line in f.readlines()[:limit]:
+                stack, _, count = line.rstrip('\n').rpartition(' ')
+                print(f"{count:>8}  {stack.rsplit(';', 1)[-1]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dir', default=PROFILE_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list')
+    show = sub.add_parser('show')
+    show.add_argument('request_id')
+    show.add_argument('--sort', default='cumulative')
+    show.add_argument('--limit', type=int, default=30)
+    args = parser.parse_args()
+    
+    if args.command == 'list':
+        list_profiles(args.dir)
+    else:
+        show_profile(args.dir, args.request_id, args.sort, args.limit)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+"""
+On-demand profiling of upload requests
+
+Modes:
+    full     - cProfile + tracemalloc, for requests sent with "X-Profile: 1" (only with
+               PROFILE_ALLOW_HEADER=true) or picked by PROFILE_SAMPLE_RATE; always written
+               to disk. One full capture runs at a time, since cProfile and tracemalloc are
+               process-wide; concurrent ones fall back to sampling (or run unprofiled)
+    sampling - a background thread samples the request thread's stack every
+               PROFILE_SAMPLE_INTERVAL_MS; written only when the request takes longer
+               than PROFILE_SLOW_THRESHOLD_MS
+Blocking work the request hands to the threadpool is profiled through Capture.call.
+Captures go to PROFILE_DIR/<capture id>/ (meta.json, profile.pstats, allocations.txt, stacks.txt)
+and can be listed/rendered with `python -m app.utils.profiling.cli`. The capture id is the
+request id when that is a plain token, else a generated one. Only the newest
+PROFILE_MAX_CAPTURES captures are kept. Profiling never fails the request it profiles.
+"""
+import cProfile
+import json
+import os
+import pstats
+import random
+import re
+import shutil
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+from uuid import uuid4
+
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+SLOW_THRESHOLD_MS = float(os.getenv('PROFILE_SLOW_THRESHOLD_MS', '0'))
+SAMPLE_INTERVAL_MS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', '5'))
+# Clients may only ask for a full profile ("X-Profile: 1") when this is set
+ALLOW_HEADER = os.getenv('PROFILE_ALLOW_HEADER', 'false').lower() == 'true'
+# Older captures are deleted past this many; 0 keeps all
+MAX_CAPTURES = int(os.getenv('PROFILE_MAX_CAPTURES', '100'))
+# Request ids usable as a directory name
+CAPTURE_ID_RE = re.compile(r'^[A-Za-z0-9_-]{1,128}$')
+TOP_ALLOCATIONS = 25
+
+# Held by the one running full capture
+_full_lock = threading.Lock()
+
+
+def is_valid_id(request_id: Optional[str]) -> bool:
+    return bool(request_id) and CAPTURE_ID_RE.match(request_id) is not None
+
+
+class StackSampler:
+    """Samples the Python stacks of a set of threads on a timer and counts collapsed stacks"""
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_ids = {thread_id}
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in list(self.thread_ids):
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}')
+                    frame = frame.f_back
+                if stack:
+                    self.stacks[';'.join(reversed(stack))] += 1
+    
+    def start(self):
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class Capture:
+    """Result handle of a profiled request"""
+    def __init__(self, request_id: str, mode: Optional[str]):
+        self.request_id = request_id
+        self.mode = mode
+        self.duration_ms = 0.0
+        self.saved = False
+        # cProfile only sees the thread that enabled it: one profile per thread, merged on write
+        self._profiles = []
+        self._sampler = None
+    
+    def call(self, fn, *args, **kwargs):
+        """Run fn on the calling thread (e.g. a threadpool worker) as part of this capture"""
+        profile = None
+        thread_id = threading.get_ident()
+        try:
+            if self.mode == 'full' and self._profiles:
+                profile = cProfile.Profile()
+                profile.enable()
+            elif self._sampler is not None:
+                self._sampler.thread_ids.add(thread_id)
+        except Exception as e:
+            print(f"Warning: Could not profile {self.request_id} on a worker thread: {e}")
+            profile = None
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            if profile is not None:
+                profile.disable()
+                self._profiles.append(profile)
+            elif self._sampler is not None:
+                self._sampler.thread_ids.discard(thread_id)
+
+
+def choose_mode(requested: bool) -> Optional[str]:
+    """Pick the profiling mode for a request, or None to run unprofiled"""
+    if (requested and ALLOW_HEADER) or (SAMPLE_RATE and random.random() < SAMPLE_RATE):
+        return 'full'
+    if SLOW_THRESHOLD_MS > 0:
+        return 'sampling'
+    return None
+
+
+def _write(capture: Capture, meta: Dict[str, Any], profiles=(), snapshot=None, sampler=None):
+    out_dir = os.path.join(PROFILE_DIR, capture.request_id)
+    os.makedirs(out_dir, exist_ok=True)
+    
+    if profiles:
+        pstats.Stats(*profiles).dump_stats(os.path.join(out_dir, 'profile.pstats'))
+    if snapshot is not None:
+        with open(os.path.join(out_dir, 'allocations.txt'), 'w') as f:
+            for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]:
+                f.write(f'{stat.size / 1024:10.1f} KiB {stat.count:8d} blocks  {stat.traceback[0]}\n')
+    if sampler is not None:
+        with open(os.path.join(out_dir, 'stacks.txt'), 'w') as f:
+            # Collapsed stack format, usable with flamegraph.pl / speedscope
+            for stack, count in sampler.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+    
+    with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+        json.dump({
+            'request_id': capture.request_id,
+            'mode': capture.mode,
+            'duration_ms': round(capture.duration_ms, 2),
+            'captured_at': datetime.now(timezone.utc).isoformat(),
+            **meta
+        }, f, indent=2)
+    capture.saved = True
+    _prune()
+
+
+def _prune():
+    """Delete the oldest captures beyond MAX_CAPTURES"""
+    if MAX_CAPTURES <= 0:
+        return
+    captures = [e for e in os.scandir(PROFILE_DIR) if e.is_dir(follow_symlinks=False)]
+    if len(captures) <= MAX_CAPTURES:
+        return
+    captures.sort(key=lambda e: e.stat(follow_symlinks=False).st_mtime)
+    for entry in captures[:len(captures) - MAX_CAPTURES]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+@contextmanager
+def capture(request_id: str, requested: bool = False, meta: Optional[Dict[str, Any]] = None):
+    """
+    Profile the enclosed block according to choose_mode
+    Runs on the request's thread; other coroutines interleaved on the same event loop
+    thread show up in the profile too
+    Errors of the profiler itself are reported and swallowed
+    """
+    mode = choose_mode(requested)
+    holds_lock = False
+    if mode == 'full':
+        holds_lock = _full_lock.acquire(blocking=False)
+        if not holds_lock:
+            # Another request is being fully profiled
+            mode = 'sampling' if SLOW_THRESHOLD_MS > 0 else None
+    result = Capture(request_id if is_valid_id(request_id) else uuid4().hex, mode)
+    profile = sampler = None
+    started_tracemalloc = False
+    
+    try:
+        if mode == 'full':
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracemalloc = True
+            profile = cProfile.Profile()
+            profile.enable()
+            result._profiles.append(profile)
+        elif mode == 'sampling':
+            sampler = StackSampler(threading.get_ident(), SAMPLE_INTERVAL_MS / 1000)
+            sampler.start()
+            result._sampler = sampler
+    except Exception as e:
+        print(f"Warning: Could not start profiling {result.request_id}: {e}")
+        profile = sampler = None
+        result._profiles, result._sampler = [], None
+    
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result.duration_ms = (time.perf_counter() - start) * 1000
+        meta = meta or {}
+        try:
+            if profile is not None:
+                profile.disable()
+                snapshot = tracemalloc.take_snapshot()
+                _write(result, meta, profiles=result._profiles, snapshot=snapshot)
+            elif sampler is not None:
+                sampler.stop()
+                if result.duration_ms >= SLOW_THRESHOLD_MS:
+                    _write(result, meta, sampler=sampler)
+        except Exception as e:
+            print(f"Warning: Could not write profile {result.request_id}: {e}")
+        finally:
+            try:
+                if started_tracemalloc:
+                    tracemalloc.stop()
+            finally:
+                if holds_lock:
+                    _full_lock.release()
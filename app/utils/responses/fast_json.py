@@ -0,0 +1,30 @@
+"""
+JSON encoding of API responses without FastAPI's jsonable_encoder pass
+
+Returning a dict from a route makes FastAPI rebuild the whole structure with
+jsonable_encoder before json.dumps encodes it again. FastJSONResponse encodes the
+content once, with orjson when it is installed, else with the standard library.
+Values JSON has no type for (datetime, UUID, ObjectId, ...) are written as strings.
+"""
+import json
+from typing import Any
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """Compact UTF-8 JSON; orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=str, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
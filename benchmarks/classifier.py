@@ -0,0 +1,118 @@
+"""
+Adaptive SQL/NoSQL classifier vs. the full three-score evaluation it replaced
+
+For each document shape, times the previous classifier (depth, array and consistency
+scores each computed over the whole document) and AdaptiveClassifier, prints both
+decisions, the nodes the adaptive one examined and whether it sampled or exited early.
+
+Shapes:
+  flat      {'records': [...]} of identical tabular records (SQL; sampled consistency scan)
+  ragged    records with varying keys (NoSQL once the first inconsistent sample is seen)
+  deep      records nested past depth 3 (NoSQL at the first deep node)
+  config    one large object without arrays of objects (SQL after the array stage)
+
+Usage:
+    python benchmarks/classifier.py --records 200000
+    python benchmarks/classifier.py --records 200000 --confidence 1  # exact scans
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import RECORDS
+from app.services.json_service.classifier import AdaptiveClassifier
+
+
+def legacy_depth(obj):
+    if isinstance(obj, dict):
+        return 1 + max((legacy_depth(v) for v in obj.values()), default=0)
+    if isinstance(obj, list):
+        return 1 + max((legacy_depth(i) for i in obj), default=0)
+    return 0
+
+
+def legacy_array_level(obj):
+    if isinstance(obj, dict):
+        return int(any(legacy_array_level(v) == 1 for v in obj.values()))
+    if isinstance(obj, list):
+        if any(isinstance(i, dict) for i in obj):
+            return 1
+        return int(any(legacy_array_level(i) == 1 for i in obj))
+    return 0
+
+
+def legacy_inconsistent(obj):
+    if isinstance(obj, dict):
+        return any(legacy_inconsistent(v) for v in obj.values())
+    if isinstance(obj, list):
+        key_sets = [set(i) for i in obj if isinstance(i, dict)]
+        if len(key_sets) > 1 and any(k != key_sets[0] for k in key_sets[1:]):
+            return True
+        return any(legacy_inconsistent(i) for i in obj)
+    return False
+
+
+def legacy_classify(doc, threshold=0.5):
+    """JsonProcessor._classify_json before the adaptive classifier"""
+    score = (0.4 if legacy_depth(doc) > 3 else 0) + (0.35 if legacy_array_level(doc) else 0) \
+        + (0.25 if legacy_inconsistent(doc) else 0)
+    return 'nosql' if score >= threshold else 'sql'
+
+
+def documents(records: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    flat = [RECORDS['tabular'](rng, i) for i in range(records)]
+    return {
+        'flat': {'records': flat},
+        'ragged': {'records': [RECORDS['ragged'](rng, i) for i in range(records)]},
+        'deep': {'records': [RECORDS['deep'](rng, i) for i in range(max(records // 10, 1))]},
+        'config': {f'section_{i}': {'name': f'n{i}', 'values': list(range(20)), 'enabled': True}
+                   for i in range(records // 10)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=200_000)
+    parser.add_argument('--confidence', type=float, default=0.99)
+    parser.add_argument('--tolerance', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    classifier = AdaptiveClassifier(confidence=args.confidence, tolerance=args.tolerance)
+    results = []
+    for shape, doc in documents(args.records, args.seed).items():
+        start = time.perf_counter()
+        before = legacy_classify(doc)
+        legacy_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        report = classifier.classify(doc)
+        adaptive_s = time.perf_counter() - start
+
+        results.append({
+            'shape': shape,
+            'legacy_decision': before,
+            'decision': report['decision'],
+            'legacy_s': round(legacy_s, 4),
+            'adaptive_s': round(adaptive_s, 4),
+            'speedup': round(legacy_s / adaptive_s, 1) if adaptive_s else None,
+            'nodes_examined': report['nodes_examined'],
+            'sampled_arrays': report['sampled_arrays'],
+            'early_exit': report['early_exit'],
+        })
+
+    print(json.dumps({
+        'records': args.records,
+        'sample_size': classifier.sample_size,
+        'results': results,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
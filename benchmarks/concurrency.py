@@ -0,0 +1,182 @@
+"""
+Concurrent upload benchmark: IO_BACKEND=sync vs IO_BACKEND=async
+
+Fires N uploads at POST /v1/upload at the same time (httpx.AsyncClient over the ASGI app,
+no network) and reports wall time, uploads/s and per-upload latency percentiles.
+The mix cycles through small JSON record arrays, CSV files, single images and ZIPs of
+JSON + images, so both processors and the ZIP overlap of DB loads with MinIO puts are hit.
+
+The in-process fakes stand in for the servers; --latency adds that many milliseconds to
+every backend round trip (time.sleep for the sync clients, asyncio.sleep for the async
+ones) so the benchmark measures how well waiting on the backends overlaps, which is what
+the async layer changes. With the sync clients the handler blocks the event loop for the
+whole upload, so concurrent uploads queue behind each other.
+
+Usage:
+    python benchmarks/concurrency.py --uploads 500 --latency 5
+    python benchmarks/concurrency.py --uploads 1000 --mix json media --modes async
+"""
+import argparse
+import asyncio
+import functools
+import io
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import zipfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MIX = ['json', 'csv', 'media', 'zip']
+
+
+def payload(kind: str, i: int, rng: random.Random):
+    """(filename, bytes) of upload i; every payload is distinct"""
+    from benchmarks.corpus import RECORDS
+    if kind == 'json':
+        return f'orders_{i}.json', json.dumps([RECORDS['tabular'](rng, n) for n in range(50)]).encode()
+    if kind == 'csv':
+        rows = [RECORDS['tabular'](rng, n) for n in range(50)]
+        lines = [','.join(rows[0])] + [','.join(str(v) for v in r.values()) for r in rows]
+        return f'events_{i}.csv', '\n'.join(lines).encode()
+    if kind == 'media':
+        return f'photo_{i}.png', b'\x89PNG\r\n\x1a\n' + rng.randbytes(32 * 1024)
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w') as z:
+        z.writestr(f'batch_{i}/items.json', json.dumps([RECORDS['tabular'](rng, n) for n in range(20)]))
+        for n in range(4):
+            z.writestr(f'batch_{i}/image_{n}.png', b'\x89PNG\r\n\x1a\n' + rng.randbytes(8 * 1024))
+    return f'batch_{i}.zip', buf.getvalue()
+
+
+def slowed(cls, latency: float):
+    """Subclass of a sync fake whose methods sleep for one round trip first"""
+    def delayed(method):
+        @functools.wraps(method)
+        def call(self, *args, **kwargs):
+            time.sleep(latency)
+            return method(self, *args, **kwargs)
+        return call
+    attrs = {name: delayed(m) for name, m in vars(cls).items()
+             if callable(m) and not name.startswith('_') and name != 'get_collection'}
+    return type(cls.__name__, (cls,), attrs)
+
+
+def asynchronous(cls, latency: float):
+    """Async counterpart of a sync fake: same state, every method a coroutine with one round trip"""
+    def awaited(method):
+        @functools.wraps(method)
+        async def call(self, *args, **kwargs):
+            await asyncio.sleep(latency)
+            return method(self, *args, **kwargs)
+        return call
+    attrs = {name: awaited(m) for name, m in vars(cls).items()
+             if callable(m) and not name.startswith('_') and name != 'get_collection'}
+    return type('Async' + cls.__name__, (cls,), attrs)
+
+
+def install_fakes(latency: float):
+    from benchmarks import fakes
+    import app.db.postgres.client as pg_module
+    import app.db.mongo.client as mongo_module
+    import app.db.minio.client as minio_module
+    import app.db.postgres.async_client as async_pg_module
+    import app.db.mongo.async_client as async_mongo_module
+    import app.db.minio.async_client as async_minio_module
+    pg_module.PostgresClient = slowed(fakes.FakePostgresClient, latency)
+    mongo_module.MongoClient = slowed(fakes.FakeMongoClient, latency)
+    minio_module.MinioClient = slowed(fakes.FakeMinioClient, latency)
+    async_pg_module.AsyncPostgresClient = asynchronous(fakes.FakePostgresClient, latency)
+    async_mongo_module.AsyncMongoClient = asynchronous(fakes.FakeMongoClient, latency)
+    async_minio_module.AsyncMinioClient = asynchronous(fakes.FakeMinioClient, latency)
+
+
+async def fire(uploads: int, mix: list, seed: int) -> dict:
+    import httpx
+    from app.main import app
+
+    rng = random.Random(seed)
+    files = [payload(mix[i % len(mix)], i, rng) for i in range(uploads)]
+    latencies = []
+    statuses = {}
+
+    async with httpx.AsyncClient(app=app, base_url='http://bench') as client:
+        async def one(i: int, filename: str, body: bytes):
+            response = await client.post('/v1/upload', files={'file': (filename, body)}, data={'user_id': f'user{i % 50}'})
+            # From the common start: all uploads arrive at once, so queueing counts as latency
+            latencies.append(time.perf_counter() - start)
+            failed = response.status_code != 200 or response.json()['result'].get('status') == 'error'
+            key = 'error' if failed else 'ok'
+            statuses[key] = statuses.get(key, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i, name, body) for i, (name, body) in enumerate(files)))
+        wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'wall_s': round(wall, 3),
+        'uploads_per_s': round(uploads / wall, 1),
+        'latency_p50_s': round(statistics.median(latencies), 4),
+        'latency_p95_s': round(latencies[int(len(latencies) * 0.95) - 1], 4),
+        'latency_max_s': round(latencies[-1], 4),
+        'results': statuses,
+    }
+
+
+def run_mode(mode: str, args) -> dict:
+    """Runs inside the per-mode subprocess"""
+    os.environ['IO_BACKEND'] = mode
+    os.environ['IDEMPOTENCY_AUTO_KEY'] = 'false'
+    os.environ['INDEX_ADVISOR'] = 'off'
+    if args.backend == 'fake':
+        install_fakes(args.latency / 1000)
+    result = asyncio.run(fire(args.uploads, args.mix, args.seed))
+    return {'mode': mode, **result}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--uploads', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=5.0, help='ms per backend round trip (fake backend)')
+    parser.add_argument('--mix', nargs='+', choices=MIX, default=MIX)
+    parser.add_argument('--modes', nargs='+', choices=['sync', 'async'], default=['sync', 'async'])
+    parser.add_argument('--backend', choices=['fake', 'local'], default='fake')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--single', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_mode(args.single, args)))
+        return
+
+    results = []
+    for mode in args.modes:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--single', mode, '--uploads', str(args.uploads),
+             '--latency', str(args.latency), '--backend', args.backend, '--seed', str(args.seed),
+             '--mix', *args.mix],
+            capture_output=True, text=True, cwd=ROOT
+        )
+        if proc.returncode != 0:
+            results.append({'mode': mode, 'error': proc.stderr.strip().splitlines()[-1:]})
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    print(json.dumps({
+        'benchmark': 'concurrency',
+        'uploads': args.uploads,
+        'mix': args.mix,
+        'backend': args.backend,
+        'latency_ms': args.latency if args.backend == 'fake' else None,
+        'results': results,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
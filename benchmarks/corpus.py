@@ -0,0 +1,159 @@
+"""
+Synthetic corpora for ingestion benchmarks
+
+JSON shapes:
+    tabular - array of flat records with consistent keys (classified SQL)
+    wide    - array of flat records with 200 columns (classified SQL)
+    ragged  - array of records with varying key sets
+    deep    - one document with 8 levels of nesting per record (classified NoSQL)
+Line-oriented (tabular records):
+    csv     - comma-separated with a header row
+    ndjson  - one JSON object per line
+Binary:
+    media   - PNG-signed random bytes
+    zip     - archive mixing small JSON record files, text files and images
+Files are cached under benchmarks/.corpus/ so large sizes are generated once.
+"""
+import csv
+import io
+import json
+import os
+import random
+import uuid
+import zipfile
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), '.corpus')
+UNITS = {'kb': 1024, 'mb': 1024 ** 2, 'gb': 1024 ** 3}
+
+
+def parse_size(size: str) -> int:
+    size = size.strip().lower()
+    for unit, factor in UNITS.items():
+        if size.endswith(unit):
+            return int(float(size[:-len(unit)]) * factor)
+    return int(size)
+
+
+def _tabular_record(rng, i):
+    return {
+        'uid': str(uuid.UUID(int=rng.getrandbits(128))),
+        'email': f'user{i}@example.com',
+        'name': f'user {i}',
+        'age': rng.randint(18, 90),
+        'score': rng.random() * 100,
+        'active': rng.random() < 0.5,
+        'created_at': f'2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T10:00:00',
+        'account_id': rng.randint(1, 1000),
+    }
+
+
+def _wide_record(rng, i):
+    record = {'uid': str(uuid.UUID(int=rng.getrandbits(128)))}
+    for c in range(200):
+        record[f'c{c}'] = rng.randint(0, 10 ** 6) if c % 3 else f'v{rng.randint(0, 999)}'
+    return record
+
+
+def _ragged_record(rng, i):
+    base = _tabular_record(rng, i)
+    keys = rng.sample(list(base), rng.randint(3, len(base)))
+    record = {k: base[k] for k in keys}
+    record[f'extra_{i % 7}'] = i
+    return record
+
+
+def _deep_record(rng, i):
+    node = {'value': i, 'tags': ['a', 'b'], 'items': [{'k': rng.randint(0, 9)}, {'k': 1, 'extra': True}]}
+    for level in range(8):
+        node = {f'level{level}': node, 'id': i}
+    return node
+
+
+RECORDS = {'tabular': _tabular_record, 'wide': _wide_record, 'ragged': _ragged_record, 'deep': _deep_record}
+
+
+def json_corpus(shape: str, size: str, seed: int = 42) -> str:
+    """Write (or reuse) a JSON array of the given shape of roughly the given size, return its path"""
+    target = parse_size(size)
+    path = os.path.join(CORPUS_DIR, f'{shape}_{size}.json')
+    if os.path.exists(path):
+        return path
+    os.makedirs(CORPUS_DIR, exist_ok=True)
+    rng = random.Random(seed)
+    make = RECORDS[shape]
+    written = 1
+    with open(path, 'w') as f:
+        f.write('[')
+        i = 0
+        while written < target or i == 0:
+            chunk = ('' if i == 0 else ',') + json.dumps(make(rng, i))
+            f.write(chunk)
+            written += len(chunk)
+            i += 1
+        f.write(']')
+    return path
+
+
+def records_corpus(fmt: str, size: str, seed: int = 42) -> str:
+    """Write (or reuse) tabular records as CSV or NDJSON of roughly the given size, return its path"""
+    target = parse_size(size)
+    path = os.path.join(CORPUS_DIR, f'tabular_{size}.{fmt}')
+    if os.path.exists(path):
+        return path
+    os.makedirs(CORPUS_DIR, exist_ok=True)
+    rng = random.Random(seed)
+    written = 0
+    with open(path, 'w', newline='') as f:
+        i = 0
+        while written < target or i == 0:
+            record = _tabular_record(rng, i)
+            if fmt == 'csv':
+                line = io.StringIO()
+                writer = csv.writer(line)
+                if i == 0:
+                    writer.writerow(record.keys())
+                writer.writerow(record.values())
+                chunk = line.getvalue()
+            else:
+                chunk = json.dumps(record) + '\n'
+            f.write(chunk)
+            written += len(chunk)
+            i += 1
+    return path
+
+
+def media_corpus(size: str, seed: int = 42) -> str:
+    """Write (or reuse) a PNG-signed binary blob of the given size"""
+    target = parse_size(size)
+    path = os.path.join(CORPUS_DIR, f'media_{size}.png')
+    if not os.path.exists(path):
+        os.makedirs(CORPUS_DIR, exist_ok=True)
+        rng = random.Random(seed)
+        with open(path, 'wb') as f:
+            f.write(b'\x89PNG\r\n\x1a\n')
+            remaining = max(0, target - 8)
+            while remaining:
+                n = min(remaining, 1 << 20)
+                f.write(rng.randbytes(n))
+                remaining -= n
+    return path
+
+
+def zip_corpus(files: int, seed: int = 42) -> str:
+    """Write (or reuse) a ZIP with `files` entries: 60% JSON record files, 20% text, 20% images"""
+    path = os.path.join(CORPUS_DIR, f'archive_{files}.zip')
+    if os.path.exists(path):
+        return path
+    os.makedirs(CORPUS_DIR, exist_ok=True)
+    rng = random.Random(seed)
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as z:
+        for i in range(files):
+            kind = i % 5
+            if kind < 3:
+                records = [_tabular_record(rng, i * 10 + j) for j in range(10)]
+                z.writestr(f'records/part_{i}.json', json.dumps(records))
+            elif kind == 3:
+                z.writestr(f'notes/note_{i}.txt', f'note {i}\n' * 20)
+            else:
+                z.writestr(f'images/img_{i}.png', b'\x89PNG\r\n\x1a\n' + rng.randbytes(2048))
+    return path
@@ -0,0 +1,144 @@
+"""
+Fair scheduling of upload jobs: FIFO slots vs the upload scheduler, simulated
+
+One heavy user submits --heavy-jobs uploads of --heavy-mb MB at once (a bulk import),
+while --light-users users each submit --light-kb KB uploads at --light-rate per second
+for --duration seconds. Jobs hold one of --workers slots for size / --mbps plus
+--overhead-ms, simulated with asyncio.sleep, so no backends are involved:
+- fifo:       an asyncio.Semaphore, first come first served (no admission control)
+- fair:       UploadScheduler weighted fair queuing, QUOTA_CONCURRENT_JOBS per user, no byte quota
+- fair+quota: the same with a --quota-mb MB/s byte quota; rejected jobs retry after Retry-After
+
+Reports per policy and user class (heavy, light): jobs, wait p50/p95/max in ms, mean slowdown
+((wait + run) / run) and 429s, plus Jain's fairness index over per-user 1/slowdown
+(1.0 = every user is slowed down equally).
+
+Usage:
+    python benchmarks/fairness.py --workers 8 --heavy-jobs 60 --light-users 20 --duration 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+from contextlib import asynccontextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MB = 1024 * 1024
+POLICIES = ('fifo', 'fair', 'fair+quota')
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def jain(values: list) -> float:
+    return sum(values) ** 2 / (len(values) * sum(v * v for v in values))
+
+
+def admission(policy: str, args):
+    """admit(user_id, size) context manager of a policy"""
+    if policy == 'fifo':
+        slots = asyncio.Semaphore(args.workers)
+
+        @asynccontextmanager
+        async def admit(user_id, size):
+            async with slots:
+                yield
+        return admit
+
+    from app.services.admission.scheduler import UploadScheduler
+    scheduler = UploadScheduler(
+        workers=args.workers,
+        bytes_per_sec=args.quota_mb * MB if policy == 'fair+quota' else 0,
+        burst_bytes=args.quota_mb * MB * 2,
+        concurrent_jobs=args.concurrent_jobs,
+        queued_jobs=10 ** 6,
+        max_wait=3600,
+        weights={},
+    )
+    return scheduler.admit
+
+
+async def simulate(policy: str, args) -> dict:
+    from app.services.admission.scheduler import QuotaExceeded
+    loop = asyncio.get_running_loop()
+    admit = admission(policy, args)
+    rng = random.Random(args.seed)
+    jobs = []
+    rejected = {'heavy': 0, 'light': 0}
+
+    async def job(user_id: str, kind: str, size: int, delay: float):
+        await asyncio.sleep(delay)
+        submitted = loop.time()
+        run = size / (args.mbps * MB) + args.overhead_ms / 1000
+        while True:
+            try:
+                async with admit(user_id, size):
+                    started = loop.time()
+                    await asyncio.sleep(run)
+                break
+            except QuotaExceeded as e:
+                rejected[kind] += 1
+                await asyncio.sleep(e.retry_after)
+        jobs.append({'user': user_id, 'kind': kind, 'wait': started - submitted,
+                     'slowdown': (loop.time() - submitted) / run})
+
+    tasks = [job('heavy', 'heavy', args.heavy_mb * MB, 0) for _ in range(args.heavy_jobs)]
+    for n in range(args.light_users):
+        t = rng.expovariate(args.light_rate)
+        while t < args.duration:
+            tasks.append(job(f'light{n}', 'light', args.light_kb * 1024, t))
+            t += rng.expovariate(args.light_rate)
+    start = loop.time()
+    await asyncio.gather(*tasks)
+
+    result = {'policy': policy, 'seconds': round(loop.time() - start, 3)}
+    for kind in ('heavy', 'light'):
+        of_kind = [j for j in jobs if j['kind'] == kind]
+        waits = [j['wait'] * 1000 for j in of_kind]
+        result[kind] = {
+            'jobs': len(of_kind),
+            'wait_p50_ms': round(statistics.median(waits), 1),
+            'wait_p95_ms': round(percentile(waits, 0.95), 1),
+            'wait_max_ms': round(max(waits), 1),
+            'mean_slowdown': round(statistics.mean(j['slowdown'] for j in of_kind), 2),
+            'rejected_429': rejected[kind],
+        }
+    per_user = {}
+    for j in jobs:
+        per_user.setdefault(j['user'], []).append(j['slowdown'])
+    result['jain_index'] = round(jain([1 / statistics.mean(s) for s in per_user.values()]), 3)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--concurrent-jobs', type=int, default=4, help='QUOTA_CONCURRENT_JOBS')
+    parser.add_argument('--heavy-jobs', type=int, default=60)
+    parser.add_argument('--heavy-mb', type=int, default=200)
+    parser.add_argument('--light-users', type=int, default=20)
+    parser.add_argument('--light-kb', type=int, default=512)
+    parser.add_argument('--light-rate', type=float, default=4.0, help='uploads per second per light user')
+    parser.add_argument('--duration', type=float, default=3.0, help='seconds light users keep uploading')
+    parser.add_argument('--mbps', type=float, default=1000.0, help='simulated processing speed, MB/s per slot')
+    parser.add_argument('--overhead-ms', type=float, default=5.0, help='simulated fixed cost per job')
+    parser.add_argument('--quota-mb', type=float, default=2000.0, help='QUOTA_BYTES_PER_SEC for fair+quota, in MB')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print(json.dumps({
+        'workers': args.workers,
+        'heavy_jobs': args.heavy_jobs,
+        'light_users': args.light_users,
+        'results': [asyncio.run(simulate(policy, args)) for policy in POLICIES],
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
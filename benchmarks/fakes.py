@@ -0,0 +1,185 @@
+"""
+In-process stand-ins for PostgresClient, MongoClient and MinioClient
+
+They keep the method surface the processors use and only count what would have been
+written, so benchmarks measure the service's own CPU and memory cost.
+"""
+import io
+import itertools
+import re
+
+from app.db.postgres.client import PostgresClient
+
+# Column definitions in generated DDL, and the information_schema name of each SQL type
+_COLUMN_DDL = re.compile(r'"([^"]+)" (BIGINT|DOUBLE PRECISION|TEXT|BOOLEAN|TIMESTAMPTZ|DATE|UUID|JSONB)')
+_CATALOG_NAMES = {'BIGINT': 'bigint', 'DOUBLE PRECISION': 'double precision', 'TEXT': 'text', 'BOOLEAN': 'boolean',
+                  'TIMESTAMPTZ': 'timestamp with time zone', 'DATE': 'date', 'UUID': 'uuid', 'JSONB': 'jsonb'}
+
+
+class FakePostgresClient:
+    def __init__(self):
+        self.tables = {}
+        self.columns = {}
+        self.merged = {}
+        self.stats = {'round_trips': 0, 'rows_written': 0, 'bytes_written': 0}
+
+    def execute(self, query, params=None):
+        self.stats['round_trips'] += 1
+        statement = query.lstrip().upper()
+        if statement.startswith('CREATE TABLE'):
+            name = query.split('"')[1]
+            self.tables.setdefault(name, 0)
+            # Catalog for fetch_table_columns, so re-uploads find their table like with Postgres
+            self.columns.setdefault(name, {}).update(
+                (c, _CATALOG_NAMES[t]) for c, t in _COLUMN_DDL.findall(query.split('(', 1)[1]))
+        elif statement.startswith('ALTER TABLE') and ' ADD COLUMN ' in statement:
+            name = query.split('"')[1]
+            self.columns.setdefault(name, {}).update(
+                (c, _CATALOG_NAMES[t]) for c, t in _COLUMN_DDL.findall(query.split(' ADD COLUMN ', 1)[1]))
+        elif query.lstrip().upper().startswith('INSERT'):
+            self.stats['rows_written'] += 1
+
+    def fetch_one(self, query, params=None):
+        self.stats['round_trips'] += 1
+        return None
+
+    def insert_many(self, table_name, columns, rows, page_size=1000):
+        self.stats['round_trips'] += (len(rows) + page_size - 1) // page_size
+        self.stats['rows_written'] += len(rows)
+        self.stats['bytes_written'] += sum(len(self._encode(row)) for row in rows)
+        self.tables[table_name] = self.tables.get(table_name, 0) + len(rows)
+        return len(rows)
+
+    def copy_tables(self, loads):
+        for table_name, columns, rows in loads:
+            # Encode like the real client so the COPY serialization cost is measured
+            buf = io.StringIO()
+            for row in rows:
+                buf.write(self._encode(row))
+            self.stats['round_trips'] += 1
+            self.stats['rows_written'] += len(rows)
+            self.stats['bytes_written'] += buf.tell()
+            self.tables[table_name] = self.tables.get(table_name, 0) + len(rows)
+
+    def merge_rows(self, table_name, columns, rows, key_columns):
+        # Keeps the merged rows by key so inserted/updated/unchanged counts are real
+        self.stats['round_trips'] += 3
+        stored = self.merged.setdefault(table_name, {})
+        positions = [columns.index(k) for k in key_columns]
+        inserted = updated = 0
+        for row in rows:
+            key = tuple(row[p] for p in positions)
+            current = stored.get(key)
+            if current is None:
+                stored[key] = dict(zip(columns, row))
+                inserted += 1
+            elif any(current.get(c) != v for c, v in zip(columns, row)):
+                current.update(zip(columns, row))
+                updated += 1
+            else:
+                continue
+            self.stats['bytes_written'] += len(self._encode(row))
+        self.stats['rows_written'] += inserted + updated
+        self.tables[table_name] = self.tables.get(table_name, 0) + inserted
+        return inserted, updated
+
+    @staticmethod
+    def _encode(row):
+        # COPY text encoding of a row, used as the stored-bytes estimate
+        return '\t'.join(PostgresClient._copy_value(v) for v in row) + '\n'
+
+    def fetch_all(self, query, params=None):
+        self.stats['round_trips'] += 1
+        return []
+
+    def fetch_table_columns(self, table_name):
+        self.stats['round_trips'] += 1
+        return dict(self.columns.get(table_name, {}))
+
+    def list_tables(self):
+        self.stats['round_trips'] += 1
+        return list(self.tables)
+
+    def ensure_base_schema(self):
+        return True
+
+    def ping(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class _InsertResult:
+    def __init__(self, ids):
+        self.inserted_ids = ids
+        self.inserted_id = ids[0] if ids else None
+
+
+class FakeCollection:
+    def __init__(self, stats):
+        self.stats = stats
+        self._ids = itertools.count(1)
+
+    def insert_one(self, document):
+        self.stats['round_trips'] += 1
+        self.stats['docs_written'] += 1
+        return _InsertResult([next(self._ids)])
+
+    def insert_many(self, documents, ordered=True):
+        self.stats['round_trips'] += 1
+        self.stats['docs_written'] += len(documents)
+        return _InsertResult([next(self._ids) for _ in documents])
+
+    def create_index(self, keys, **kwargs):
+        self.stats['round_trips'] += 1
+        return '_'.join(f'{k}_{d}' for k, d in keys)
+
+
+class FakeMongoClient:
+    def __init__(self):
+        self.stats = {'round_trips': 0, 'docs_written': 0}
+        self.collections = {}
+
+    def get_collection(self, collection_name):
+        if collection_name not in self.collections:
+            self.collections[collection_name] = FakeCollection(self.stats)
+        return self.collections[collection_name]
+
+    def insert_one(self, collection_name, document):
+        return self.get_collection(collection_name).insert_one(document)
+
+    def insert_many(self, collection_name, documents):
+        return self.get_collection(collection_name).insert_many(documents)
+
+    def create_index(self, collection_name, keys, **kwargs):
+        return self.get_collection(collection_name).create_index(keys, **kwargs)
+
+    def create_validator(self, collection_name, validator):
+        self.stats['round_trips'] += 1
+
+    def ping(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeMinioClient:
+    def __init__(self):
+        self.stats = {'round_trips': 0, 'objects_written': 0, 'bytes_written': 0}
+        self.bucket_name = 'benchmark'
+
+    def ensure_bucket(self, bucket_name):
+        self.stats['round_trips'] += 1
+
+    def ping(self):
+        pass
+
+    def put_object(self, bucket_name, object_name, data, content_type):
+        self.stats['round_trips'] += 1
+        self.stats['objects_written'] += 1
+        self.stats['bytes_written'] += len(data)
+
+    def presigned_get(self, bucket_name, object_name, expiry=3600):
+        return f'http://fake-minio/{bucket_name}/{object_name}'
@@ -0,0 +1,159 @@
+"""
+Columnar type inference vs. the per-record implementation it replaced
+
+Builds an array of tabular records (see corpus._tabular_record) and times three paths
+with the previous row-by-row code and the columnar code side by side:
+
+  normalize   normalize_entities over {'records': [...]}, i.e. an upload whose root holds
+              one big array of objects (infer_array used to infer every item in full)
+  merged      the merged record schema used by decomposition and CSV/NDJSON batches
+  columns     infer_array over each single-type column (uuid, datetime, email, int, ...)
+
+Every pair of schemas is asserted equal before timings are printed.
+
+Usage:
+    python benchmarks/infer_columns.py --records 1000000
+    python benchmarks/infer_columns.py --records 200000 --shape ragged
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import RECORDS
+from app.services.json_service.infer_type.primitive import infer_primitive
+from app.services.json_service.infer_type.infer_object import infer_object
+from app.services.json_service.infer_type.infer_array import infer_array
+from app.services.json_service.infer_type.infer_records import infer_records
+from app.services.json_service.normalizer.normalize_schema import normalize_entities
+
+
+def legacy_infer_array(arr, infer_fn):
+    """infer_array before the columnar pass: every item inferred in full"""
+    if not isinstance(arr, list):
+        return {'type': 'array', 'items': {'type': 'unknown'}, 'mixed': True}
+    stats = Counter()
+    item_types = []
+    for item in arr:
+        t, meta = infer_fn(item)
+        stats[t] += 1
+        item_types.append((t, meta))
+    if not item_types:
+        return {'type': 'array', 'items': {'type': 'null'}, 'mixed': False}
+    most_common_type, _ = stats.most_common(1)[0]
+    return {'type': 'array', 'items': {'type': most_common_type}, 'mixed': len(stats) > 1}
+
+
+def legacy_infer_object(obj, infer_fn):
+    schema = {'type': 'object', 'properties': {}, 'required': []}
+    for k, v in obj.items():
+        if v is None:
+            t, meta = ('null', {})
+        elif isinstance(v, dict):
+            t, meta = 'object', infer_fn(v)
+        elif isinstance(v, list):
+            t, meta = 'array', legacy_infer_array(v, infer_fn)
+        else:
+            t, meta = infer_primitive(v)
+        schema['properties'][k] = {'type': t, 'meta': meta}
+        if v is not None:
+            schema['required'].append(k)
+    return schema
+
+
+def legacy_infer(value):
+    if isinstance(value, dict):
+        return ('object', legacy_infer_object(value, legacy_infer))
+    if isinstance(value, list):
+        return ('array', legacy_infer_array(value, legacy_infer))
+    return infer_primitive(value)
+
+
+def legacy_normalize(entities):
+    return {name: legacy_infer_object(sample, legacy_infer) for name, sample in entities.items()}
+
+
+def legacy_merged_schema(rows, infer_fn):
+    """decompose._merged_schema before the columnar pass"""
+    sample = {}
+    counts = {}
+    for row in rows:
+        for k, v in row.items():
+            if v is not None:
+                counts[k] = counts.get(k, 0) + 1
+                if sample.get(k) is None:
+                    sample[k] = v
+            else:
+                sample.setdefault(k, None)
+    schema = legacy_infer_object(sample, infer_fn)
+    schema['required'] = [k for k in schema['properties'] if counts.get(k, 0) == len(rows)]
+    return schema
+
+
+def infer(value):
+    if isinstance(value, dict):
+        return ('object', infer_object(value, infer))
+    if isinstance(value, list):
+        return ('array', infer_array(value, infer))
+    return infer_primitive(value)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def compare(name, legacy, columnar) -> dict:
+    before, before_s = legacy
+    after, after_s = columnar
+    assert before == after, f"{name}: schemas differ\n{before}\n{after}"
+    return {
+        'path': name,
+        'legacy_s': round(before_s, 3),
+        'columnar_s': round(after_s, 3),
+        'speedup': round(before_s / after_s, 1) if after_s else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=1_000_000)
+    parser.add_argument('--shape', choices=['tabular', 'ragged'], default='tabular')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    make = RECORDS[args.shape]
+    records = [make(rng, i) for i in range(args.records)]
+    # A few nulls so required-ness is exercised
+    for i in range(0, len(records), 997):
+        records[i]['name'] = None
+
+    document = {'records': records}
+    results = [
+        compare('normalize',
+                timed(legacy_normalize, {'root': document}),
+                timed(normalize_entities, {'root': document}, infer)),
+        compare('merged',
+                timed(legacy_merged_schema, records, legacy_infer),
+                timed(infer_records, records, infer)),
+    ]
+
+    keys = list(dict.fromkeys(k for r in records[:100] for k in r))
+    columns = {k: [r[k] for r in records if k in r] for k in keys}
+    for k, column in columns.items():
+        results.append(compare(f'columns.{k}',
+                               timed(legacy_infer_array, column, legacy_infer),
+                               timed(infer_array, column, infer)))
+
+    print(json.dumps({'records': args.records, 'shape': args.shape, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
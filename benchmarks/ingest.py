@@ -0,0 +1,239 @@
+"""
+End-to-end ingestion benchmark for POST /v1/upload
+
+Each case runs in its own subprocess (so peak RSS is per case), posts a synthetic
+corpus through the real FastAPI app and reports wall time, throughput, per-stage
+timings, rows/docs/objects written and peak RSS as JSON.
+
+Backends:
+    fake  - in-process fakes from benchmarks/fakes.py (default)
+    local - the real clients, using the PG_*/MONGO_*/MINIO_* environment
+    auto  - local if all three servers accept TCP connections, else fake
+
+Usage:
+    python benchmarks/ingest.py                                  # default cases
+    python benchmarks/ingest.py --cases tabular:10mb deep:1mb zip:500 media:50mb
+    python benchmarks/ingest.py --output result.json --save-baseline benchmarks/baseline.json
+    python benchmarks/ingest.py --baseline benchmarks/baseline.json --tolerance 0.15
+
+Requires the app's requirements plus httpx (for FastAPI's TestClient).
+"""
+import argparse
+import functools
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_CASES = ['tabular:1kb', 'tabular:1mb', 'tabular:10mb', 'wide:1mb', 'ragged:1mb', 'deep:1mb', 'media:10mb', 'zip:200']
+
+
+def servers_reachable() -> bool:
+    targets = [
+        (os.getenv('PG_HOST', 'localhost'), int(os.getenv('PG_PORT', '5432'))),
+        (os.getenv('MONGO_HOST', 'localhost'), int(os.getenv('MONGO_PORT', '27017'))),
+        (os.getenv('MINIO_HOST', 'localhost'), int(os.getenv('MINIO_PORT', '9000'))),
+    ]
+    for host, port in targets:
+        try:
+            socket.create_connection((host, port), timeout=0.5).close()
+        except OSError:
+            return False
+    return True
+
+
+class StageTimer:
+    """Wraps processor stages in place and accumulates call counts and wall time"""
+
+    def __init__(self):
+        self.stages = {}
+
+    def wrap(self, owner, attr, stage):
+        original = getattr(owner, attr)
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                entry = self.stages.setdefault(stage, {'calls': 0, 'seconds': 0.0})
+                entry['calls'] += 1
+                entry['seconds'] += time.perf_counter() - start
+
+        setattr(owner, attr, timed)
+
+
+def install_fakes():
+    from benchmarks import fakes
+    import app.db.postgres.client as pg_module
+    import app.db.mongo.client as mongo_module
+    import app.db.minio.client as minio_module
+    # app.db.clients resolves the classes when it first builds each client
+    pg_module.PostgresClient = fakes.FakePostgresClient
+    mongo_module.MongoClient = fakes.FakeMongoClient
+    minio_module.MinioClient = fakes.FakeMinioClient
+
+
+def instrument(timer: StageTimer):
+    import app.services.json_service.processor as json_module
+    from app.services.json_service.processor import JsonProcessor
+    from app.services.media_service.processor import MediaProcessor
+    for name, stage in [
+        ('detect_entities_from_json', 'json.detect_entities'),
+        ('detect_relationships', 'json.detect_relationships'),
+        ('normalize_entities', 'json.normalize'),
+    ]:
+        timer.wrap(json_module, name, stage)
+    for attr, stage in [
+        ('process', 'json.total'),
+        ('process_batch', 'json.batch_total'),
+        ('process_records', 'records.total'),
+        ('_classify', 'json.classify'),
+        ('_insert_rows', 'json.sql_insert'),
+        ('_load_decomposed', 'json.sql_copy'),
+        ('_insert_data_to_collection', 'json.mongo_insert'),
+    ]:
+        timer.wrap(JsonProcessor, attr, stage)
+    for attr, stage in [
+        ('process', 'media.total'),
+        ('_detect_type_and_folder', 'media.detect_type'),
+        ('_upload_single_file', 'media.upload_object'),
+        ('_process_zip_archive', 'media.zip_extract'),
+    ]:
+        timer.wrap(MediaProcessor, attr, stage)
+
+
+def corpus_for(case: str) -> str:
+    from benchmarks import corpus
+    kind, _, size = case.partition(':')
+    if kind == 'media':
+        return corpus.media_corpus(size)
+    if kind == 'zip':
+        return corpus.zip_corpus(int(size))
+    if kind in ('csv', 'ndjson'):
+        return corpus.records_corpus(kind, size)
+    return corpus.json_corpus(kind, size)
+
+
+def run_case(case: str, backend: str) -> dict:
+    """Runs inside the per-case subprocess"""
+    # Identical corpora would otherwise be replayed from the idempotency cache
+    os.environ['IDEMPOTENCY_AUTO_KEY'] = 'false'
+    path = corpus_for(case)
+    if backend == 'fake':
+        install_fakes()
+    timer = StageTimer()
+    instrument(timer)
+
+    from fastapi.testclient import TestClient
+    from app.api.v1.routes import upload
+    from app.db import clients
+    from app.main import app
+
+    client = TestClient(app)
+    with open(path, 'rb') as f:
+        payload = f.read()
+
+    start = time.perf_counter()
+    response = client.post('/v1/upload', files={'file': (os.path.basename(path), payload)}, data={'user_id': 'bench'})
+    elapsed = time.perf_counter() - start
+
+    written = {}
+    if backend == 'fake':
+        jp, mp = upload.get_json_processor(), upload.get_media_processor()
+        # Sync uploads load over one Postgres connection per threadpool thread
+        pgs = [c for (kind, _), c in clients._instances.items() if kind == 'postgres']
+        written = {
+            'rows_written': sum(pg.stats['rows_written'] for pg in pgs),
+            'docs_written': jp.mongo.stats['docs_written'],
+            'objects_written': mp.minio.stats['objects_written'],
+            'db_round_trips': sum(pg.stats['round_trips'] for pg in pgs) + jp.mongo.stats['round_trips'],
+            'minio_round_trips': mp.minio.stats['round_trips'],
+        }
+
+    return {
+        'case': case,
+        'status_code': response.status_code,
+        'bytes': len(payload),
+        'seconds': round(elapsed, 4),
+        'throughput_mb_s': round(len(payload) / (1024 ** 2) / elapsed, 3) if elapsed else None,
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'stages': {k: {'calls': v['calls'], 'seconds': round(v['seconds'], 4)} for k, v in sorted(timer.stages.items())},
+        **written,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Returns regressions: cases whose seconds or peak RSS grew more than tolerance"""
+    base_cases = {c['case']: c for c in baseline.get('cases', [])}
+    regressions = []
+    for case in results['cases']:
+        base = base_cases.get(case['case'])
+        if not base:
+            continue
+        for metric in ('seconds', 'peak_rss_mb'):
+            if base.get(metric) and case.get(metric) is not None:
+                change = (case[metric] - base[metric]) / base[metric]
+                case.setdefault('vs_baseline', {})[metric] = round(change, 4)
+                if change > tolerance:
+                    regressions.append(f"{case['case']} {metric}: {base[metric]} -> {case[metric]} (+{change:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cases', nargs='+', default=DEFAULT_CASES, help='shape:size, csv:size, ndjson:size, media:size or zip:files')
+    parser.add_argument('--backend', choices=['fake', 'local', 'auto'], default='fake')
+    parser.add_argument('--output', help='write results JSON here as well as stdout')
+    parser.add_argument('--baseline', help='compare against a stored results JSON')
+    parser.add_argument('--save-baseline', help='store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='allowed relative slowdown before failing')
+    parser.add_argument('--single', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    backend = args.backend
+    if backend == 'auto':
+        backend = 'local' if servers_reachable() else 'fake'
+
+    if args.single:
+        print(json.dumps(run_case(args.single, backend)))
+        return
+
+    cases = []
+    for case in args.cases:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--single', case, '--backend', backend],
+            capture_output=True, text=True, cwd=ROOT
+        )
+        if proc.returncode != 0:
+            cases.append({'case': case, 'error': proc.stderr.strip().splitlines()[-1:]})
+            continue
+        cases.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    results = {'benchmark': 'ingest', 'backend': backend, 'python': sys.version.split()[0], 'cases': cases}
+
+    regressions = []
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        results['regressions'] = regressions
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                f.write(text)
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Per-user query latency: one shared table vs tables partitioned by user and ingestion time
+
+Loads the same NDJSON events for --users users into one table per layout, uploading in
+--rounds round-robin rounds so each user's rows are spread over the heap like real traffic:
+- none:      today's layout, one table; the tenant is a "user_id" data field
+- none+index the same table after CREATE INDEX on "user_id"
+- user:      TABLE_PARTITION_BY=user, --modulus hash partitions
+- user,time: TABLE_PARTITION_BY=user,time, a monthly range partition hash-partitioned by user
+
+Then times --queries per-user reads (all of a random user's rows, and their count) on
+each layout and reports p50/p95 latency, the partitions the plan scans (EXPLAIN) and the
+total size of the table with its partitions and indexes.
+
+Needs a real PostgreSQL 12+ (PG_* environment); the in-process fakes cannot plan queries.
+The bench_events_* tables are dropped and recreated.
+
+Usage:
+    python benchmarks/partitioning.py --users 200 --rows-per-user 2000 --rounds 10 --queries 200
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LAYOUTS = ('none', 'user', 'user,time')
+
+
+def events(rng: random.Random, user: str, count: int) -> bytes:
+    lines = []
+    for _ in range(count):
+        lines.append(json.dumps({
+            'user_id': user,
+            'event': rng.choice(['view', 'click', 'purchase', 'share']),
+            'item': rng.randint(1, 50_000),
+            'amount': round(rng.uniform(0, 200), 2),
+            'at': f'2026-{rng.randint(1, 9):02d}-{rng.randint(1, 28):02d}T12:00:00Z',
+        }))
+    return '\n'.join(lines).encode()
+
+
+def scanned(pg, query: str, params: tuple) -> int:
+    """Number of relations (partitions) the plan reads"""
+    plan = pg.fetch_one(f'EXPLAIN (FORMAT JSON) {query}', params)[0]
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    names, stack = set(), [plan[0]['Plan']]
+    while stack:
+        node = stack.pop()
+        if 'Relation Name' in node:
+            names.add(node['Relation Name'])
+        stack.extend(node.get('Plans', []))
+    return len(names)
+
+
+def timed(pg, query: str, params_list: list) -> dict:
+    samples = []
+    for params in params_list:
+        start = time.perf_counter()
+        pg.fetch_all(query, params)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'p50_ms': round(statistics.median(samples), 3),
+        'p95_ms': round(samples[int(len(samples) * 0.95) - 1], 3),
+    }
+
+
+def measure(pg, table: str, column: str, users: list) -> dict:
+    rows_query = f'SELECT * FROM "{table}" WHERE "{column}" = %s'
+    count_query = f'SELECT count(*) FROM "{table}" WHERE "{column}" = %s'
+    params = [(u,) for u in users]
+    size = pg.fetch_one(
+        'SELECT sum(pg_total_relation_size(relid)) FROM pg_partition_tree(%s::regclass)', (f'"{table}"',)
+    )[0]
+    return {
+        'rows': timed(pg, rows_query, params),
+        'count': timed(pg, count_query, params),
+        'partitions_scanned': scanned(pg, rows_query, params[0]),
+        'total_bytes': int(size),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--rows-per-user', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=10, help='uploads per user, interleaved across users')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--modulus', type=int, default=8, help='TABLE_PARTITION_HASH_MODULUS')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    host, port = os.getenv('PG_HOST', 'localhost'), int(os.getenv('PG_PORT', '5432'))
+    try:
+        socket.create_connection((host, port), timeout=0.5).close()
+    except OSError:
+        sys.exit(f'PostgreSQL is not reachable at {host}:{port}; set PG_HOST/PG_PORT/PG_USER/PG_PASS/PG_DB')
+
+    os.environ['INDEX_ADVISOR'] = 'off'
+    from app.db.postgres.client import PostgresClient
+    from app.services.json_service.processor import JsonProcessor
+    from app.services.json_service.table_generator.partitions import USER_COLUMN, parse_partition_by
+
+    pg = PostgresClient()
+    pg.ensure_base_schema()
+    users = [f'user-{n:05d}' for n in range(args.users)]
+    per_round = max(1, args.rows_per_user // args.rounds)
+    results = []
+    for layout in LAYOUTS:
+        table = f"bench_events_{layout.replace(',', '_')}"
+        pg.execute(f'DROP TABLE IF EXISTS "{table}" CASCADE')
+        processor = JsonProcessor(pg=pg)
+        processor.partition_by = parse_partition_by('' if layout == 'none' else layout)
+        processor.partition_modulus = args.modulus
+
+        rng = random.Random(args.seed)
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            for user in users:
+                processor.process_records(f'{table}.ndjson', events(rng, user, per_round), 'ndjson', user_id=user)
+        load_seconds = time.perf_counter() - start
+        pg.execute(f'ANALYZE "{table}"')
+
+        sample = random.Random(args.seed).choices(users, k=args.queries)
+        column = 'user_id' if layout == 'none' else USER_COLUMN
+        results.append({'layout': layout, 'load_seconds': round(load_seconds, 3), **measure(pg, table, column, sample)})
+        if layout == 'none':
+            pg.execute(f'CREATE INDEX ON "{table}" ("user_id")')
+            pg.execute(f'ANALYZE "{table}"')
+            results.append({'layout': 'none+index', **measure(pg, table, column, sample)})
+
+    print(json.dumps({
+        'users': args.users,
+        'rows': args.users * per_round * args.rounds,
+        'modulus': args.modulus,
+        'queries': args.queries,
+        'results': results,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Load test for POST /v1/register
+
+Fires concurrent registrations with unique emails against a running server and
+prints latency percentiles and throughput as JSON.
+
+Usage:
+    python benchmarks/register_load.py --url http://localhost:8000 --requests 200 --concurrency 50
+"""
+import argparse
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+def register_once(url: str) -> tuple:
+    body = json.dumps({"email": f"load_{uuid.uuid4().hex}@example.com", "password": "benchmark-password"}).encode()
+    req = urllib.request.Request(f"{url}/v1/register", data=body, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req) as resp:
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return time.perf_counter() - start, status
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda _: register_once(args.url), range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = [r[0] * 1000 for r in results]
+    print(json.dumps({
+        "benchmark": "register_load",
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "errors": sum(1 for r in results if r[1] != 200),
+        "throughput_rps": round(args.requests / elapsed, 2),
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies), 2),
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "max": round(max(latencies), 2),
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Storage and throughput comparison for JSON_ROOT_REFERENCES
+
+Loads the same nested documents (one object child, one array-of-objects child) through the
+SQL ingestion path with root references off (children copied into the root row as JSONB)
+and on (root row keeps scalars plus references), against the in-process fake clients.
+Prints rows, estimated stored bytes (COPY text encoding), round trips and docs/s per mode.
+
+Usage:
+    python benchmarks/root_references.py --docs 2000 --orders 20
+    python benchmarks/root_references.py --decompose  # also decompose nested arrays
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fakes
+from benchmarks.ingest import install_fakes
+
+
+def nested_document(rng, i, orders):
+    return {
+        'account': f'acct-{i}',
+        'created_at': '2024-05-01T12:00:00Z',
+        'customer': {
+            'name': f'customer {i}',
+            'email': f'user{i}@example.com',
+            'tier': rng.choice(['free', 'pro', 'enterprise']),
+        },
+        'orders': [
+            {
+                'sku': f'SKU-{rng.randint(1, 500)}',
+                'qty': rng.randint(1, 9),
+                'price': round(rng.uniform(1, 200), 2),
+                'note': rng.choice(['gift', 'express', 'standard']) * 4,
+            }
+            for _ in range(orders)
+        ],
+    }
+
+
+def run(mode: bool, decompose: bool, documents) -> dict:
+    os.environ['JSON_ROOT_REFERENCES'] = 'true' if mode else 'false'
+    os.environ['JSON_DECOMPOSE_ARRAYS'] = 'true' if decompose else 'false'
+    os.environ['INDEX_ADVISOR'] = 'off'
+    from app.services.json_service.processor import JsonProcessor
+    from app.services.json_service.entity_extractor.detect_entities import detect_entities_from_json
+    from app.services.json_service.entity_extractor.detect_relationships import detect_relationships
+    from app.services.json_service.normalizer.normalize_schema import normalize_entities
+
+    # Fresh fakes per mode so the stats are not shared with the previous run
+    processor = JsonProcessor(pg=fakes.FakePostgresClient(), mongo=fakes.FakeMongoClient())
+    start = time.perf_counter()
+    for doc in documents:
+        # Go straight to the SQL path so classifier decisions don't skew the comparison
+        entities = detect_entities_from_json(doc)
+        normalized = normalize_entities(entities, processor.infer_fn)
+        processor._process_sql_complete(doc, entities, normalized, detect_relationships(entities))
+    elapsed = time.perf_counter() - start
+
+    stats = processor.pg.stats
+    return {
+        'root_references': mode,
+        'seconds': round(elapsed, 3),
+        'docs_per_s': round(len(documents) / elapsed, 1),
+        'rows_written': stats['rows_written'],
+        'bytes_written': stats['bytes_written'],
+        'round_trips': stats['round_trips'],
+        'tables': processor.pg.tables,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--docs', type=int, default=2000)
+    parser.add_argument('--orders', type=int, default=20, help='array-of-objects children per document')
+    parser.add_argument('--decompose', action='store_true')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    install_fakes()
+    rng = random.Random(args.seed)
+    documents = [nested_document(rng, i, args.orders) for i in range(args.docs)]
+    results = [run(mode, args.decompose, documents) for mode in (False, True)]
+    before, after = results
+    print(json.dumps({
+        'docs': args.docs,
+        'orders_per_doc': args.orders,
+        'decompose': args.decompose,
+        'results': results,
+        'bytes_ratio': round(after['bytes_written'] / before['bytes_written'], 3),
+        'speedup': round(before['seconds'] / after['seconds'], 2),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Full-text search over uploaded text files: indexing throughput and query latency
+
+Generates --docs text files of --words words for --users users, drawn from a Zipf-distributed
+vocabulary, and indexes them through text_index.submit() with 1, 2 and 4 workers (docs/s and
+MB/s, until the queue is drained). Then runs --queries searches of one and two words of
+mid-frequency terms for random users and reports p50/p95 latency, mean hits, and whether the
+plan uses the GIN index (EXPLAIN). For comparison, "scan" times matching the same queries
+against every file of the user already in memory: a lower bound for finding files without the
+index, which would also have to download them from MinIO.
+
+Needs a real PostgreSQL 11+ (PG_* environment) with the btree_gin extension available; the
+in-process fakes cannot run text search. Rows of text_documents under bench/ are replaced.
+
+Usage:
+    python benchmarks/search.py --docs 20000 --users 20 --words 400 --queries 300
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import socket
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'to', 'vi', 'zu', 'pe', 'do', 'fa', 'gi', 'hu', 'jo', 'ba']
+
+
+def vocabulary(size: int) -> list:
+    # Made-up syllable words: none is an English stop word, so every query has terms
+    words = (''.join(p) for n in (2, 3, 4) for p in itertools.product(SYLLABLES, repeat=n))
+    return list(itertools.islice(words, size))
+
+
+def corpus(rng: random.Random, docs: int, users: int, words: int, vocab: list) -> list:
+    weights = [1 / (rank + 1) for rank in range(len(vocab))]
+    files = []
+    for n in range(docs):
+        text = ' '.join(rng.choices(vocab, weights=weights, k=words))
+        files.append({'user': f'bench-user-{n % users}', 'key': f'bench/{n % users}/{n}_notes.txt',
+                      'filename': f'{n}_notes.txt', 'text': text})
+    return files
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def bench_index(text_index, files: list, workers: int) -> dict:
+    text_index.shutdown()
+    text_index.WORKERS = workers
+    data = [f['text'].encode() for f in files]
+    start = time.perf_counter()
+    for f, body in zip(files, data):
+        text_index.submit(f['user'], {'key': f['key'], 'original_filename': f['filename'],
+                                      'mime': 'text/plain', 'size': len(body)}, body)
+    text_index.drain()
+    seconds = time.perf_counter() - start
+    return {
+        'workers': workers,
+        'seconds': round(seconds, 3),
+        'docs_per_s': round(len(files) / seconds),
+        'mb_per_s': round(sum(map(len, data)) / 1024 ** 2 / seconds, 2),
+    }
+
+
+def uses_index(pg, text_index, user: str, query: str) -> bool:
+    plan = pg.fetch_one(
+        'EXPLAIN (FORMAT JSON) ' + text_index.SEARCH_SQL, (text_index.TEXT_CONFIG, query, user, 20, 0)
+    )[0]
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    stack = [plan[0]['Plan']]
+    while stack:
+        node = stack.pop()
+        if node.get('Index Name') == 'text_documents_user_document_idx':
+            return True
+        stack.extend(node.get('Plans', []))
+    return False
+
+
+def bench_queries(pg, text_index, files: list, vocab: list, queries: int, rng: random.Random) -> dict:
+    by_user = {}
+    for f in files:
+        by_user.setdefault(f['user'], []).append(set(f['text'].split()))
+    # Mid-frequency terms: common enough to match, rare enough to rank
+    terms = vocab[len(vocab) // 50: len(vocab) // 5]
+    cases = []
+    for n in range(queries):
+        words = rng.sample(terms, 1 + n % 2)
+        cases.append((rng.choice(sorted(by_user)), words))
+
+    indexed, scanned, hits = [], [], []
+    for user, words in cases:
+        start = time.perf_counter()
+        results = text_index.search(pg, user, ' '.join(words), 20)
+        indexed.append((time.perf_counter() - start) * 1000)
+        hits.append(len(results))
+        start = time.perf_counter()
+        [tokens for tokens in by_user[user] if all(w in tokens for w in words)]
+        scanned.append((time.perf_counter() - start) * 1000)
+    return {
+        'queries': queries,
+        'mean_hits': round(statistics.mean(hits), 1),
+        'index': {'p50_ms': round(statistics.median(indexed), 3), 'p95_ms': round(percentile(indexed, 0.95), 3)},
+        'scan': {'p50_ms': round(statistics.median(scanned), 3), 'p95_ms': round(percentile(scanned, 0.95), 3)},
+        'uses_gin_index': uses_index(pg, text_index, cases[0][0], ' '.join(cases[0][1])),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--docs', type=int, default=20_000)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--words', type=int, default=400, help='words per file')
+    parser.add_argument('--vocabulary', type=int, default=20_000)
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    host, port = os.getenv('PG_HOST', 'localhost'), int(os.getenv('PG_PORT', '5432'))
+    try:
+        socket.create_connection((host, port), timeout=0.5).close()
+    except OSError:
+        sys.exit(f'PostgreSQL is not reachable at {host}:{port}; set PG_HOST/PG_PORT/PG_USER/PG_PASS/PG_DB')
+
+    # Index rows go straight to PostgreSQL, never to a spool
+    os.environ['SPOOL_DIR'] = ''
+    from app.db.postgres.client import PostgresClient
+    from app.services.search_service import text_index
+
+    pg = PostgresClient()
+    pg.ensure_base_schema()
+    pg.execute("DELETE FROM text_documents WHERE object_key LIKE 'bench/%'")
+    rng = random.Random(args.seed)
+    vocab = vocabulary(args.vocabulary)
+    files = corpus(rng, args.docs, args.users, args.words, vocab)
+
+    indexing = [bench_index(text_index, files, workers) for workers in (1, 2, 4)]
+    text_index.shutdown()
+    pg.execute('ANALYZE text_documents')
+    print(json.dumps({
+        'docs': args.docs,
+        'users': args.users,
+        'words_per_doc': args.words,
+        'index': indexing,
+        'search': bench_queries(pg, text_index, files, vocab, args.queries, rng),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+Oversized JSON documents with and without spilling to MinIO
+
+Uploads two payloads through POST /v1/upload, first with SPILL_THRESHOLD_BYTES=0
+(spilling off) and then with --threshold:
+- nosql: one document with a --doc-mb MB "telemetry" subtree and a few small fields.
+  Above 16 MB MongoDB rejects the insert (the fake collection enforces the same BSON limit)
+- sql: --records records that each carry a --value-kb KB flat "payload" object, which
+  lands in a JSONB column
+
+Reports per run: time, documents/rows written, bytes sent to MongoDB/PostgreSQL and to
+MinIO, and the response's spill report. With spilling on it also reads every spilled
+value back (rehydrate) and checks it equals the original.
+
+Usage:
+    python benchmarks/spill.py --doc-mb 40 --records 200 --value-kb 512 --threshold 262144
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MONGO_MAX_BSON = 16 * 1024 * 1024
+
+
+def blob(rng: random.Random, size: int) -> dict:
+    """About size bytes of JSON readings that compress like real telemetry"""
+    readings, total = [], 0
+    while total < size:
+        reading = {'t': rng.randint(1_600_000_000, 1_700_000_000), 'sensor': f's{rng.randint(0, 50)}',
+                   'value': round(rng.gauss(20, 5), 3), 'ok': rng.random() > 0.01}
+        readings.append(reading)
+        total += 70
+    return {'device': f'dev-{rng.randint(0, 999)}', 'readings': readings}
+
+
+def samples(rng: random.Random, size: int) -> dict:
+    """About size bytes of flat sensor samples (one level deep, so the records classify as SQL)"""
+    return {f'r{n}': round(rng.gauss(20, 5), 3) for n in range(size // 14)}
+
+
+def payloads(args) -> dict:
+    rng = random.Random(args.seed)
+    nosql = {
+        'device_id': 'dev-42',
+        'tags': {'site': 'plant-7', 'line': 3},
+        'owner': 'ops',
+        'telemetry': blob(rng, args.doc_mb * 1024 * 1024),
+    }
+    sql = [{'id': i, 'name': f'order-{i}', 'total': round(rng.uniform(1, 500), 2),
+            'payload': samples(rng, args.value_kb * 1024)} for i in range(args.records)]
+    return {'nosql': (nosql, json.dumps(nosql).encode()), 'sql': (sql, json.dumps(sql).encode())}
+
+
+def install(fakes):
+    import bson
+    import app.db.mongo.client as mongo_module
+    import app.db.postgres.client as pg_module
+    import app.db.minio.client as minio_module
+
+    class Collection(fakes.FakeCollection):
+        def _check(self, documents):
+            for document in documents:
+                size = len(bson.encode(document))
+                if size > MONGO_MAX_BSON:
+                    raise ValueError(f'BSON document too large ({size} bytes)')
+                self.stats['bytes_written'] += size
+
+        def insert_one(self, document):
+            self._check([document])
+            return super().insert_one(document)
+
+        def insert_many(self, documents):
+            self._check(documents)
+            return super().insert_many(documents)
+
+    class Mongo(fakes.FakeMongoClient):
+        def __init__(self):
+            super().__init__()
+            self.stats['bytes_written'] = 0
+
+        def get_collection(self, collection_name):
+            if collection_name not in self.collections:
+                self.collections[collection_name] = Collection(self.stats)
+            return self.collections[collection_name]
+
+    class Minio(fakes.FakeMinioClient):
+        objects = {}
+
+        def put_object(self, bucket_name, object_name, data, content_type):
+            super().put_object(bucket_name, object_name, data, content_type)
+            self.objects[object_name] = data
+
+        def read(self, bucket_name, object_name, offset=0, length=0):
+            return self.objects[object_name]
+
+    pg_module.PostgresClient = fakes.FakePostgresClient
+    mongo_module.MongoClient = Mongo
+    minio_module.MinioClient = Minio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--doc-mb', type=int, default=40, help='size of the nosql document subtree')
+    parser.add_argument('--records', type=int, default=200)
+    parser.add_argument('--value-kb', type=int, default=512, help='size of each sql record payload')
+    parser.add_argument('--threshold', type=int, default=256 * 1024, help='SPILL_THRESHOLD_BYTES for the spilling run')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ['IDEMPOTENCY_AUTO_KEY'] = 'false'
+    os.environ['INDEX_ADVISOR'] = 'off'
+    from benchmarks import fakes
+    install(fakes)
+    from fastapi.testclient import TestClient
+    from app.db import clients
+    from app.main import app
+    from app.api.v1.routes import upload
+
+    client = TestClient(app)
+    data = payloads(args)
+    processor = upload.get_json_processor()
+    results = []
+    for threshold in (0, args.threshold):
+        processor.spiller.threshold = threshold
+        for kind, (original, body) in data.items():
+            pg, mongo, minio = clients.get_postgres(), clients.get_mongo(), clients.get_minio()
+            before = (pg.stats['bytes_written'], mongo.stats['bytes_written'], minio.stats['bytes_written'])
+            start = time.perf_counter()
+            response = client.post('/v1/upload', files={'file': (f'{kind}_{threshold}.json', body)},
+                                   data={'user_id': f'bench_{threshold}'})
+            elapsed = time.perf_counter() - start
+            result = response.json()['result']
+            assert result['schema_type'] == kind, f"{kind} payload classified as {result['schema_type']}"
+            entry = (result.get('collections') or result.get('tables') or [{}])[0]
+            run = {
+                'kind': kind,
+                'threshold': threshold,
+                'payload_bytes': len(body),
+                'seconds': round(elapsed, 3),
+                'written': entry.get('documents_inserted', entry.get('rows_inserted')),
+                'db_bytes': (mongo.stats['bytes_written'] - before[1]) if kind == 'nosql' else (pg.stats['bytes_written'] - before[0]),
+                'minio_bytes': minio.stats['bytes_written'] - before[2],
+                'spilled': entry.get('spilled'),
+            }
+            if entry.get('spilled'):
+                # Every spilled value must load back equal to a value of the upload
+                spiller = processor.spiller
+                prefix = f'spill/collections/bench_{threshold}/' if kind == 'nosql' else 'spill/tables/'
+                values = list(original.values()) if kind == 'nosql' else [r['payload'] for r in original]
+                start = time.perf_counter()
+                loaded = [spiller.load({'_spilled': {'key': k, 'codec': spiller.codec}})
+                          for k in minio.objects if k.startswith(prefix)]
+                run['rehydrate_seconds'] = round(time.perf_counter() - start, 3)
+                run['rehydrated_ok'] = bool(loaded) and all(v in values for v in loaded)
+            results.append(run)
+
+    print(json.dumps({
+        'doc_mb': args.doc_mb,
+        'records': args.records,
+        'value_kb': args.value_kb,
+        'results': results,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
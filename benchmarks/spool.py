@@ -0,0 +1,187 @@
+"""
+Durable spool: append throughput with group-committed fsync, and a simulated backend outage
+
+append: --records records of --record-kb KB appended to a spool in a temporary directory by
+1, 8 and 32 threads. Reports appends/s, MB/s, fsyncs and records per fsync (the group-commit
+batching), and p50/p99 append latency. Every append returns only once it is fsynced.
+
+outage: --uploads NDJSON uploads over --tables tables, plus JSON documents (MongoDB) and media
+files (MinIO), posted through the full /v1/upload path against the in-process fakes. Every
+backend write fails with a connection error for the middle third of the uploads. The last
+third arrives with the backends back but before any drain, so those writes queue behind the
+spooled ones. Then the lane is closed and reopened (a restart) and drained. Reports the
+records spooled, the spool size, replay time and rate, rows/documents/objects lost (expected
+minus written, 0) and whether each table received its batches in upload order.
+
+Usage:
+    python benchmarks/spool.py --records 20000 --record-kb 4 --uploads 300 --tables 5
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def bench_append(records: int, record_kb: int, threads: int) -> dict:
+    from app.services.spool.journal import Spool
+    from app.utils.metrics import registry as metrics
+    payload = os.urandom(record_kb * 1024)
+    latencies = []
+    with tempfile.TemporaryDirectory() as root:
+        spool = Spool(os.path.join(root, 'lane-0'))
+        fsyncs_before = metrics._counters.get(('spool_fsyncs_total', ()), 0)
+
+        def writer(n):
+            for _ in range(n):
+                start = time.perf_counter()
+                spool.append('bench', ['bench:t'], (payload,))
+                latencies.append(time.perf_counter() - start)
+
+        per_thread = records // threads
+        workers = [threading.Thread(target=writer, args=(per_thread,)) for _ in range(threads)]
+        start = time.perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        seconds = time.perf_counter() - start
+        fsyncs = metrics._counters.get(('spool_fsyncs_total', ()), 0) - fsyncs_before
+        spool.close()
+    latencies.sort()
+    done = per_thread * threads
+    return {
+        'threads': threads,
+        'appends_per_s': round(done / seconds),
+        'mb_per_s': round(done * record_kb / 1024 / seconds, 1),
+        'fsyncs': int(fsyncs),
+        'records_per_fsync': round(done / max(1, fsyncs), 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 3),
+        'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 3),
+    }
+
+
+class Outage:
+    """Makes every write of the fakes fail while down, and logs the order of table loads"""
+
+    def __init__(self):
+        self.down = False
+        self.loads = {}
+        self.written = {'rows': 0, 'docs': 0, 'objects': 0}
+
+    def install(self):
+        from benchmarks import fakes
+        outage = self
+
+        def guard(cls, name, on_write):
+            original = getattr(cls, name)
+
+            def method(self, *args, **kwargs):
+                if outage.down:
+                    raise ConnectionRefusedError(f'{cls.__name__}.{name}: backend is down')
+                on_write(*args, **kwargs)
+                return original(self, *args, **kwargs)
+            setattr(cls, name, method)
+
+        def copied(loads):
+            for table, columns, rows in loads:
+                # "seq" is the upload's sequence number, the same for all its rows
+                self.loads.setdefault(table, []).append(rows[0][columns.index('seq')])
+                self.written['rows'] += len(rows)
+
+        guard(fakes.FakePostgresClient, 'copy_tables', copied)
+        guard(fakes.FakeCollection, 'insert_many', lambda docs, **kw: self.written.__setitem__('docs', self.written['docs'] + len(docs)))
+        guard(fakes.FakeCollection, 'insert_one', lambda doc: self.written.__setitem__('docs', self.written['docs'] + 1))
+        guard(fakes.FakeMinioClient, 'put_object', lambda *a: self.written.__setitem__('objects', self.written['objects'] + 1))
+
+
+def bench_outage(uploads: int, tables: int, rows: int) -> dict:
+    from benchmarks.ingest import install_fakes
+    install_fakes()
+    outage = Outage()
+    outage.install()
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.services.spool import journal
+    from app.services.spool.drainer import Backoff, drain
+
+    client = TestClient(app)
+    expected = {'rows': 0, 'docs': 0, 'objects': 0}
+    statuses = {}
+    start = time.perf_counter()
+    for i in range(uploads):
+        outage.down = uploads // 3 <= i < 2 * uploads // 3
+        kind = ('ndjson', 'ndjson', 'json', 'media')[i % 4]
+        if kind == 'ndjson':
+            body = '\n'.join(json.dumps({'seq': i, 'n': n, 'name': f'item {n}'}) for n in range(rows)).encode()
+            name = f'events_{i % tables}.ndjson'
+            expected['rows'] += rows
+        elif kind == 'json':
+            body = json.dumps({'profile': {'name': f'user {i}', 'prefs': {'theme': {'dark': True, 'font': {'size': i}}}},
+                               'events': [{'t': i}, {'x': {'y': i}}], 'seq': i}).encode()
+            name = f'profile_{i}.json'
+            expected['docs'] += 1
+        else:
+            body = os.urandom(64 * 1024)
+            name = f'photo_{i}.bin'
+            expected['objects'] += 1
+        response = client.post('/v1/upload', files={'file': (name, body)}, data={'user_id': f'user{i % 7}'})
+        result = response.json().get('result', {})
+        statuses[result.get('status', response.status_code)] = statuses.get(result.get('status', response.status_code), 0) + 1
+    upload_seconds = time.perf_counter() - start
+
+    # Restart: the lane is recovered from disk
+    lane = journal.get()
+    spooled = lane.stats()
+    lane.close()
+    journal._lane = None
+    lane = journal.get()
+    recovered = lane.stats()['records']
+
+    start = time.perf_counter()
+    replayed = 0
+    backoff = Backoff(base=0)
+    while lane.stats()['records']:
+        replayed += drain(lane, backoff)
+    replay_seconds = time.perf_counter() - start
+    return {
+        'uploads': uploads,
+        'upload_seconds': round(upload_seconds, 3),
+        'result_statuses': statuses,
+        'spooled_records': spooled['records'],
+        'spool_bytes': spooled['bytes'],
+        'recovered_after_restart': recovered,
+        'replayed': replayed,
+        'replay_seconds': round(replay_seconds, 3),
+        'replayed_per_s': round(replayed / replay_seconds) if replay_seconds else None,
+        'lost': {k: expected[k] - outage.written[k] for k in expected},
+        'order_preserved': all(seqs == sorted(seqs) for seqs in outage.loads.values()),
+        'spool_left': lane.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=20_000, help='records appended per thread count')
+    parser.add_argument('--record-kb', type=int, default=4)
+    parser.add_argument('--uploads', type=int, default=300)
+    parser.add_argument('--tables', type=int, default=5)
+    parser.add_argument('--rows', type=int, default=200, help='rows per NDJSON upload')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as spool_dir:
+        os.environ['SPOOL_DIR'] = spool_dir
+        os.environ['IDEMPOTENCY_AUTO_KEY'] = 'false'
+        print(json.dumps({
+            'append': [bench_append(args.records, args.record_kb, threads) for threads in (1, 8, 32)],
+            'outage': bench_outage(args.uploads, args.tables, args.rows),
+        }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Startup benchmark: import time, lifespan warm-up and first-request latency
+
+Each scenario runs in a fresh interpreter and reports:
+  import_s          import app.main (no backend is contacted at import time)
+  startup_s         the lifespan: parallel warm-up of the clients plus base_schema.sql
+  first_ready_s     GET /readyz right after startup
+  first_upload_s    first small JSON upload (pays for any client not opened yet)
+
+With the default in-process fakes, --connect-delay adds a sleep to every client
+constructor to stand in for TCP/TLS/auth handshakes. Five clients are warmed up; opened
+one after another they would cost five delays, in parallel about one.
+
+Usage:
+    python benchmarks/startup.py --connect-delay 0.3
+    python benchmarks/startup.py --backend local
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCENARIOS = {'warmup': 'true', 'lazy': 'false'}
+
+
+def install_slow_fakes(delay: float):
+    from benchmarks import fakes
+    import app.db.postgres.client as pg_module
+    import app.db.mongo.client as mongo_module
+    import app.db.minio.client as minio_module
+
+    def slow(cls):
+        class Slow(cls):
+            def __init__(self):
+                time.sleep(delay)
+                super().__init__()
+        Slow.__name__ = cls.__name__
+        return Slow
+
+    pg_module.PostgresClient = slow(fakes.FakePostgresClient)
+    mongo_module.MongoClient = slow(fakes.FakeMongoClient)
+    minio_module.MinioClient = slow(fakes.FakeMinioClient)
+
+
+def run_scenario(scenario: str, backend: str, delay: float) -> dict:
+    """Runs inside the per-scenario subprocess"""
+    os.environ['STARTUP_WARMUP'] = SCENARIOS[scenario]
+    os.environ['EXPORT_SCHEDULER_POLL_SECONDS'] = '0'
+    os.environ['IDEMPOTENCY_AUTO_KEY'] = 'false'
+
+    start = time.perf_counter()
+    from fastapi.testclient import TestClient
+    from app.main import app
+    import_s = time.perf_counter() - start
+    if backend == 'fake':
+        # After the import on purpose: the import itself must not construct any client
+        install_slow_fakes(delay)
+
+    result = {'scenario': scenario, 'import_s': round(import_s, 4)}
+    start = time.perf_counter()
+    with TestClient(app) as client:
+        result['startup_s'] = round(time.perf_counter() - start, 4)
+
+        start = time.perf_counter()
+        ready = client.get('/readyz')
+        result['first_ready_s'] = round(time.perf_counter() - start, 4)
+        result['ready'] = ready.status_code == 200
+
+        payload = json.dumps({'users': [{'id': i, 'name': f'user {i}'} for i in range(100)]}).encode()
+        start = time.perf_counter()
+        upload = client.post('/v1/upload', files={'file': ('startup.json', payload)}, data={'user_id': 'bench'})
+        result['first_upload_s'] = round(time.perf_counter() - start, 4)
+        result['upload_status'] = upload.status_code
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', choices=['fake', 'local'], default='fake')
+    parser.add_argument('--connect-delay', type=float, default=0.2, help='seconds per client connect (fake backend)')
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--single', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_scenario(args.single, args.backend, args.connect_delay)))
+        return
+
+    results = []
+    for scenario in args.scenarios:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--single', scenario,
+             '--backend', args.backend, '--connect-delay', str(args.connect_delay)],
+            capture_output=True, text=True, cwd=ROOT
+        )
+        if proc.returncode != 0:
+            results.append({'scenario': scenario, 'error': proc.stderr.strip().splitlines()[-1:]})
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    from app.db.clients import WARMUP_TARGETS
+    print(json.dumps({
+        'benchmark': 'startup',
+        'backend': args.backend,
+        'connect_delay_s': args.connect_delay if args.backend == 'fake' else None,
+        'clients_warmed': len(WARMUP_TARGETS),
+        'results': results,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()